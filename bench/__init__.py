@@ -0,0 +1,19 @@
+# -------------------------------------------------------------------------
+# Package bench. Benchmarks of the library on CPython, using the
+# ESP-AT simulator (see doc/simulation.md).
+#
+# Usage (from the root of the repository):
+#
+#   python -m bench.micro -o results.json
+#   python -m bench.compare baseline.json results.json
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+"""
+bench - benchmarks of the library on CPython.
+"""
@@ -0,0 +1,185 @@
+# -------------------------------------------------------------------------
+# Shared code of the benchmarks: setup of the simulator, local servers
+# and the result format.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" shared code of the benchmarks """
+
+import json
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import sim
+sim.setup()
+
+# pylint: disable=wrong-import-position
+from sim.clock import VirtualClock
+from sim.esp_at import EspAtSimulator
+from sim.spi import SimulatedSPI
+from esp32at.spi import SPIBackend
+import wifi
+import socketpool
+from socketpool.implementation import _Implementation
+
+FORMAT_VERSION = 1
+""" version of the result format """
+
+class Env:
+  """ simulated co-processor with initialized wifi and socketpool """
+
+  def __init__(self, *, paced: bool = True, virtual: bool = True,
+               baudrate: int = 115200, receiver_buffer_size: int = 2048,
+               uart: EspAtSimulator = None, spi: int = None,
+               **kwargs) -> None:
+    """ constructor.
+
+    paced:    UART timing according to the baudrate
+    virtual:  use a virtual clock (measure with self.monotonic())
+    uart:     use this simulator instead of creating a new one
+    spi:      use the SPI host interface with this clock (Hz) instead
+              of the UART
+    """
+    if uart:
+      self.uart = uart
+    else:
+      self.uart = EspAtSimulator(paced=paced and not spi,
+                                 receiver_buffer_size=receiver_buffer_size,
+                                 **kwargs)
+    if spi:
+      bus = SimulatedSPI(self.uart)
+      self.backend = SPIBackend(bus,bus.cs,bus.handshake,baudrate=spi)
+      baudrate = spi
+    else:
+      self.backend = self.uart
+    self.transport = wifi.transport
+    if virtual:
+      self.clock = VirtualClock()
+      self.clock.install(self.transport,self.uart)
+      self.monotonic = self.clock.monotonic
+    else:
+      self.clock = None
+      self.transport.set_clock()
+      self.monotonic = time.perf_counter
+    if not wifi.init(self.backend,reset_pin=self.uart.reset_pin,
+                     baudrate=baudrate):
+      raise RuntimeError("could not initialize simulator")
+    wifi.radio.connect("simnet","password")
+    self.radio = wifi.radio
+    self.pool = socketpool.SocketPool(wifi.radio)
+    self.impl = _Implementation()
+
+  def close(self) -> None:
+    """ release all resources """
+    self.uart.deinit()
+    self.transport.set_clock()
+
+class TcpServer:
+  """ local TCP server running handler(conn) for every connection """
+
+  def __init__(self, handler) -> None:
+    """ constructor """
+    self._handler = handler
+    self._server = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    self._server.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+    self._server.bind(("127.0.0.1",0))
+    self._server.listen(8)
+    self.port = self._server.getsockname()[1]
+    threading.Thread(target=self._run,daemon=True).start()
+
+  def _run(self) -> None:
+    """ accept connections """
+    while True:
+      try:
+        conn, _ = self._server.accept()
+      except OSError:
+        return
+      threading.Thread(target=self._serve,args=(conn,),daemon=True).start()
+
+  def _serve(self, conn) -> None:
+    """ serve a single connection """
+    with conn:
+      try:
+        self._handler(conn)
+      except OSError:
+        pass
+
+  def close(self) -> None:
+    """ stop the server """
+    self._server.close()
+
+def sink(conn) -> None:
+  """ handler: read and discard everything """
+  while conn.recv(65536):
+    pass
+
+def memory_peak(func) -> int:
+  """ return the peak of memory allocated by func() (bytes) """
+  import tracemalloc      # pylint: disable=import-outside-toplevel
+  tracemalloc.start()
+  try:
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    func()
+    return tracemalloc.get_traced_memory()[1] - base
+  finally:
+    tracemalloc.stop()
+
+def git_revision() -> str:
+  """ return the current commit (or None) """
+  try:
+    return subprocess.run(["git","rev-parse","--short","HEAD"],
+                          cwd=sim.ROOT,capture_output=True,text=True,
+                          check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+class Results:
+  """ collect results and write them as JSON.
+
+  Every result has a value, a unit and the direction of improvement
+  ("higher" or "lower" is better). Differences up to the tolerance are
+  treated as noise by bench.compare.
+  """
+
+  def __init__(self, suite: str) -> None:
+    """ constructor """
+    self.suite = suite
+    self.results = {}
+
+  def add(self, name: str, value: float, unit: str,
+          better: str = "higher", tolerance: float = 0) -> None:
+    """ add a single result """
+    self.results[name] = {"value": value, "unit": unit, "better": better}
+    if tolerance:
+      self.results[name]["tolerance"] = tolerance
+    print(f"{name:<40}{value:>14.2f} {unit}",file=sys.stderr)
+
+  def as_dict(self) -> dict:
+    """ return results with meta-information """
+    return {
+      "format": FORMAT_VERSION,
+      "suite": self.suite,
+      "revision": git_revision(),
+      "python": platform.python_version(),
+      "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+      "results": self.results
+      }
+
+  def write(self, filename: str = None) -> None:
+    """ write results to the given file (or stdout) """
+    if filename:
+      with open(filename,"w") as stream:
+        json.dump(self.as_dict(),stream,indent=2)
+    else:
+      json.dump(self.as_dict(),sys.stdout,indent=2)
+      print()
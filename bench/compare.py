@@ -0,0 +1,83 @@
+# -------------------------------------------------------------------------
+# Compare two benchmark result files.
+#
+# Usage (from the root of the repository):
+#
+#   python -m bench.compare [-t percent] baseline.json results.json
+#
+# The exit code is 1 if at least one result is worse than the baseline
+# by more than the threshold (default: 10%).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" compare benchmark results """
+
+import argparse
+import json
+import sys
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+  """ compare results. Returns a list of tuples
+  (name, old, new, change in percent, status) """
+  rows = []
+  old_results = baseline["results"]
+  for name, new in current["results"].items():
+    old = old_results.get(name)
+    if not old:
+      rows.append((name,None,new["value"],None,"new"))
+      continue
+    if not old["value"]:
+      change = 0.0
+    else:
+      change = 100*(new["value"]-old["value"])/old["value"]
+    gain = change if new.get("better","higher") == "higher" else -change
+    if abs(new["value"]-old["value"]) <= new.get("tolerance",0):
+      status = ""
+    elif gain < -threshold:
+      status = "REGRESSION"
+    elif gain > threshold:
+      status = "improved"
+    else:
+      status = ""
+    rows.append((name,old["value"],new["value"],change,status))
+  for name in old_results:
+    if name not in current["results"]:
+      rows.append((name,old_results[name]["value"],None,None,"missing"))
+  return rows
+
+def print_rows(rows: list, baseline: dict, current: dict) -> None:
+  """ print comparison as table """
+  print(f"baseline: {baseline.get('revision')} ({baseline.get('timestamp')})")
+  print(f"current:  {current.get('revision')} ({current.get('timestamp')})")
+  print(f"{'name':<40}{'baseline':>14}{'current':>14}{'change':>9}")
+  for name, old, new, change, status in rows:
+    old = "-" if old is None else f"{old:.2f}"
+    new = "-" if new is None else f"{new:.2f}"
+    change = "" if change is None else f"{change:+.1f}%"
+    print(f"{name:<40}{old:>14}{new:>14}{change:>9} {status}")
+
+def main() -> None:
+  """ parse arguments and compare """
+  parser = argparse.ArgumentParser(description="compare benchmark results")
+  parser.add_argument("-t","--threshold",type=float,default=10.0,
+                      help="threshold in percent (default: 10)")
+  parser.add_argument("baseline",help="baseline results")
+  parser.add_argument("current",help="current results")
+  args = parser.parse_args()
+
+  with open(args.baseline) as stream:
+    baseline = json.load(stream)
+  with open(args.current) as stream:
+    current = json.load(stream)
+  rows = compare(baseline,current,args.threshold)
+  print_rows(rows,baseline,current)
+  if any(row[4] == "REGRESSION" for row in rows):
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,174 @@
+# -------------------------------------------------------------------------
+# Fault benchmarks: throughput and recovery time under fault profiles.
+#
+# Usage (from the root of the repository):
+#
+#   python -m bench.faults [-p profile ...] [-n requests] [-o results.json]
+#
+# The workload is a sequence of HTTP-GET requests. After a failure, the
+# benchmark recovers like an application would: close the socket, check
+# the co-processor with AT and re-initialize it if necessary. A watchdog
+# aborts operations that hang longer than WATCHDOG seconds (virtual
+# time).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" fault benchmarks """
+
+import argparse
+
+from sim.faults import FaultySimulator, PROFILES
+from bench.common import Env, TcpServer, Results
+from bench.scenarios import http_get, http_response
+from esp32at.transport import BAUDRATES
+import wifi
+
+RESPONSE_SIZE = 4096
+""" size of the response body """
+
+REQUESTS = 30
+""" default number of requests per profile """
+
+WATCHDOG = 30
+""" maximal duration of a single operation (virtual seconds) """
+
+class Hang(Exception):
+  """ raised by the watchdog """
+
+class Watchdog:
+  """ raise Hang if the virtual clock passes the deadline. Hang is raised
+  again on every tick until stop() is called, so swallowing it does not
+  disarm the watchdog """
+
+  def __init__(self, clock) -> None:
+    """ constructor """
+    self._clock = clock
+    self.deadline = None
+    self.fired = False
+    clock.add_hook(self._check)
+
+  def _check(self, _) -> None:
+    """ hook of the virtual clock """
+    if self.deadline is not None and self._clock.now > self.deadline:
+      self.fired = True
+      raise Hang()
+
+  def start(self, timeout: float = WATCHDOG) -> None:
+    """ start the watchdog """
+    self.deadline = self._clock.now + timeout
+    self.fired = False
+
+  def stop(self) -> None:
+    """ stop the watchdog """
+    self.deadline = None
+
+def recover(env: Env, watchdog: Watchdog) -> None:
+  """ recover after a failure """
+  watchdog.start()
+  try:
+    for sock in env.pool.connections:
+      if sock:
+        try:
+          sock.close()
+        except Exception:  # pylint: disable=broad-except
+          env.pool.free_link_id(env.pool.connections.index(sock))
+    env.transport.busy = False
+    env.transport.send_atcmd("AT",timeout=1)
+    return
+  except Exception:      # pylint: disable=broad-except
+    pass
+  finally:
+    watchdog.stop()
+
+  # co-processor is not responsive: re-initialize
+  for _ in range(5):
+    watchdog.start()
+    try:
+      if wifi.init(env.uart,reset_pin=env.uart.reset_pin):
+        wifi.radio.connect("simnet","password")
+        return
+    except Exception:    # pylint: disable=broad-except
+      pass
+    finally:
+      watchdog.stop()
+
+def run_profile(results: Results, name: str, requests: int) -> None:
+  """ run the workload with the given fault profile """
+  response = http_response(b"x"*RESPONSE_SIZE)
+
+  def handler(conn):
+    request = b""
+    while b"\r\n\r\n" not in request:
+      data = conn.recv(1024)
+      if not data:
+        return
+      request += data
+    conn.sendall(response)
+
+  server = TcpServer(handler)
+  uart = FaultySimulator(PROFILES[name],receiver_buffer_size=2048)
+  uart.enabled = False
+  env = Env(uart=uart,
+            baudrate=BAUDRATES if PROFILES[name].baud_limit else 115200)
+  watchdog = Watchdog(env.clock)
+  uart.enabled = True
+
+  ok = failed = hangs = 0
+  received = 0
+  recovery = []
+  failed_at = None
+  start = env.monotonic()
+  for _ in range(requests):
+    watchdog.start()
+    try:
+      http_get(env,server.port,"/")
+      watchdog.stop()
+      ok += 1
+      received += RESPONSE_SIZE
+      if failed_at is not None:
+        recovery.append(env.monotonic()-failed_at)
+        failed_at = None
+    except Exception:             # pylint: disable=broad-except
+      watchdog.stop()
+      failed += 1
+      if watchdog.fired:          # Hang might be converted by the library
+        hangs += 1
+      if failed_at is None:
+        failed_at = env.monotonic()
+      recover(env,watchdog)
+  duration = env.monotonic() - start
+
+  prefix = f"faults.{name}"
+  results.add(f"{prefix}.throughput",received/duration,"bytes/s")
+  results.add(f"{prefix}.failures",failed,"requests","lower")
+  results.add(f"{prefix}.hangs",hangs,"requests","lower")
+  results.add(f"{prefix}.recovery_avg_s",
+              sum(recovery)/len(recovery) if recovery else 0,"s","lower")
+  results.add(f"{prefix}.recovery_max_s",max(recovery,default=0),"s","lower")
+  results.add(f"{prefix}.injected",sum(uart.injected.values()),"faults",
+              "lower")
+  env.close()
+  server.close()
+
+def main() -> None:
+  """ parse arguments and run benchmarks """
+  parser = argparse.ArgumentParser(description="fault benchmarks")
+  parser.add_argument("-p","--profile",nargs="+",choices=list(PROFILES),
+                      default=list(PROFILES),help="fault profiles")
+  parser.add_argument("-n","--requests",type=int,default=REQUESTS,
+                      help=f"requests per profile (default: {REQUESTS})")
+  parser.add_argument("-o","--output",help="output file (default: stdout)")
+  args = parser.parse_args()
+
+  results = Results("faults")
+  for name in args.profile:
+    run_profile(results,name,args.requests)
+  results.write(args.output)
+
+if __name__ == "__main__":
+  main()
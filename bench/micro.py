@@ -0,0 +1,141 @@
+# -------------------------------------------------------------------------
+# Microbenchmarks of the hot paths of the transport and socket layer.
+#
+# Usage (from the root of the repository):
+#
+#   python -m bench.micro [-o results.json] [-q]
+#
+# CPU-bound benchmarks run without UART pacing and measure wall time.
+# Throughput benchmarks (sendall) use the paced simulator with a
+# virtual clock and are therefore independent of the host.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" microbenchmarks """
+
+import argparse
+import time
+
+from bench.common import Env, TcpServer, Results, sink, memory_peak
+
+SCAN_LINE = b'+CWLAP:(3,"simnet",-45,"aa:bb:cc:dd:ee:06",6,-1,-1,4,4,7,1)\r\n'
+""" typical non-URC response line """
+
+IPD_LINE = b"+IPD,0,1024\r\n"
+""" typical URC """
+
+SENDALL_SIZES = (64, 256, 1024, 4096, 8192)
+""" buffer sizes for sendall() """
+
+def bench_read_atmsg(env: Env, results: Results, count: int) -> None:
+  """ lines/s parsed by read_atmsg() (lines without callback) """
+  env.uart.feed(SCAN_LINE*count)
+  start = time.perf_counter()
+  while env.uart.in_waiting:
+    env.transport.read_atmsg()
+  duration = time.perf_counter() - start
+  results.add("read_atmsg.lines_per_s",count/duration,"lines/s")
+
+def bench_urc_dispatch(env: Env, results: Results, count: int) -> None:
+  """ URCs/s dispatched by read_atmsg() """
+  env.uart.feed(IPD_LINE*count)
+  start = time.perf_counter()
+  while env.uart.in_waiting:
+    env.transport.read_atmsg()
+  duration = time.perf_counter() - start
+  results.add("urc_dispatch.urcs_per_s",count/duration,"urcs/s")
+  results.add("urc_dispatch.us_per_urc",1e6*duration/count,"us","lower")
+
+def bench_send_atcmd(env: Env, results: Results, count: int) -> None:
+  """ round-trip time of a trivial command (simulator without pacing) """
+  start = time.perf_counter()
+  for _ in range(count):
+    env.transport.send_atcmd("AT")
+  duration = time.perf_counter() - start
+  results.add("send_atcmd.us_per_cmd",1e6*duration/count,"us","lower")
+
+def bench_recv_data(env: Env, results: Results, count: int,
+                    size: int = 2048) -> None:
+  """ bytes/s of recv_data() (simulator without pacing) """
+  server = TcpServer(sink)
+  sock = env.pool.socket()
+  sock.connect(("127.0.0.1",server.port))
+  link = env.uart.links[sock.link_id]
+  payload = b"x"*size
+  buffer = bytearray(size)
+
+  def recv():
+    link.rbuf += payload
+    env.impl.recv_data(buffer,size,sock.link_id)
+
+  start = time.perf_counter()
+  for _ in range(count):
+    recv()
+  duration = time.perf_counter() - start
+  results.add("recv_data.bytes_per_s",count*size/duration,"bytes/s")
+  results.add("recv_data.alloc_peak",memory_peak(recv),"bytes","lower")
+  sock.close()
+  server.close()
+
+def bench_allocations(env: Env, results: Results) -> None:
+  """ peak memory allocated by single operations """
+  results.add("send_atcmd.alloc_peak",
+              memory_peak(lambda: env.transport.send_atcmd("AT")),
+              "bytes","lower")
+
+  def read_urc():
+    env.uart.feed(IPD_LINE)
+    env.transport.read_atmsg()
+  read_urc()
+  results.add("urc_dispatch.alloc_peak",memory_peak(read_urc),
+              "bytes","lower")
+
+def bench_sendall(results: Results, total: int) -> None:
+  """ throughput of sendall() with various buffer sizes (paced UART,
+  virtual time) """
+  server = TcpServer(sink)
+  env = Env(paced=True,virtual=True,baudrate=115200)
+  for size in SENDALL_SIZES:
+    sock = env.pool.socket()
+    sock.connect(("127.0.0.1",server.port))
+    data = b"x"*size
+    start = env.monotonic()
+    for _ in range(max(1,total//size)):
+      sock.sendall(data)
+    duration = env.monotonic() - start
+    results.add(f"sendall.{size}.bytes_per_s",
+                max(1,total//size)*size/duration,"bytes/s")
+    sock.close()
+  env.close()
+  server.close()
+
+def run(quick: bool = False) -> Results:
+  """ run all benchmarks """
+  scale = 10 if quick else 1
+  results = Results("micro")
+  env = Env(paced=False,virtual=False,receiver_buffer_size=None)
+  bench_read_atmsg(env,results,20000//scale)
+  bench_urc_dispatch(env,results,20000//scale)
+  bench_send_atcmd(env,results,2000//scale)
+  bench_recv_data(env,results,2000//scale)
+  bench_allocations(env,results)
+  env.close()
+  bench_sendall(results,32768//scale)
+  return results
+
+def main() -> None:
+  """ parse arguments and run benchmarks """
+  parser = argparse.ArgumentParser(description="microbenchmarks")
+  parser.add_argument("-o","--output",help="output file (default: stdout)")
+  parser.add_argument("-q","--quick",action="store_true",
+                      help="reduce number of iterations")
+  args = parser.parse_args()
+  run(args.quick).write(args.output)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,274 @@
+# -------------------------------------------------------------------------
+# End-to-end scenario benchmarks. These reproduce the workloads of
+# doc/performance.md with the paced simulator and a virtual clock.
+#
+# Usage (from the root of the repository):
+#
+#   python -m bench.scenarios [-o results.json] [-u] [-t percent]
+#
+# Without -u, the results are compared against bench/baselines/scenarios.json
+# (exit-code 1 on regressions). With -u, the baseline is replaced.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" scenario benchmarks """
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import tracemalloc
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.common import Env, TcpServer, Results
+from bench.compare import compare, print_rows
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baselines","scenarios.json")
+""" default baseline """
+
+METEO_SIZE = 2400
+""" size of a typical Open-Meteo response (bytes) """
+
+METEO_ITERATIONS = 10
+""" number of queries (as in examples/query_openmeteo.py) """
+
+PAGE_SIZES = (5120, 12288, 30720, 40960, 20480, 10240, 8192, 6144, 6922)
+""" sizes of the 9 resources of the web-page (137.76 kB) """
+
+PAGE_PARALLEL = 4
+""" parallel connections of the browser """
+
+UDP_PACKET = b"2024-10-23T10:30:00,10.4,95,1034\n"
+""" a sample of a data-logger """
+
+UDP_RATES = (100, 1000)
+""" target rates (packets/s) """
+
+UDP_PACKETS = 200
+""" packets per measurement """
+
+SPI_CLOCK = 20000000
+""" clock of the SPI host interface (Hz) """
+
+MEMORY_TOLERANCE = 8192
+""" differences of peak memory below this value are noise (bytes) """
+
+# --- helpers   --------------------------------------------------------------
+
+def measure(results: Results, name: str, func):
+  """ run func(), record its peak memory and return its result """
+  tracemalloc.start()
+  try:
+    value = func()
+    results.add(f"{name}.peak_memory",tracemalloc.get_traced_memory()[1],
+                "bytes","lower",tolerance=MEMORY_TOLERANCE)
+  finally:
+    tracemalloc.stop()
+  return value
+
+def interface(baudrate: int, spi: int) -> str:
+  """ name of the host interface for results """
+  return f"spi{spi//1000000}M" if spi else str(baudrate)
+
+def http_response(body: bytes) -> bytes:
+  """ return a complete HTTP response """
+  return (b"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n" +
+          f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+          + body)
+
+def http_get(env: Env, port: int, path: str) -> tuple:
+  """ simple HTTP-GET using the library. Returns (request time,
+  receive time) in virtual seconds """
+  start = env.monotonic()
+  sock = env.pool.socket()
+  sock.settimeout(10)
+  sock.connect(("127.0.0.1",port))
+  sock.send(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+
+  buffer = bytearray(1024)
+  data = b""
+  while b"\r\n\r\n" not in data:
+    n = sock.recv_into(buffer)
+    data += buffer[:n]
+  header, body = data.split(b"\r\n\r\n",1)
+  request_time = env.monotonic() - start
+
+  length = 0
+  for line in header.split(b"\r\n"):
+    if line.lower().startswith(b"content-length:"):
+      length = int(line[15:])
+  received = len(body)
+  while received < length:
+    received += sock.recv_into(buffer,min(len(buffer),length-received))
+  sock.close()
+  return request_time, env.monotonic() - start - request_time
+
+# --- scenarios   ------------------------------------------------------------
+
+def openmeteo(results: Results, baudrate: int, spi: int = None) -> None:
+  """ periodic query of a weather-service (HTTP instead of HTTPS) """
+  response = http_response(b"{" + b"x"*(METEO_SIZE-2) + b"}")
+
+  def handler(conn):
+    request = b""
+    while b"\r\n\r\n" not in request:
+      request += conn.recv(1024)
+    conn.sendall(response)
+
+  server = TcpServer(handler)
+  env = Env(baudrate=baudrate,spi=spi)
+
+  def run():
+    times = [http_get(env,server.port,"/v1/forecast")
+             for _ in range(METEO_ITERATIONS)]
+    return (sum([t[0] for t in times])/len(times),
+            sum([t[1] for t in times])/len(times))
+
+  name = f"openmeteo.{interface(baudrate,spi)}"
+  request_time, recv_time = measure(results,name,run)
+  results.add(f"{name}.send_s",request_time,"s","lower")
+  results.add(f"{name}.recv_s",recv_time,"s","lower")
+  env.close()
+  server.close()
+
+def pageload(results: Results, baudrate: int, spi: int = None) -> None:
+  """ web-page with 9 resources served by the library """
+  env = Env(baudrate=baudrate,spi=spi,max_connections=5)
+  probe = socket.socket()
+  probe.bind(("127.0.0.1",0))
+  env.uart.port_offset = probe.getsockname()[1] - 80
+  probe.close()
+
+  def browser():
+    def get(index):
+      # like a browser, retry if the connection is closed before the
+      # response (e.g. a CIPCLOSE of a reused link-id)
+      for _ in range(3):
+        conn = http.client.HTTPConnection("127.0.0.1",80+env.uart.port_offset,
+                                          timeout=60)
+        try:
+          conn.request("GET",f"/{index}")
+          return len(conn.getresponse().read())
+        except (http.client.RemoteDisconnected, ConnectionResetError):
+          continue
+        finally:
+          conn.close()
+      return 0
+    sizes = [get(0)]
+    with ThreadPoolExecutor(PAGE_PARALLEL) as executor:
+      sizes += list(executor.map(get,range(1,len(PAGE_SIZES))))
+    client_sizes.extend(sizes)
+
+  def serve():
+    server = env.pool.socket()
+    server.settimeout(None)
+    server.bind(("0.0.0.0",80))
+    server.listen(5)
+    client = threading.Thread(target=browser,daemon=True)
+    client.start()
+    start = None
+    buffer = bytearray(1024)
+    for _ in PAGE_SIZES:
+      conn, _ = server.accept()
+      if start is None:
+        start = env.monotonic()
+      conn.settimeout(10)
+      request = b""
+      while b"\r\n\r\n" not in request:
+        n = conn.recv_into(buffer)
+        request += buffer[:n]
+      index = int(request.split(b" ")[1][1:])
+      conn.sendall(http_response(b"x"*PAGE_SIZES[index]))
+      conn.close()
+    duration = env.monotonic() - start
+    client.join(60)
+    server.close()
+    return duration
+
+  client_sizes = []
+  name = f"pageload.{interface(baudrate,spi)}"
+  duration = measure(results,name,serve)
+  if sum(client_sizes) != sum(PAGE_SIZES):
+    raise RuntimeError(f"page load incomplete: {client_sizes}")
+  results.add(f"{name}.load_s",duration,"s","lower")
+  env.close()
+
+def udp(results: Results, baudrate: int, spi: int = None) -> None:
+  """ high-frequency data-sampling with UDP """
+  receiver = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+  receiver.bind(("127.0.0.1",0))
+  env = Env(baudrate=baudrate,spi=spi)
+
+  def run(rate):
+    sock = env.pool.socket(env.pool.AF_INET,env.pool.SOCK_DGRAM)
+    address = receiver.getsockname()
+    sock.sendto(UDP_PACKET,address)
+    start = env.monotonic()
+    for i in range(1,UDP_PACKETS+1):
+      sock.sendto(UDP_PACKET,address)
+      delay = start + i/rate - env.monotonic()
+      if delay > 0:
+        env.transport.sleep(delay)
+    duration = env.monotonic() - start
+    sock.close()
+    return UDP_PACKETS/duration
+
+  for rate in UDP_RATES:
+    name = f"udp.{rate}.{interface(baudrate,spi)}"
+    pps = measure(results,name,lambda: run(rate))   # pylint: disable=cell-var-from-loop
+    results.add(f"{name}.packets_per_s",pps,"packets/s")
+  env.close()
+  receiver.close()
+
+def run() -> Results:
+  """ run all scenarios """
+  results = Results("scenarios")
+  for baudrate in (115200, 1500000):
+    openmeteo(results,baudrate)
+    pageload(results,baudrate)
+    udp(results,baudrate)
+  openmeteo(results,None,SPI_CLOCK)
+  pageload(results,None,SPI_CLOCK)
+  udp(results,None,SPI_CLOCK)
+  return results
+
+def main() -> None:
+  """ parse arguments, run scenarios and compare with baseline """
+  parser = argparse.ArgumentParser(description="scenario benchmarks")
+  parser.add_argument("-o","--output",help="output file")
+  parser.add_argument("-b","--baseline",default=BASELINE,
+                      help=f"baseline (default: {BASELINE})")
+  parser.add_argument("-u","--update",action="store_true",
+                      help="replace the baseline with the results")
+  parser.add_argument("-t","--threshold",type=float,default=10.0,
+                      help="threshold in percent (default: 10)")
+  args = parser.parse_args()
+
+  results = run()
+  if args.output:
+    results.write(args.output)
+  if args.update:
+    results.write(args.baseline)
+    return
+  if not os.path.exists(args.baseline):
+    print(f"no baseline: {args.baseline}",file=sys.stderr)
+    return
+  with open(args.baseline) as stream:
+    baseline = json.load(stream)
+  current = results.as_dict()
+  rows = compare(baseline,current,args.threshold)
+  print_rows(rows,baseline,current)
+  if any(row[4] == "REGRESSION" for row in rows):
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main()
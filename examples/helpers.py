@@ -63,16 +63,8 @@ def init(DEBUG=False,start_station=True):
                       rts=PIN_RTS, cts=PIN_CTS,
                       baudrate=115200, receiver_buffer_size=rbs)
     kwargs = _get_init_args()
+    # note: wifi.init() detects a higher baudrate from a previous run
     rc = wifi.init(uart,debug=DEBUG,reset_pin=PIN_RST,**kwargs)
-    if not rc and 'baudrate' in kwargs:
-      # co-processor might already have a higher baudrate from secrets.py
-      baud_alt = int(str(kwargs['baudrate']).split(',',1)[0])
-      if baud_alt != 115200:
-        # try again with different baudrate
-        uart.baudrate = baud_alt
-        uart.reset_input_buffer()
-        print(f"retry wifi.init() with uart-baudrate={baud_alt}")
-        rc = wifi.init(uart,debug=DEBUG,reset_pin=PIN_RST,**kwargs)
     if not rc:
       raise RuntimeError("could not setup co-processor")
     atexit.register(at_exit)
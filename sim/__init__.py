@@ -0,0 +1,34 @@
+# -------------------------------------------------------------------------
+# Package sim. Host-side (CPython) tools to run the library without
+# hardware: fake UARTs, record/replay of UART sessions.
+#
+# Usage (from the root of the repository):
+#
+#   import sim
+#   sim.setup()            # must be called before importing wifi & co
+#   import wifi
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+"""
+sim - host-side tools to run the library on CPython without hardware.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+""" root directory of the repository """
+
+SRC = os.path.join(ROOT,"src")
+""" directory of the library """
+
+def setup() -> None:
+  """ make the library importable on CPython """
+  if SRC not in sys.path:
+    sys.path.insert(0,SRC)
@@ -0,0 +1,59 @@
+# -------------------------------------------------------------------------
+# Class VirtualClock. A clock for simulated runs: sleeping advances the
+# clock instantly.
+#
+# Usage:
+#
+#   clock = VirtualClock()
+#   uart = EspAtSimulator()
+#   clock.install(wifi.transport,uart)
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class VirtualClock. """
+
+class VirtualClock:
+  """ virtual time source with monotonic() and sleep() """
+
+  RESOLUTION = 1e-6
+  """ minimal duration of a sleep (like a real sleep, it always takes time) """
+
+  def __init__(self, start: float = 0.0) -> None:
+    """ constructor """
+    self.now = start
+    self.slept = 0.0
+    self._hooks = []
+
+  def monotonic(self) -> float:
+    """ current virtual time """
+    return self.now
+
+  def sleep(self, duration: float) -> None:
+    """ advance the clock by duration seconds, without waiting """
+    if duration <= 0:
+      return
+    # tiny durations would vanish in the rounding error of now
+    duration = max(duration,VirtualClock.RESOLUTION)
+    self.now += duration
+    self.slept += duration
+    for hook in self._hooks:
+      hook(duration)
+
+  def add_hook(self, hook) -> None:
+    """ add a function called with the duration after every sleep() """
+    self._hooks.append(hook)
+
+  def install(self, transport, uart=None) -> None:
+    """ use this clock for the transport and (optionally) the fake UART """
+    transport.set_clock(self.monotonic,self.sleep)
+    if uart:
+      if hasattr(uart,"use_clock"):
+        uart.use_clock(self)
+      else:
+        uart._monotonic = self.monotonic     # pylint: disable=protected-access
+        uart._sleep = self.sleep             # pylint: disable=protected-access
@@ -0,0 +1,902 @@
+# -------------------------------------------------------------------------
+# Class EspAtSimulator. A stand-in for an ESP32Cx running the AT firmware.
+#
+# The simulator is a fake busio.UART. It implements the AT commands used
+# by this library and bridges connections to real TCP/UDP sockets of
+# the host. Output to the MCU is paced according to the baudrate, so
+# throughput is comparable to a real UART-connection.
+#
+# Usage:
+#
+#   import sim
+#   sim.setup()
+#   from sim.esp_at import EspAtSimulator
+#   import wifi
+#
+#   uart = EspAtSimulator()
+#   wifi.init(uart)
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class EspAtSimulator. """
+
+import heapq
+import select
+import socket
+import ssl
+
+from sim.uart import FakeUART
+
+VERSION = "3.3.0.0"
+""" default AT firmware version """
+
+BOOT_MESSAGES = (
+  b"ESP-ROM:esp32c3-api1-20210207\r\n" +
+  b"Build:Feb  7 2021\r\n" +
+  b"rst:0xc (RTC_SW_CPU_RST),boot:0xc (SPI_FAST_FLASH_BOOT)\r\n")
+""" messages of the ROM bootloader after a reset """
+
+_NOOP_COMMANDS = (
+  "CIPDINFO", "CIPSSLCSNI", "CIPSTO", "CIPTCPOPT", "CWDHCP", "MDNS",
+  "TRANSINTVL", "SYSMSG", "CIPAPMAC", "CIPSTAMAC",
+  "CIPAP", "CIPSTA", "CWSAP", "CWQAP", "CIPRECVMODE", "RESTORE")
+""" set-commands that are accepted but have no effect """
+
+ERR_NO_AT = 0x01030000
+ERR_PARA_PARSE = 0x01080000
+ERR_UNSUPPORTED = 0x01090000
+ERR_EXEC_FAIL = 0x010A0000
+""" error codes (ERR CODE) reported with AT+SYSLOG=1 """
+
+_STORED_COMMANDS = ("CWMODE", "CWCOUNTRY", "CIPDNS", "CWRECONNCFG",
+                    "CWJAP", "CIPSTA", "CIPAP", "CWSAP", "CWDHCP")
+""" set-commands that write to flash (with AT+SYSSTORE=1) """
+
+class _Link:
+  """ state of a single link (connection) """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, link_id, kind, sock, remote, local_port,
+               server=False) -> None:
+    self.link_id = link_id
+    self.kind = kind
+    self.sock = sock
+    self.remote = remote
+    self.local_port = local_port
+    self.server = server
+    self.rbuf = bytearray()
+    self.peer_closed = False
+
+  def close(self) -> None:
+    """ close the host socket """
+    try:
+      self.sock.close()
+    except OSError:
+      pass
+
+def split_args(args: str) -> list:
+  """ split AT command arguments, removing quotes """
+  result = []
+  current = ""
+  quoted = False
+  for char in args:
+    if char == '"':
+      quoted = not quoted
+    elif char == ',' and not quoted:
+      result.append(current)
+      current = ""
+    else:
+      current += char
+  result.append(current)
+  return result
+
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
+class EspAtSimulator(FakeUART):
+  """ fake UART with an ESP-AT firmware behind it """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, *,
+               version: str = VERSION,
+               chip: str = "ESP32C3",
+               max_connections: int = 5,
+               paced: bool = True,
+               boot_time: float = 0.3,
+               connect_time: float = 0.0,
+               server_host: str = "127.0.0.1",
+               port_offset: int = 0,
+               networks: list = None,
+               real_wait: float = 0.05,
+               unsupported: list = None,
+               **kwargs) -> None:
+    """ constructor.
+
+    version:         AT firmware version reported by AT+GMR
+    paced:           deliver data with the speed of the UART
+    boot_time:       time from reset to 'ready'
+    connect_time:    time for AT+CWJAP
+    server_host:     interface for servers started with AT+CIPSERVER
+    port_offset:     added to the port of AT+CIPSERVER (e.g. 8000 to map
+                     port 80 to 8080)
+    networks:        list of (ssid,rssi,channel,ecn) for AT+CWLAP
+    real_wait:       with a virtual clock: maximal real time to wait for
+                     network input during a single sleep
+    unsupported:     commands (e.g. "CIPSENDL") that fail with ERROR and
+                     are not listed by AT+CMD? (simulates older firmware)
+    """
+    super().__init__(**kwargs)
+    self.version = version
+    self.chip = chip
+    self.max_connections = max_connections
+    self.paced = paced
+    self.boot_time = boot_time
+    self.connect_time = connect_time
+    self.server_host = server_host
+    self.port_offset = port_offset
+    if networks is None:
+      networks = [("simnet",-45,6,3), ("othernet",-70,11,4)]
+    self.networks = networks
+    self.real_wait = real_wait
+    self.unsupported = unsupported or []
+    self.commands = {}           # verb -> count (statistics)
+    self.flash_writes = 0        # stored settings (statistics)
+    self.reset_pin = _ResetPin(self)
+    self._power_on()
+
+  # --- state   --------------------------------------------------------------
+
+  def _power_on(self) -> None:
+    """ initial state after power-on or reset """
+    self.esp_baudrate = 115200
+    self._out = bytearray()
+    self._emitted = 0            # bytes queued for the MCU
+    self._delivered = 0          # bytes passed to the MCU
+    self._closed_at = {}         # link_id -> position of CLOSED message
+    self._out_time = self._monotonic()
+    self._pending_baudrate = None
+    self._events = []            # heap of (time, seq, callable)
+    self._event_time = None      # scheduled time of the running event
+    self._seq = 0
+    self._inbuf = bytearray()
+    self._writing = False
+    self._data_mode = None       # (link, length) while receiving data
+    self._long_data = None       # [total, success] while streaming CIPSENDL
+    self._passthrough = False
+    self._booting = False
+    self.echo = True
+    self.mux = False
+    self.passive = False
+    self.cipmode = 0
+    self.mode = 1
+    self.wifi_ssid = None
+    self.hostname = "espressif"
+    self.country = [0, "CN", 1, 13]
+    self.dns = [0, "208.67.222.222", "8.8.8.8"]
+    self.rfpower = 80
+    self.sleep_mode = 1
+    self.syslog = 0
+    self.sysstore = 1
+    self.reconn = [0, 0]
+    self.uart_cur = [115200, 8, 1, 0, 0]
+    self.links = {}
+    self._server = None
+
+  def _reboot(self, delay: float = 0) -> None:
+    """ reboot the firmware """
+    for link in self.links.values():
+      link.close()
+    if self._server:
+      self._server.close()
+    self._power_on()
+    self._booting = True
+    self._later(delay,lambda: self._emit(BOOT_MESSAGES))
+    self._later(delay+self.boot_time,self._ready)
+
+  def _ready(self) -> None:
+    """ boot finished """
+    self._booting = False
+    self._emit(b"\r\nready\r\n")
+
+  # --- output to the MCU   --------------------------------------------------
+
+  def _emit(self, data: bytes) -> None:
+    """ queue data for the MCU """
+    if not self._out:
+      self._out_time = max(self._out_time,
+                           self._monotonic() if self._event_time is None
+                           else self._event_time)
+    self._out += data
+    self._emitted += len(data)
+
+  def _emit_line(self, line: str) -> None:
+    """ queue a line for the MCU """
+    self._emit(line.encode()+b"\r\n")
+
+  def _later(self, delay: float, func) -> None:
+    """ schedule func after delay seconds """
+    self._seq += 1
+    heapq.heappush(self._events,(self._monotonic()+delay,self._seq,func))
+
+  def _byte_time(self) -> float:
+    """ time for a single byte on the wire (8N1) """
+    return 10/self.esp_baudrate
+
+  def _pump(self) -> None:
+    """ process scheduled events and the network, move output to the
+    receive buffer (paced by the baudrate) """
+    now = self._monotonic()
+    while self._events and self._events[0][0] <= now:
+      self._event_time, _, func = heapq.heappop(self._events)
+      func()
+      self._event_time = None
+    self._poll_network()
+    if not self._out:
+      self._apply_baudrate()
+      return
+    if self.paced:
+      count = int((now - self._out_time)/self._byte_time())
+      if count <= 0:
+        return
+      count = min(count,len(self._out))
+      self._out_time += count*self._byte_time()
+    else:
+      count = len(self._out)
+    data = bytes(self._out[:count])
+    del self._out[:count]
+    self._delivered += count
+    if self.baudrate != self.esp_baudrate:
+      data = bytes([0xFF ^ b for b in data])   # garbage
+    self.feed(data)
+    if not self._out:
+      self._apply_baudrate()
+
+  def _apply_baudrate(self) -> None:
+    """ switch baudrate after all output is sent """
+    if self._pending_baudrate:
+      self.esp_baudrate = self._pending_baudrate
+      self._pending_baudrate = None
+
+  # --- input from the MCU   -------------------------------------------------
+
+  def _received(self, data: bytes) -> None:
+    """ process data written by the MCU """
+    if self.paced:
+      self._writing = True
+      self._sleep(len(data)*self._byte_time())
+      self._writing = False
+    self._pump()
+    if self.baudrate != self.esp_baudrate or self._booting:
+      return                                   # garbage or not ready
+    if self._passthrough:
+      self._passthrough_data(data)
+      return
+    self._inbuf += data
+    while self._inbuf:
+      if self._data_mode:
+        if not self._process_data():
+          return
+        continue
+      end = self._inbuf.find(b"\r\n")
+      if end < 0:
+        return
+      line = bytes(self._inbuf[:end])
+      del self._inbuf[:end+2]
+      self._command(line.decode(errors="replace"))
+
+  def _process_data(self) -> bool:
+    """ collect data for CIPSEND. Return False if incomplete """
+    if self._long_data:
+      return self._process_long_data()
+    link, length = self._data_mode
+    if len(self._inbuf) < length:
+      return False
+    data = bytes(self._inbuf[:length])
+    del self._inbuf[:length]
+    self._data_mode = None
+    self._emit_line(f"\r\nRecv {length} bytes")
+    if self._send(link,data):
+      self._emit(b"\r\nSEND OK\r\n")
+    else:
+      self._emit(b"\r\nSEND FAIL\r\n")
+    return True
+
+  def _process_long_data(self) -> bool:
+    """ forward data for CIPSENDL as it arrives. Return False if
+    incomplete """
+    link, length = self._data_mode
+    count = min(length,len(self._inbuf))
+    if count:
+      if not self._send(link,bytes(self._inbuf[:count])):
+        self._long_data[1] = False
+      del self._inbuf[:count]
+      length -= count
+    if length:
+      self._data_mode = (link,length)
+      return False
+    total, success = self._long_data
+    self._data_mode = None
+    self._long_data = None
+    self._emit_line(f"\r\nRecv {total} bytes")
+    self._emit(b"\r\nSEND OK\r\n" if success else b"\r\nSEND FAIL\r\n")
+    return True
+
+  def _passthrough_data(self, data: bytes) -> None:
+    """ process data in passthrough-mode """
+    if data == b"+++":
+      self._passthrough = False
+      return
+    link = self.links.get(0)
+    if link:
+      self._send(link,data)
+
+  # --- command processing   -------------------------------------------------
+
+  def _command(self, line: str) -> None:
+    """ process a single command line """
+    if self.echo:
+      self._emit_line(line)
+    if not line.startswith("AT"):
+      self._error(ERR_NO_AT)
+      return
+    if line.startswith("AT+"):
+      cmd = line[3:]
+    else:
+      cmd = line[2:]
+    verb = cmd
+    for sep in "=?":
+      verb = verb.split(sep,1)[0]
+    self.commands[verb] = self.commands.get(verb,0) + 1
+    if "=" in cmd:
+      suffix, args = "=", split_args(cmd.split("=",1)[1])
+    elif cmd.endswith("?"):
+      suffix, args = "?", []
+    else:
+      suffix, args = "", []
+
+    handler = getattr(self,f"_cmd_{verb.lower()}",None)
+    if suffix == "=" and self.sysstore and verb in _STORED_COMMANDS:
+      self.flash_writes += 1
+    if verb in self.unsupported:
+      self._error(ERR_UNSUPPORTED)
+    elif handler:
+      try:
+        handler(suffix,args)
+      except (ValueError, IndexError):
+        self._error(ERR_PARA_PARSE)
+      except OSError:
+        self._error()
+    elif verb in _NOOP_COMMANDS and suffix == "=":
+      self._ok()
+    else:
+      self._error(ERR_UNSUPPORTED)
+
+  def _ok(self) -> None:
+    """ send OK """
+    self._emit(b"\r\nOK\r\n")
+
+  def _error(self, code: int = ERR_EXEC_FAIL) -> None:
+    """ send ERROR (with the error code if enabled) """
+    if self.syslog:
+      self._emit(f"ERR CODE:0x{code:08x}\r\n".encode())
+    self._emit(b"\r\nERROR\r\n")
+
+  def _lid(self, args: list) -> tuple:
+    """ split off link-id (multi-connection mode) """
+    if self.mux:
+      return int(args[0]), args[1:]
+    return 0, args
+
+  def _prefix(self, link_id: int) -> str:
+    """ prefix for CONNECT/CLOSED messages """
+    return f"{link_id}," if self.mux else ""
+
+  # pylint: disable=unused-argument,missing-function-docstring
+  def _cmd_(self, suffix, args):
+    self._ok()
+
+  def _cmd_e0(self, suffix, args):
+    self.echo = False
+    self._ok()
+
+  def _cmd_e1(self, suffix, args):
+    self.echo = True
+    self._ok()
+
+  def _cmd_rst(self, suffix, args):
+    self._ok()
+    self._later(0.01,self._reboot)       # after OK is sent
+
+  def _cmd_cmd(self, suffix, args):
+    if suffix != "?":
+      self._error()
+      return
+    verbs = [name[5:].upper() for name in dir(self)
+             if name.startswith("_cmd_") and len(name) > 5]
+    verbs = sorted(set(verbs+list(_NOOP_COMMANDS)) - set(self.unsupported))
+    self._emit_line('+CMD:0,"AT",0,0,0,1')
+    for index, verb in enumerate(verbs):
+      prefix = "AT" if verb in ("E0", "E1") else "AT+"
+      self._emit_line(f'+CMD:{index+1},"{prefix}{verb}",1,1,1,1')
+    self._ok()
+
+  def _cmd_gmr(self, suffix, args):
+    self._emit_line(
+      f"AT version:{self.version}(3b13d04 - {self.chip} - May  8 2024 08:21:54)")
+    self._emit_line("SDK version:v5.0.6")
+    self._emit_line("compile time(a0a7f2a):May  8 2024 08:30:00")
+    self._emit_line(f"Bin version:v{self.version}({self.chip}-MINI-1)")
+    self._ok()
+
+  def _cmd_uart_cur(self, suffix, args):
+    if suffix == "?":
+      self._emit_line("+UART_CUR:"+",".join([str(v) for v in self.uart_cur]))
+      self._ok()
+      return
+    for i, value in enumerate(args[:5]):
+      if value:
+        self.uart_cur[i] = int(value)
+    self._ok()
+    self._pending_baudrate = self.uart_cur[0]
+
+  def _cmd_cipmux(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+CIPMUX:{int(self.mux)}")
+    else:
+      self.mux = args[0] == "1"
+    self._ok()
+
+  def _cmd_cipmode(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+CIPMODE:{self.cipmode}")
+    else:
+      self.cipmode = int(args[0])
+    self._ok()
+
+  def _cmd_cipservermaxconn(self, suffix, args):
+    self._emit_line(f"+CIPSERVERMAXCONN:{self.max_connections}")
+    self._ok()
+
+  def _cmd_ciprecvtype(self, suffix, args):
+    if suffix == "?":
+      for link_id in range(self.max_connections):
+        self._emit_line(f"+CIPRECVTYPE:{link_id},{int(self.passive)}")
+    else:
+      self.passive = args[-1] == "1"
+    self._ok()
+
+  def _cmd_cwmode(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+CWMODE:{self.mode}")
+    else:
+      self.mode = int(args[0])
+    self._ok()
+
+  def _cmd_cwinit(self, suffix, args):
+    if suffix == "?":
+      self._emit_line("+CWINIT:1")
+    self._ok()
+
+  def _cmd_cwcountry(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f'+CWCOUNTRY:{self.country[0]},"{self.country[1]}",' +
+                      f'{self.country[2]},{self.country[3]}')
+    else:
+      self.country = [int(args[0]),args[1],int(args[2]),int(args[3])]
+    self._ok()
+
+  def _cmd_cwhostname(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+CWHOSTNAME:{self.hostname}")
+    else:
+      self.hostname = args[0]
+    self._ok()
+
+  def _cmd_rfpower(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+RFPOWER:{self.rfpower},{self.rfpower},{self.rfpower}")
+    else:
+      self.rfpower = int(args[0])
+    self._ok()
+
+  def _cmd_sysstore(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+SYSSTORE:{self.sysstore}")
+    else:
+      self.sysstore = int(args[0])
+    self._ok()
+
+  def _cmd_cwreconncfg(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+CWRECONNCFG:{self.reconn[0]},{self.reconn[1]}")
+    else:
+      self.reconn = [int(args[0]),int(args[1])]
+    self._ok()
+
+  def _cmd_syslog(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+SYSLOG:{self.syslog}")
+    else:
+      self.syslog = int(args[0])
+    self._ok()
+
+  def _cmd_sleep(self, suffix, args):
+    if suffix == "?":
+      self._emit_line(f"+SLEEP:{self.sleep_mode}")
+    else:
+      self.sleep_mode = int(args[0])
+    self._ok()
+
+  def _cmd_cipdns(self, suffix, args):
+    if suffix == "?":
+      self._emit_line("+CIPDNS:"+",".join(
+        [str(self.dns[0])]+[f'"{d}"' for d in self.dns[1:]]))
+    else:
+      self.dns = [int(args[0])] + args[1:]
+    self._ok()
+
+  def _cmd_cwjap(self, suffix, args):
+    if suffix == "?":
+      if self.wifi_ssid:
+        self._emit_line(f'+CWJAP:"{self.wifi_ssid}","aa:bb:cc:dd:ee:ff",' +
+                        '6,-45,0,1,3,0,1')
+      else:
+        self._emit_line("No AP")
+      self._ok()
+      return
+
+    def connected():
+      self.wifi_ssid = args[0]
+      self._emit_line("WIFI CONNECTED")
+      self._emit_line("WIFI GOT IP")
+      self._ok()
+    self._later(self.connect_time,connected)
+
+  def _cmd_cwstate(self, suffix, args):
+    if self.wifi_ssid:
+      self._emit_line(f'+CWSTATE:2,"{self.wifi_ssid}"')
+    else:
+      self._emit_line('+CWSTATE:0,""')
+    self._ok()
+
+  def _cmd_cwlap(self, suffix, args):
+    for ssid, rssi, channel, ecn in self.networks:
+      if args and args[0] and args[0] != ssid:
+        continue
+      if len(args) > 2 and args[2] and int(args[2]) != channel:
+        continue
+      self._emit_line(
+        f'+CWLAP:({ecn},"{ssid}",{rssi},"aa:bb:cc:dd:ee:{channel:02x}",' +
+        f'{channel},-1,-1,4,4,7,1)')
+    self._ok()
+
+  def _cmd_cipsta(self, suffix, args):
+    if suffix != "?":
+      self._ok()
+      return
+    for key, value in [("ip","192.168.4.2"), ("gateway","192.168.4.1"),
+                       ("netmask","255.255.255.0")]:
+      self._emit_line(f'+CIPSTA:{key}:"{value}"')
+    self._ok()
+
+  def _cmd_cipap(self, suffix, args):
+    if suffix != "?":
+      self._ok()
+      return
+    for key, value in [("ip","192.168.5.1"), ("gateway","192.168.5.1"),
+                       ("netmask","255.255.255.0")]:
+      self._emit_line(f'+CIPAP:{key}:"{value}"')
+    self._ok()
+
+  def _cmd_cipstamac(self, suffix, args):
+    if suffix == "?":
+      self._emit_line('+CIPSTAMAC:"aa:bb:cc:dd:ee:ff"')
+    self._ok()
+
+  def _cmd_cipapmac(self, suffix, args):
+    if suffix == "?":
+      self._emit_line('+CIPAPMAC:"aa:bb:cc:dd:ee:fe"')
+    self._ok()
+
+  def _cmd_ping(self, suffix, args):
+    self._emit_line("+PING:5")
+    self._ok()
+
+  def _cmd_cipdomain(self, suffix, args):
+    try:
+      ipaddr = socket.gethostbyname(args[0])
+    except OSError:
+      self._error()
+      return
+    self._emit_line(f'+CIPDOMAIN:"{ipaddr}"')
+    self._ok()
+
+  # --- connections   --------------------------------------------------------
+
+  def _cmd_cipstart(self, suffix, args):
+    link_id, args = self._lid(args)
+    if link_id in self.links or link_id >= self.max_connections:
+      self._emit_line("ALREADY CONNECTED")
+      self._error()
+      return
+    kind, host, port = args[0], args[1], int(args[2])
+    if kind == "UDP":
+      sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+      local_port = 0
+      if len(args) > 3 and args[3]:
+        local_port = int(args[3])
+      sock.bind(("0.0.0.0",local_port))
+      if len(args) > 4 and args[4] == "2":
+        host, port = None, None    # dynamic remote
+      remote = (host,port)
+    else:
+      sock = socket.create_connection((host,port),timeout=10)
+      if kind == "SSL":
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        sock = context.wrap_socket(sock,server_hostname=host)
+      remote = sock.getpeername()[:2]
+    sock.setblocking(False)
+    link = _Link(link_id,kind,sock,remote,sock.getsockname()[1])
+    self.links[link_id] = link
+    self._emit_line(f"{self._prefix(link_id)}CONNECT")
+    self._ok()
+
+  def _cmd_cipclose(self, suffix, args):
+    if self.mux:
+      link_id = int(args[0])
+    else:
+      link_id = 0
+    if link_id == self.max_connections:     # close all
+      for lid in list(self.links):
+        self._close(lid,report=False)
+      self._ok()
+      return
+    if link_id not in self.links:
+      self._error()
+      return
+    self._close(link_id)
+    self._ok()
+
+  def _close(self, link_id: int, report: bool = True) -> None:
+    """ close a link """
+    link = self.links.pop(link_id,None)
+    if link:
+      link.close()
+      if report:
+        self._emit_line(f"{self._prefix(link_id)}CLOSED")
+        self._closed_at[link_id] = self._emitted
+
+  def _cmd_cipsend(self, suffix, args):
+    if not args and self.cipmode == 1:      # passthrough
+      self._ok()
+      self._emit(b"\r\n>")
+      self._passthrough = True
+      return
+    link_id, args = self._lid(args)
+    link = self.links.get(link_id)
+    if not link:
+      self._emit_line("link is not valid")
+      self._error()
+      return
+    length = int(args[0])
+    if len(args) > 2:
+      link.remote = (args[1],int(args[2]))
+    self._ok()
+    self._emit(b"\r\n>")
+    self._data_mode = (link,length)
+
+  def _cmd_cipsendl(self, suffix, args):
+    self._cmd_cipsend(suffix,args)
+    if self._data_mode:
+      self._long_data = [self._data_mode[1],True]
+
+  def _send(self, link: _Link, data: bytes) -> bool:
+    """ send data on a link """
+    try:
+      if link.kind == "UDP":
+        if not link.remote[0]:
+          return False
+        link.sock.sendto(data,link.remote)
+      else:
+        link.sock.setblocking(True)
+        link.sock.sendall(data)
+        link.sock.setblocking(False)
+      return True
+    except OSError:
+      return False
+
+  def _cmd_ciprecvdata(self, suffix, args):
+    link_id, args = self._lid(args)
+    link = self.links.get(link_id)
+    if not link:
+      self._error()
+      return
+    length = min(int(args[0]),len(link.rbuf))
+    data = bytes(link.rbuf[:length])
+    del link.rbuf[:length]
+    host, port = link.remote
+    self._emit(f'+CIPRECVDATA:{length},"{host}",{port},'.encode()+data)
+    self._ok()
+    if link.rbuf:
+      self._report_ipd(link)                 # remaining data
+    elif link.peer_closed:
+      self._close(link_id)
+
+  def _cmd_cipstate(self, suffix, args):
+    for link in self.links.values():
+      host, port = link.remote
+      self._emit_line(f'+CIPSTATE:{link.link_id},"{link.kind}","{host}",' +
+                      f'{port},{link.local_port},{int(link.server)}')
+    self._ok()
+
+  def _cmd_cipstatus(self, suffix, args):
+    self._emit_line("STATUS:2")
+    for link in self.links.values():
+      host, port = link.remote
+      self._emit_line(f'+CIPSTATUS:{link.link_id},"{link.kind}","{host}",' +
+                      f'{port},{link.local_port},{int(link.server)}')
+    self._ok()
+
+  def _cmd_cipserver(self, suffix, args):
+    if args[0] == "1":
+      port = int(args[1]) + self.port_offset
+      server = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+      server.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+      server.bind((self.server_host,port))
+      server.listen(self.max_connections)
+      server.setblocking(False)
+      self._server = server
+    else:
+      if self._server:
+        self._server.close()
+        self._server = None
+      if len(args) > 1 and args[1] == "1":
+        for link_id in [l.link_id for l in self.links.values() if l.server]:
+          self._close(link_id)
+    self._ok()
+
+  # --- network   ------------------------------------------------------------
+
+  def _free_link_id(self) -> int:
+    """ return free link-id or None. A closed link-id is only reused once
+    the CLOSED message is passed to the MCU """
+    for link_id in range(self.max_connections):
+      if (link_id not in self.links and
+          self._closed_at.get(link_id,0) <= self._delivered):
+        return link_id
+    return None
+
+  def _sockets(self) -> list:
+    """ return all open host sockets """
+    socks = [link.sock for link in self.links.values() if not link.peer_closed]
+    if self._server:
+      socks.append(self._server)
+    return socks
+
+  def _wait_network(self, duration: float) -> None:
+    """ wait (in real time) for network input while nothing else is
+    pending. Used as a hook of a virtual clock. """
+    if self._writing or self._booting or self._out or self._rx:
+      return
+    if self._events and self._events[0][0] <= self._monotonic():
+      return
+    socks = self._sockets()
+    if socks:
+      select.select(socks,[],[],min(duration,self.real_wait))
+
+  def _poll_network(self) -> None:
+    """ check host sockets for new connections and data """
+    if self._booting:
+      return
+    socks = self._sockets()
+    if not socks:
+      return
+    readable, _, _ = select.select(socks,[],[],0)
+    pending = [link.sock for link in self.links.values()
+               if isinstance(link.sock,ssl.SSLSocket) and link.sock.pending()]
+    for sock in set(readable + pending):
+      if sock is self._server:
+        self._accept()
+      else:
+        for link in list(self.links.values()):
+          if link.sock is sock:
+            self._read_link(link)
+
+  def _accept(self) -> None:
+    """ accept an incoming connection """
+    sock, remote = self._server.accept()
+    link_id = self._free_link_id()
+    if link_id is None:
+      sock.close()
+      return
+    sock.setblocking(False)
+    self.links[link_id] = _Link(link_id,"TCP",sock,remote,
+                                sock.getsockname()[1],server=True)
+    self._emit_line(f"{self._prefix(link_id)}CONNECT")
+
+  def _read_link(self, link: _Link) -> None:
+    """ read available data of a link """
+    try:
+      if link.kind == "UDP":
+        data, remote = link.sock.recvfrom(65536)
+        link.remote = remote
+      else:
+        data = link.sock.recv(65536)
+    except (BlockingIOError, ssl.SSLWantReadError):
+      return
+    except OSError:
+      data = b""
+    if not data:
+      link.peer_closed = True
+      if not link.rbuf:
+        self._close(link.link_id)
+      return
+    if self._passthrough:
+      self._emit(data)
+    elif self.passive:
+      link.rbuf += data
+      self._report_ipd(link)
+    else:
+      host, port = link.remote
+      prefix = f"{link.link_id}," if self.mux else ""
+      self._emit(f'+IPD,{prefix}{len(data)},"{host}",{port}:'.encode()+data)
+
+  def _report_ipd(self, link: _Link) -> None:
+    """ report buffered data of a link (passive mode) """
+    if self.mux:
+      self._emit_line(f"+IPD,{link.link_id},{len(link.rbuf)}")
+    else:
+      self._emit_line(f"+IPD,{len(link.rbuf)}")
+
+  # --- virtual time   -------------------------------------------------------
+
+  def use_clock(self, clock) -> None:
+    """ use a virtual clock (see sim/clock.py) """
+    self._monotonic = clock.monotonic
+    self._sleep = clock.sleep
+    self._out_time = clock.monotonic()
+    clock.add_hook(self._wait_network)
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ close all host sockets """
+    for link in self.links.values():
+      link.close()
+    self.links = {}
+    if self._server:
+      self._server.close()
+      self._server = None
+
+class _ResetPin:
+  """ reset-pin of the simulator (pass as reset_pin to wifi.init()).
+  Implements the part of the digitalio.DigitalInOut API used by the
+  library """
+
+  def __init__(self, simulator: EspAtSimulator) -> None:
+    self._simulator = simulator
+    self._value = True
+
+  def deinit(self) -> None:
+    """ nothing to release """
+
+  def switch_to_output(self, value: bool = False, **kwargs) -> None:
+    """ switch to output """
+    self.value = value
+
+  @property
+  def value(self) -> bool:
+    """ level of the pin """
+    return self._value
+
+  @value.setter
+  def value(self, value: bool) -> None:
+    """ set level of the pin. A rising edge reboots """
+    if value and not self._value:
+      self._simulator._reboot()     # pylint: disable=protected-access
+    self._value = value
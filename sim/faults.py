@@ -0,0 +1,183 @@
+# -------------------------------------------------------------------------
+# Fault injection for the ESP-AT simulator.
+#
+# Usage:
+#
+#   from sim.faults import FaultySimulator, PROFILES
+#   uart = FaultySimulator(PROFILES["busy"],receiver_buffer_size=2048)
+#   wifi.init(uart,...)
+#   ...
+#   print(uart.injected)
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class FaultProfile, class FaultySimulator """
+
+import random
+
+from sim.esp_at import EspAtSimulator
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class FaultProfile:
+  """ Probabilities and parameters of injected faults.
+
+  latency:          processing time of every command (s)
+  jitter:           additional random processing time (0..jitter s)
+  drop_rate:        probability of a lost byte (both directions)
+  corrupt_rate:     probability of a corrupted byte (both directions)
+  reboot_rate:      probability of a spurious reboot per command
+  busy_rate:        probability of 'busy p...' per command
+  send_error_rate:  probability of ERROR after AT+CIPSEND
+  send_ok_loss:     probability of a lost SEND OK
+  ipd_loss:         probability of a lost +IPD message
+  link_reset_rate:  probability of a link reset (by the peer) per command
+  baud_limit:       highest baudrate the wiring supports
+  overspeed_rate:   probability of a corrupted byte above baud_limit (also
+                    while injection is disabled)
+  """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, name: str = "custom", *,
+               latency: float = 0.0, jitter: float = 0.0,
+               drop_rate: float = 0.0, corrupt_rate: float = 0.0,
+               reboot_rate: float = 0.0, busy_rate: float = 0.0,
+               send_error_rate: float = 0.0, send_ok_loss: float = 0.0,
+               ipd_loss: float = 0.0, link_reset_rate: float = 0.0,
+               baud_limit: int = 0, overspeed_rate: float = 0.0) -> None:
+    """ constructor """
+    self.name = name
+    self.latency = latency
+    self.jitter = jitter
+    self.drop_rate = drop_rate
+    self.corrupt_rate = corrupt_rate
+    self.reboot_rate = reboot_rate
+    self.busy_rate = busy_rate
+    self.send_error_rate = send_error_rate
+    self.send_ok_loss = send_ok_loss
+    self.ipd_loss = ipd_loss
+    self.link_reset_rate = link_reset_rate
+    self.baud_limit = baud_limit
+    self.overspeed_rate = overspeed_rate
+
+  def __repr__(self) -> str:
+    """ readable representation (only active faults) """
+    faults = [f"{key}={value}" for key, value in vars(self).items()
+              if key != "name" and value]
+    return f"FaultProfile({self.name}: {', '.join(faults)})"
+
+PROFILES = {
+  "clean":       FaultProfile("clean"),
+  "latency":     FaultProfile("latency",latency=0.002,jitter=0.01),
+  "noisy_uart":  FaultProfile("noisy_uart",drop_rate=2e-5,corrupt_rate=2e-5),
+  "reboot":      FaultProfile("reboot",reboot_rate=0.002),
+  "busy":        FaultProfile("busy",busy_rate=0.05),
+  "send_errors": FaultProfile("send_errors",send_error_rate=0.05,
+                              send_ok_loss=0.02),
+  "ipd_loss":    FaultProfile("ipd_loss",ipd_loss=0.05),
+  "link_reset":  FaultProfile("link_reset",link_reset_rate=0.01),
+  "baud_limit":  FaultProfile("baud_limit",baud_limit=1000000,
+                              overspeed_rate=0.005),
+  }
+""" predefined fault profiles """
+
+class FaultySimulator(EspAtSimulator):
+  """ simulator that injects faults according to a FaultProfile.
+
+  All injected faults are counted in self.injected (name -> count).
+  """
+
+  def __init__(self, profile: FaultProfile, seed: int = 42,
+               **kwargs) -> None:
+    """ constructor. The seed makes runs reproducible """
+    self.profile = profile
+    self.random = random.Random(seed)
+    self.injected = {}
+    self.enabled = True
+    super().__init__(**kwargs)
+
+  def _inject(self, rate: float, name: str) -> bool:
+    """ decide if a fault is injected """
+    if not self.enabled or not rate or self.random.random() >= rate:
+      return False
+    self.injected[name] = self.injected.get(name,0) + 1
+    return True
+
+  def _overspeed(self, data: bytes) -> bytes:
+    """ corrupt bytes above the baudrate limit of the wiring """
+    profile = self.profile
+    if not profile.baud_limit or self.esp_baudrate <= profile.baud_limit:
+      return data
+    result = bytearray(data)
+    for i in range(len(result)):
+      if self.random.random() < profile.overspeed_rate:
+        self.injected["overspeed"] = self.injected.get("overspeed",0) + 1
+        result[i] ^= 1 << self.random.randrange(8)
+    return bytes(result)
+
+  def _garble(self, data: bytes) -> bytes:
+    """ drop and corrupt bytes """
+    profile = self.profile
+    data = self._overspeed(data)
+    if not self.enabled or not (profile.drop_rate or profile.corrupt_rate):
+      return data
+    result = bytearray()
+    for byte in data:
+      if self._inject(profile.drop_rate,"drop"):
+        continue
+      if self._inject(profile.corrupt_rate,"corrupt"):
+        byte ^= 1 << self.random.randrange(8)
+      result.append(byte)
+    return bytes(result)
+
+  # --- hooks   --------------------------------------------------------------
+
+  def feed(self, data: bytes) -> None:
+    """ data to the MCU """
+    super().feed(self._garble(data))
+
+  def _received(self, data: bytes) -> None:
+    """ data from the MCU """
+    super()._received(self._garble(data))
+
+  def _emit(self, data: bytes) -> None:
+    """ drop selected messages """
+    if data.startswith(b"+IPD") and self._inject(self.profile.ipd_loss,
+                                                 "ipd_loss"):
+      return
+    if b"SEND OK" in data and self._inject(self.profile.send_ok_loss,
+                                           "send_ok_loss"):
+      return
+    super()._emit(data)
+
+  def _command(self, line: str) -> None:
+    """ inject faults for a command """
+    profile = self.profile
+
+    # processing time: delays all output from now on
+    delay = profile.latency
+    if profile.jitter and self.enabled:
+      delay += profile.jitter*self.random.random()
+    if delay and self.enabled:
+      self._out_time = max(self._out_time,self._monotonic()) + delay
+
+    if self._inject(profile.reboot_rate,"reboot"):
+      self._reboot()
+      return
+    if self._inject(profile.busy_rate,"busy"):
+      self._emit(b"busy p...\r\n")
+      return
+    if self.links and self._inject(profile.link_reset_rate,"link_reset"):
+      link_id = self.random.choice(list(self.links))
+      self._close(link_id)
+    if (line.startswith("AT+CIPSEND=") and
+        self._inject(profile.send_error_rate,"send_error")):
+      if self.echo:
+        self._emit_line(line)
+      self._error()
+      return
+    super()._command(line)
@@ -0,0 +1,90 @@
+# -------------------------------------------------------------------------
+# Class PtyBridge. Attach a simulator to a pseudo-terminal, so programs
+# using a real serial port (e.g. esp32at.host.SerialUART, miniterm or
+# esptool-like tools) talk to the simulated firmware.
+#
+# Usage:
+#
+#   from sim.esp_at import EspAtSimulator
+#   from sim.pty import PtyBridge
+#   bridge = PtyBridge(EspAtSimulator())
+#   print(bridge.port)            # e.g. /dev/pts/5
+#   ...
+#   bridge.close()
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class PtyBridge. """
+
+import os
+import select
+import termios
+import threading
+import tty
+
+BAUDRATES = {getattr(termios,f"B{rate}"): rate
+             for rate in (9600, 19200, 38400, 57600, 115200, 230400, 460800,
+                          921600, 1000000, 1500000, 2000000, 3000000)
+             if hasattr(termios,f"B{rate}")}
+""" termios speed -> baudrate """
+
+class PtyBridge:
+  """ forward data between a pseudo-terminal and a fake UART.
+
+  The baudrate set on the pty by the client is passed to the simulator
+  (as the baudrate of its UART), so AT+UART_CUR behaves as with real
+  hardware.
+  """
+
+  def __init__(self, uart, poll: float = 0.001) -> None:
+    """ constructor """
+    self.uart = uart
+    self._poll = poll
+    self._master, self._slave = os.openpty()
+    tty.setraw(self._slave)
+    attrs = termios.tcgetattr(self._slave)
+    speed = {rate: speed for speed, rate in BAUDRATES.items()}[uart.baudrate]
+    attrs[4] = attrs[5] = speed
+    termios.tcsetattr(self._slave,termios.TCSANOW,attrs)
+    self.port = os.ttyname(self._slave)
+    self._running = True
+    self._thread = threading.Thread(target=self._run,daemon=True)
+    self._thread.start()
+
+  def _sync_baudrate(self) -> None:
+    """ use the baudrate set by the client of the pty """
+    try:
+      speed = termios.tcgetattr(self._slave)[4]
+    except termios.error:
+      return
+    baudrate = BAUDRATES.get(speed)
+    if baudrate and baudrate != self.uart.baudrate:
+      self.uart.baudrate = baudrate
+
+  def _run(self) -> None:
+    """ forward data until closed """
+    while self._running:
+      readable, _, _ = select.select([self._master],[],[],self._poll)
+      self._sync_baudrate()
+      if readable:
+        try:
+          data = os.read(self._master,4096)
+        except OSError:
+          return
+        self.uart.write(data)
+      waiting = self.uart.in_waiting
+      if waiting:
+        os.write(self._master,self.uart.read(waiting))
+
+  def close(self) -> None:
+    """ stop forwarding and close the pty """
+    self._running = False
+    self._thread.join()
+    os.close(self._master)
+    os.close(self._slave)
+    self.uart.deinit()
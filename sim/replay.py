@@ -0,0 +1,136 @@
+# -------------------------------------------------------------------------
+# Class ReplayUART. Replays a session recorded with
+# esp32at.recorder.RecordingUART.
+#
+# The library runs against the ReplayUART just like against the real
+# co-processor: data written by the library is matched against the
+# recorded data, and recorded responses are released with the original
+# timing (relative to the preceding write), scaled by a speed factor.
+#
+# Usage as a script (print a summary of a recording):
+#
+#   python -m sim.replay session.bin
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class ReplayUART. """
+
+import sys
+import struct
+from collections import deque
+
+from sim import setup
+from sim.uart import FakeUART
+
+setup()
+# pylint: disable=wrong-import-position
+from esp32at.recorder import read_records, DIR_TX, DIR_RX, DIR_BAUDRATE
+
+class ReplayError(Exception):
+  """ data written by the library does not match the recording """
+
+def load(filename: str) -> list:
+  """ load all records from a file """
+  with open(filename,"rb") as stream:
+    return list(read_records(stream))
+
+class ReplayUART(FakeUART):
+  """ busio.UART compatible replay of a recorded session """
+
+  def __init__(self, records, speed: float = 1.0, strict: bool = True,
+               **kwargs) -> None:
+    """ constructor.
+
+    records: list of records or name of a recording
+    speed:   time scale, 2.0 replays twice as fast, 0 without delays
+    strict:  raise ReplayError if written data differs from the recording
+    """
+    super().__init__(**kwargs)
+    if isinstance(records,str):
+      records = load(records)
+    self._records = records
+    self._speed = speed
+    self._strict = strict
+    self._pos = 0
+    self._expect = b""
+    self._expect_ts = 0
+    self._scheduled = deque()
+    self.mismatches = 0
+    self.extra_bytes = 0
+    self._release(records[0][1] if records else 0,self._monotonic())
+
+  @property
+  def done(self) -> bool:
+    """ True if all records are consumed and released """
+    return (self._pos >= len(self._records) and not self._expect and
+            not self._scheduled)
+
+  def _release(self, ref_ts: int, ref_time: float) -> None:
+    """ schedule received data up to the next write of the library """
+    while self._pos < len(self._records):
+      direction, ts, data = self._records[self._pos]
+      if direction == DIR_TX:
+        self._expect = data
+        self._expect_ts = ts
+        self._pos += 1
+        return
+      if direction == DIR_RX:
+        delay = (ts - ref_ts)/1000/self._speed if self._speed > 0 else 0
+        self._scheduled.append((ref_time + max(delay,0),data))
+      elif direction == DIR_BAUDRATE:
+        pass                     # informational only
+      self._pos += 1
+
+  def _received(self, data: bytes) -> None:
+    """ match written data against the recording """
+    while data:
+      if not self._expect:
+        self.extra_bytes += len(data)
+        if self._strict:
+          raise ReplayError(f"unexpected write: {data!r}")
+        return
+      n = min(len(self._expect),len(data))
+      if self._expect[:n] != data[:n]:
+        self.mismatches += 1
+        if self._strict:
+          raise ReplayError(
+            f"expected {self._expect[:n]!r}, got {data[:n]!r}")
+      self._expect = self._expect[n:]
+      data = data[n:]
+      if not self._expect:
+        self._release(self._expect_ts,self._monotonic())
+
+  def _pump(self) -> None:
+    """ move due data into the receive buffer """
+    now = self._monotonic()
+    while self._scheduled and self._scheduled[0][0] <= now:
+      self.feed(self._scheduled.popleft()[1])
+
+def summary(records: list) -> dict:
+  """ return statistics of a recording """
+  info = {"records": len(records), "tx_bytes": 0, "rx_bytes": 0,
+          "commands": {}, "duration_s": 0, "baudrates": []}
+  for direction, ts, data in records:
+    info["duration_s"] = ts/1000
+    if direction == DIR_TX:
+      info["tx_bytes"] += len(data)
+      if data.startswith(b"AT"):
+        verb = data.split(b"=",1)[0].split(b"?",1)[0].decode(errors="replace")
+        info["commands"][verb] = info["commands"].get(verb,0) + 1
+    elif direction == DIR_RX:
+      info["rx_bytes"] += len(data)
+    elif direction == DIR_BAUDRATE:
+      info["baudrates"].append(struct.unpack("<I",data)[0])
+  return info
+
+if __name__ == "__main__":
+  if len(sys.argv) != 2:
+    print(f"usage: {sys.argv[0]} recording")
+    sys.exit(1)
+  for key, value in summary(load(sys.argv[1])).items():
+    print(f"{key}: {value}")
@@ -0,0 +1,167 @@
+# -------------------------------------------------------------------------
+# Class SimulatedSPI. A busio.SPI compatible bus with the SPI host
+# interface of ESP-AT in front of the simulator (see esp32at.spi).
+#
+# Usage:
+#
+#   from sim.esp_at import EspAtSimulator
+#   from sim.spi import SimulatedSPI
+#   from esp32at.spi import SPIBackend
+#
+#   simulator = EspAtSimulator(paced=False)
+#   bus = SimulatedSPI(simulator)
+#   backend = SPIBackend(bus,bus.cs,bus.handshake,baudrate=20000000)
+#   wifi.init(backend,reset_pin=simulator.reset_pin)
+#
+# The simulator should not be paced: the bus delays every transaction
+# according to the SPI clock (plus a fixed overhead for the handshake).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class SimulatedSPI. """
+
+from esp32at.spi import (CMD_WR_STATUS, CMD_RD_STATUS, CMD_WR_DATA,
+                         CMD_RD_DATA, CMD_WR_DONE, CMD_RD_DONE, MAGIC,
+                         DIR_NONE, DIR_READ, DIR_WRITE, MAX_TRANSFER)
+
+# pylint: disable=too-many-instance-attributes
+class SimulatedSPI:
+  """ SPI-bus, chip-select and handshake of a simulated co-processor """
+
+  def __init__(self, simulator, overhead: float = 20e-6) -> None:
+    """ constructor. overhead is the time per transaction (s) """
+    self.simulator = simulator
+    self.overhead = overhead
+    self.frequency = 100000
+    self.transactions = 0            # statistics
+    self.cs = _Pin(self._select)
+    self.handshake = _Pin(None,self._ready)
+    self._locked = False
+    self._cmd = None
+    self._out = bytearray()
+    self._nbytes = 0
+    self._pending_write = 0
+    self._read_len = 0
+    self._seq = 0
+
+  # --- protocol of the co-processor   ---------------------------------------
+
+  def _ready(self) -> bool:
+    """ level of the handshake-line """
+    return bool(self._pending_write or self.simulator.in_waiting)
+
+  def _status(self) -> bytes:
+    """ status of the co-processor: pending output first """
+    waiting = self.simulator.in_waiting
+    if waiting:
+      self._read_len = min(waiting,MAX_TRANSFER)
+      self._seq = (self._seq + 1) & 0xFF
+      return bytes([DIR_READ,self._seq,self._read_len & 0xFF,
+                    self._read_len >> 8])
+    if self._pending_write:
+      return bytes([DIR_WRITE,self._seq,self._pending_write & 0xFF,
+                    self._pending_write >> 8])
+    return bytes([DIR_NONE,0,0,0])
+
+  def _select(self, active: bool) -> None:
+    """ chip-select changed: start or finish a transaction """
+    if active:
+      self._cmd = None
+      self._out = bytearray()
+      self._nbytes = 0
+      return
+    if self._cmd is None:
+      return
+    self.transactions += 1
+    if self._cmd == CMD_WR_STATUS and len(self._out) == 4:
+      if self._out[0] == MAGIC:
+        self._pending_write = self._out[2] | self._out[3] << 8
+    elif self._cmd == CMD_WR_DATA:
+      self.simulator.write(bytes(self._out))
+    elif self._cmd == CMD_WR_DONE:
+      self._pending_write = 0
+    elif self._cmd == CMD_RD_DONE:
+      self._read_len = 0
+    # pylint: disable=protected-access
+    self.simulator._sleep(self.overhead + 8*self._nbytes/self.frequency)
+
+  # --- busio.SPI API   ------------------------------------------------------
+
+  def deinit(self) -> None:
+    """ nothing to release """
+
+  def try_lock(self) -> bool:
+    """ lock the bus """
+    if self._locked:
+      return False
+    self._locked = True
+    return True
+
+  def unlock(self) -> None:
+    """ unlock the bus """
+    self._locked = False
+
+  # pylint: disable=unused-argument
+  def configure(self, *, baudrate: int = 100000, polarity: int = 0,
+                phase: int = 0, bits: int = 8) -> None:
+    """ configure the bus """
+    self.frequency = baudrate
+
+  def write(self, buf, *, start: int = 0, end: int = None) -> None:
+    """ write data (the first three bytes are command, address, dummy) """
+    data = bytes(buf[start:end])
+    self._nbytes += len(data)
+    if self._cmd is None:
+      self._cmd = data[0]
+      data = data[3:]
+    self._out += data
+
+  def readinto(self, buf, *, start: int = 0, end: int = None,
+               write_value: int = 0) -> None:
+    """ read data for the current command """
+    view = memoryview(buf)[start:end]
+    self._nbytes += len(view)
+    if self._cmd == CMD_RD_STATUS:
+      view[:] = self._status()[:len(view)]
+    elif self._cmd == CMD_RD_DATA:
+      data = self.simulator.read(len(view)) or b""
+      view[:len(data)] = data
+    else:
+      view[:] = bytes(len(view))
+
+class _Pin:
+  """ part of the digitalio.DigitalInOut API used by SPIBackend """
+
+  def __init__(self, on_change=None, level=None) -> None:
+    self._on_change = on_change
+    self._level = level
+    self._value = True
+
+  def deinit(self) -> None:
+    """ nothing to release """
+
+  def switch_to_output(self, value: bool = False, **kwargs) -> None:
+    """ switch to output """
+    self.value = value
+
+  def switch_to_input(self, **kwargs) -> None:
+    """ switch to input """
+
+  @property
+  def value(self) -> bool:
+    """ level of the pin """
+    if self._level:
+      return self._level()
+    return self._value
+
+  @value.setter
+  def value(self, value: bool) -> None:
+    """ set level of the pin. Chip-select is active low """
+    if self._on_change and value != self._value:
+      self._on_change(not value)
+    self._value = value
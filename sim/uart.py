@@ -0,0 +1,123 @@
+# -------------------------------------------------------------------------
+# Class FakeUART. A busio.UART compatible in-memory UART for CPython.
+#
+# Subclasses implement _received() (data written by the library) and
+# _pump() (move pending data into the receive buffer using feed()).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class FakeUART. """
+
+import time
+
+class FakeUART:
+  """ busio.UART compatible in-memory UART """
+
+  def __init__(self, baudrate: int = 115200, timeout: float = 1,
+               receiver_buffer_size: int = None) -> None:
+    """ constructor. A receiver_buffer_size of None means unlimited """
+    self.baudrate = baudrate
+    self.timeout = timeout
+    self.receiver_buffer_size = receiver_buffer_size
+    self.overruns = 0
+    self._rx = bytearray()
+
+  # --- hooks for subclasses   -----------------------------------------------
+
+  def _received(self, data: bytes) -> None:
+    """ process data written by the library """
+
+  def _pump(self) -> None:
+    """ move pending data into the receive buffer """
+
+  def _sleep(self, duration: float) -> None:
+    """ sleep while waiting for data """
+    time.sleep(duration)
+
+  def _monotonic(self) -> float:
+    """ time source """
+    return time.monotonic()
+
+  def feed(self, data: bytes) -> None:
+    """ add data to the receive buffer. Data exceeding the buffer size
+    is dropped (like a real UART). """
+    if self.receiver_buffer_size is not None:
+      room = self.receiver_buffer_size - len(self._rx)
+      if len(data) > room:
+        self.overruns += len(data) - max(room,0)
+        data = data[:max(room,0)]
+    self._rx += data
+
+  def _wait(self, predicate) -> None:
+    """ wait at most timeout seconds until predicate() is true """
+    self._pump()
+    if predicate():
+      return
+    start = self._monotonic()
+    while self._monotonic() - start < self.timeout:
+      self._sleep(0.0005)
+      self._pump()
+      if predicate():
+        return
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ deinit the UART """
+
+  @property
+  def in_waiting(self) -> int:
+    """ number of bytes in the receive buffer """
+    self._pump()
+    return len(self._rx)
+
+  def read(self, nbytes: int = None) -> bytes:
+    """ read nbytes (or everything available). Returns None on timeout """
+    if nbytes is None:
+      self._wait(lambda: len(self._rx) > 0)
+      nbytes = len(self._rx)
+    else:
+      self._wait(lambda: len(self._rx) >= nbytes)
+    if not self._rx:
+      return None
+    data = bytes(self._rx[:nbytes])
+    del self._rx[:nbytes]
+    return data
+
+  def readinto(self, buf) -> int:
+    """ read into buffer. Returns None on timeout """
+    nbytes = len(buf)
+    self._wait(lambda: len(self._rx) >= nbytes)
+    nbytes = min(nbytes,len(self._rx))
+    if not nbytes:
+      return None
+    memoryview(buf)[:nbytes] = self._rx[:nbytes]
+    del self._rx[:nbytes]
+    return nbytes
+
+  def readline(self) -> bytes:
+    """ read a line (including the newline). Returns None on timeout """
+    self._wait(lambda: b"\n" in self._rx)
+    if not self._rx:
+      return None
+    end = self._rx.find(b"\n")
+    end = len(self._rx) if end < 0 else end + 1
+    data = bytes(self._rx[:end])
+    del self._rx[:end]
+    return data
+
+  def write(self, buf) -> int:
+    """ write data """
+    data = bytes(buf)
+    self._received(data)
+    return len(data)
+
+  def reset_input_buffer(self) -> None:
+    """ discard pending input """
+    self._pump()
+    self._rx = bytearray()
@@ -0,0 +1,141 @@
+# -------------------------------------------------------------------------
+# Class Backend. Base class for transport backends that are not a UART.
+#
+# The transport talks to the co-processor through an object with the
+# part of the busio.UART API used by the library:
+#
+#   in_waiting, read(), readinto(), readline(), write(),
+#   reset_input_buffer(), timeout, baudrate, deinit()
+#
+# and the optional attributes/methods:
+#
+#   at_uart:         False if the data does not pass the UART of the AT
+#                    firmware (the transport then never sends AT+UART_CUR
+#                    and never resets the baudrate)
+#   attach(transport): called by Transport.init()
+#
+# busio.UART, esp32at.host.SerialUART and esp32at.threaded.ThreadedUART
+# are backends. Subclasses of this class only implement the hooks _poll()
+# and _transmit(), and provide flow-control within these hooks (e.g.
+# esp32at.spi.SPIBackend with a handshake-line).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class Backend. """
+
+import time
+
+class Backend:
+  """ busio.UART compatible base class with an input buffer """
+
+  at_uart = False
+  """ data does not pass the UART of the AT firmware """
+
+  def __init__(self, timeout: float = 1) -> None:
+    """ constructor """
+    self.timeout = timeout
+    self._rx = bytearray()
+    self._transport = None
+
+  def attach(self, transport) -> None:
+    """ called by Transport.init(): use the clock of the transport """
+    self._transport = transport
+
+  # --- hooks for subclasses   -----------------------------------------------
+
+  def _poll(self) -> bool:
+    """ move available input from the device to self._rx (non-blocking).
+    Returns True if data was added """
+    raise NotImplementedError()
+
+  def _transmit(self, data: bytes) -> None:
+    """ send data to the device, blocking until it is accepted """
+    raise NotImplementedError()
+
+  # --- helpers   ------------------------------------------------------------
+
+  def _monotonic(self) -> float:
+    """ time source """
+    if self._transport:
+      return self._transport.monotonic()
+    return time.monotonic()
+
+  def _sleep(self, duration: float) -> None:
+    """ sleep while waiting for data """
+    if self._transport:
+      self._transport.sleep(duration)
+    else:
+      time.sleep(duration)
+
+  def _wait(self, predicate) -> None:
+    """ poll at most timeout seconds until predicate() is true """
+    self._poll()
+    if predicate():
+      return
+    start = self._monotonic()
+    while self._monotonic() - start < self.timeout:
+      if not self._poll():
+        self._sleep(0.0005)
+      if predicate():
+        return
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ release the device """
+
+  @property
+  def in_waiting(self) -> int:
+    """ number of bytes in the input buffer """
+    if not self._rx:
+      self._poll()
+    return len(self._rx)
+
+  def read(self, nbytes: int = None) -> bytes:
+    """ read nbytes (or everything available). Returns None on timeout """
+    if nbytes is None:
+      self._wait(lambda: self._rx)
+      nbytes = len(self._rx)
+    else:
+      self._wait(lambda: len(self._rx) >= nbytes)
+    if not self._rx:
+      return None
+    data = bytes(self._rx[:nbytes])
+    del self._rx[:nbytes]
+    return data
+
+  def readinto(self, buf) -> int:
+    """ read into buffer. Returns None on timeout """
+    nbytes = len(buf)
+    self._wait(lambda: len(self._rx) >= nbytes)
+    nbytes = min(nbytes,len(self._rx))
+    if not nbytes:
+      return None
+    buf[:nbytes] = self._rx[:nbytes]
+    del self._rx[:nbytes]
+    return nbytes
+
+  def readline(self) -> bytes:
+    """ read a line (including the newline). Returns None on timeout """
+    self._wait(lambda: b"\n" in self._rx)
+    if not self._rx:
+      return None
+    end = self._rx.find(b"\n")
+    end = len(self._rx) if end < 0 else end + 1
+    data = bytes(self._rx[:end])
+    del self._rx[:end]
+    return data
+
+  def write(self, buf) -> int:
+    """ write data """
+    self._transmit(bytes(buf))
+    return len(buf)
+
+  def reset_input_buffer(self) -> None:
+    """ discard pending input """
+    self._rx = bytearray()
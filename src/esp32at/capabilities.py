@@ -0,0 +1,76 @@
+# -------------------------------------------------------------------------
+# Class Capabilities. Features of the AT firmware of the co-processor.
+#
+# The table is built during Transport.init() from the firmware version
+# (AT+GMR) and is available as wifi.transport.caps. Modules query the
+# table instead of comparing version numbers or trying commands:
+#
+#   if transport.caps.cipstate:
+#     ...
+#
+# The minimal version from FEATURES decides. A self-compiled firmware
+# might lack a command: the transport calls unsupported() if a command
+# fails with 'unsupported command', which disables the features of the
+# command. The missing commands are part of the state of a warm start.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class Capabilities. """
+
+try:
+  from typing import Sequence
+except ImportError:
+  pass
+
+FEATURES = {
+  # name:          (command,       minimal version)
+  "cipstate":      ("CIPSTATE",    (2,2,2)),
+  "ciprecvtype":   ("CIPRECVTYPE", (3,0,0)),
+  "cipsendl":      ("CIPSENDL",    (3,0,0)),
+  "cwinit":        ("CWINIT",      (3,0,0)),
+  "server_type":   (None,          (3,0,0)),   # type-parameter of CIPSERVER
+  "start_timeout": (None,          (4,1,0)),   # timeout-parameter of CIPSTART
+  "mdns_txt":      (None,          (4,1,0)),   # instance/proto/txt of MDNS
+  }
+""" features: attribute-name -> (command, minimal version) """
+
+class Capabilities:
+  """ capability table of the AT firmware """
+
+  def __init__(self, version: Sequence[int],
+               missing: Sequence[str] = ()) -> None:
+    """ constructor. version is (major, minor, patch), missing are
+    commands known to be unsupported by this firmware build """
+    self.version = tuple(version)
+    self.missing = []
+    for name, (_, min_version) in FEATURES.items():
+      setattr(self,name,self.at_least(min_version))
+    for command in missing:
+      self.unsupported(command)
+
+  def unsupported(self, command: str) -> bool:
+    """ the firmware rejected the command as unsupported: disable
+    the features that depend on it. Returns True if a feature was
+    disabled """
+    disabled = False
+    for name, (feature_command, _) in FEATURES.items():
+      if feature_command == command and getattr(self,name):
+        setattr(self,name,False)
+        disabled = True
+    if disabled and command not in self.missing:
+      self.missing.append(command)
+    return disabled
+
+  def at_least(self, version: Sequence[int]) -> bool:
+    """ check for a minimal firmware version (major, minor, patch) """
+    return self.version >= tuple(version)
+
+  def __repr__(self) -> str:
+    """ readable representation """
+    features = [name for name in FEATURES if getattr(self,name)]
+    return f"Capabilities({self.version}: {', '.join(features)})"
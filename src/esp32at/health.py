@@ -0,0 +1,238 @@
+# -------------------------------------------------------------------------
+# Class HealthMonitor. Liveness monitoring of the co-processor with
+# bounded recovery.
+#
+# The monitor is driven by the application loop:
+#
+#   from esp32at.health import HealthMonitor, HEALTH_FAILED
+#
+#   monitor = HealthMonitor(wifi.transport,interval=10,budget=30)
+#   while True:
+#     ...
+#     if monitor.check() == HEALTH_FAILED:
+#       microcontroller.reset()
+#
+# check() is cheap: it only pings the firmware with AT if the UART was
+# silent for interval seconds, or if too many commands timed out since
+# the last check. A failed ping escalates from resync (input buffer,
+# baudrate) to a soft reset and then to a hard reset (needs reset_pin),
+# until the firmware answers or the downtime budget is used up.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class HealthMonitor. """
+
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+try:
+  from typing import Callable, Optional
+except ImportError:
+  pass
+
+from esp32at.transport import Transport, RebootError
+
+HEALTH_OK = const(0)
+""" the firmware answers """
+
+HEALTH_RECOVERING = const(1)
+""" the firmware did not answer, recovery is in progress """
+
+HEALTH_FAILED = const(2)
+""" recovery failed within the downtime budget """
+
+LEVEL_NONE = const(0)
+LEVEL_RESYNC = const(1)
+LEVEL_SOFT_RESET = const(2)
+LEVEL_HARD_RESET = const(3)
+
+STATE_NAMES = ("ok", "recovering", "failed")
+LEVEL_NAMES = ("none", "resync", "soft-reset", "hard-reset")
+
+# pylint: disable=too-many-instance-attributes
+class HealthMonitor:
+  """ liveness monitor of the co-processor """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, transport: Transport, *,
+               interval: float = 10,
+               timeout_rate: float = 0.5,
+               budget: float = 60,
+               recover: Optional[Callable[[], bool]] = None) -> None:
+    """ constructor.
+
+    interval:     ping after this many seconds of silence on the UART
+    timeout_rate: ping if more than this fraction of the commands since
+                  the last check timed out
+    budget:       maximal downtime (s) before the state is HEALTH_FAILED
+    recover:      called after a reset to reconfigure the co-processor
+                  (default: replay the session, see esp32at.session).
+                  Must return True on success
+    """
+    self._t = transport
+    self.interval = interval
+    self.timeout_rate = timeout_rate
+    self.budget = budget
+    self.recover = recover
+    self.state = HEALTH_OK
+    self.level = LEVEL_NONE          # last escalation level
+    self.down_since = None
+    self.pings = 0
+    self.failures = 0
+    self.recoveries = 0
+    self.downtime = 0                # accumulated downtime (s)
+    self.max_downtime = 0
+    self._rebooted = False
+    self._commands, self._timeouts = self._counters()
+
+  def _counters(self) -> tuple:
+    """ number of commands and timeouts from the metrics """
+    metrics = self._t.metrics
+    return (sum(entry[0] for entry in metrics.commands.values()),
+            metrics.timeouts)
+
+  def _ping(self) -> bool:
+    """ check if the firmware answers a bare AT """
+    self.pings += 1
+    try:
+      reply = self._t.send_atcmd("AT",timeout=1,retries=1)
+      if reply[-1] != "OK":
+        return False
+      if reply[0] == "AT":            # echo is on after a silent reboot
+        self._rebooted = True
+        return False
+      return True
+    except RebootError:
+      # configuration is lost, unless the session was restored
+      session = self._t.session
+      self._rebooted = not (session.armed and session.restored)
+      return False
+    except Exception: # pylint: disable=broad-except
+      return False
+
+  def check(self) -> int:
+    """ check the co-processor (if necessary) and recover. Returns the
+    health state """
+    t = self._t
+    commands, timeouts = self._counters()
+    n_commands = commands - self._commands
+    n_timeouts = timeouts - self._timeouts
+    self._commands, self._timeouts = commands, timeouts
+
+    if (self.state == HEALTH_OK and
+        t.monotonic() - t.last_input < self.interval and
+        n_timeouts <= self.timeout_rate*n_commands):
+      return self.state               # recent traffic and no problems
+    if t.passthrough:
+      return self.state               # AT not possible (and data flows)
+    if self._ping():
+      self._healthy()
+    else:
+      self.failures += 1
+      self._escalate()
+    self._commands, self._timeouts = self._counters()
+    return self.state
+
+  def _healthy(self) -> None:
+    """ firmware answers again """
+    if self.down_since is not None:
+      down = self._t.monotonic() - self.down_since
+      self.downtime += down
+      self.max_downtime = max(self.max_downtime,down)
+      self.recoveries += 1
+      self.down_since = None
+    self.state = HEALTH_OK
+    self.level = LEVEL_NONE
+    self._rebooted = False
+
+  def _escalate(self) -> None:
+    """ escalate until the firmware answers or the budget is used up """
+    t = self._t
+    if self.down_since is None:
+      self.down_since = t.monotonic()
+    self.state = HEALTH_RECOVERING
+    for level, step in ((LEVEL_RESYNC,self._resync),
+                        (LEVEL_SOFT_RESET,self._soft_reset),
+                        (LEVEL_HARD_RESET,self._hard_reset)):
+      if t.monotonic() - self.down_since > self.budget:
+        break
+      self.level = level
+      t.log("health: {}",LEVEL_NAMES[level])
+      if step():
+        self._healthy()
+        return
+    if t.monotonic() - self.down_since > self.budget:
+      self.state = HEALTH_FAILED
+
+  def _resync(self) -> bool:
+    """ discard stale input and state, find the baudrate. After a
+    reboot of the firmware, reconfigure it """
+    t = self._t
+    with t.lock:
+      t.busy = False
+      t._uart.reset_input_buffer() # pylint: disable=protected-access
+      if not self._rebooted and self._ping():
+        return True
+      try:
+        if not t.detect_baudrate():
+          return False
+      except Exception: # pylint: disable=broad-except
+        return False
+    if not self._rebooted and self._ping():
+      return True
+    if self._rebooted:                # maybe detected by the last ping
+      return self._after_reset(True)
+    return False
+
+  def _after_reset(self, ok: bool) -> bool:
+    """ reconfigure the co-processor after a reset """
+    if not ok:
+      return False
+    self._rebooted = False
+    recover = self.recover
+    if recover is None and self._t.session.armed:
+      recover = self._t.session.restore
+    if recover:
+      try:
+        if not recover():
+          return False
+      except Exception: # pylint: disable=broad-except
+        return False
+    return self._ping()
+
+  def _soft_reset(self) -> bool:
+    """ reset with AT+RST """
+    try:
+      return self._after_reset(self._t.soft_reset())
+    except Exception: # pylint: disable=broad-except
+      return False
+
+  def _hard_reset(self) -> bool:
+    """ reset with the reset-pin """
+    return self._after_reset(self._t.hard_reset())
+
+  def snapshot(self) -> dict:
+    """ health state as a dict """
+    down = 0
+    if self.down_since is not None:
+      down = self._t.monotonic() - self.down_since
+    return {
+      "state": STATE_NAMES[self.state],
+      "level": LEVEL_NAMES[self.level],
+      "pings": self.pings,
+      "failures": self.failures,
+      "recoveries": self.recoveries,
+      "down_s": down,
+      "downtime_s": self.downtime,
+      "max_downtime_s": self.max_downtime,
+      "silence_s": self._t.monotonic() - self._t.last_input,
+      }
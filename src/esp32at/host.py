@@ -0,0 +1,157 @@
+# -------------------------------------------------------------------------
+# Host backend: run the library on CPython (e.g. on a Linux SBC) with an
+# ESP-AT module attached to a serial port (USB-serial adapter, pty, ...).
+#
+# Usage:
+#
+#   from esp32at import host
+#   import wifi
+#
+#   uart = host.SerialUART("/dev/ttyUSB0",baudrate=115200)
+#   wifi.init(uart,reset_pin=host.SerialResetPin(uart),...)
+#
+# This module needs pyserial (pip install circuitpython-esp32at[host]).
+# It is not meant for CircuitPython.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" host backend: class SerialUART, class SerialResetPin """
+
+class SerialUART:
+  """ busio.UART compatible wrapper of a pyserial port.
+
+  port is a device (e.g. /dev/ttyUSB0, COM3 or the slave side of a pty)
+  or an URL supported by serial.serial_for_url() (e.g. socket://host:port).
+  """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, port: str, *, baudrate: int = 115200,
+               timeout: float = 1, rtscts: bool = False,
+               receiver_buffer_size: int = None, **kwargs) -> None:
+    """ constructor. receiver_buffer_size is ignored (the OS buffers) """
+    import serial          # pylint: disable=import-outside-toplevel
+    self._serial = serial.serial_for_url(port,baudrate=baudrate,
+                                         timeout=timeout,rtscts=rtscts,
+                                         **kwargs)
+
+  @property
+  def serial(self):
+    """ the underlying serial.Serial object """
+    return self._serial
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ close the port """
+    self._serial.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.deinit()
+
+  @property
+  def baudrate(self) -> int:
+    """ baudrate of the port """
+    return self._serial.baudrate
+
+  @baudrate.setter
+  def baudrate(self, value: int) -> None:
+    """ set baudrate of the port """
+    self._serial.baudrate = value
+
+  @property
+  def timeout(self) -> float:
+    """ read timeout of the port """
+    return self._serial.timeout
+
+  @timeout.setter
+  def timeout(self, value: float) -> None:
+    """ set read timeout of the port """
+    self._serial.timeout = value
+
+  @property
+  def in_waiting(self) -> int:
+    """ number of bytes in the input buffer """
+    return self._serial.in_waiting
+
+  def read(self, nbytes: int = None) -> bytes:
+    """ read bytes. Returns None if nothing was read (like busio.UART) """
+    if nbytes is None:
+      nbytes = max(1,self._serial.in_waiting)
+    data = self._serial.read(nbytes)
+    return data if data else None
+
+  def readinto(self, buf) -> int:
+    """ read bytes into the given buffer. Returns None on timeout """
+    data = self._serial.read(len(buf))
+    if not data:
+      return None
+    memoryview(buf)[:len(data)] = data
+    return len(data)
+
+  def readline(self) -> bytes:
+    """ read a line (up to and including \\n) """
+    data = self._serial.readline()
+    return data if data else None
+
+  def write(self, buf) -> int:
+    """ write bytes """
+    return self._serial.write(buf)
+
+  def reset_input_buffer(self) -> None:
+    """ discard pending input """
+    self._serial.reset_input_buffer()
+
+class SerialResetPin:
+  """ reset via the RTS or DTR line of a serial port.
+
+  Most ESP32 dev-boards connect RTS (via a transistor) to EN and DTR
+  to GPIO0. Asserting the line pulls EN low (inverted=True), so the
+  value of the pin is the level of EN. The other line is released,
+  otherwise the ESP32 might start the bootloader.
+
+  The object implements the part of the digitalio.DigitalInOut API used
+  by the library, so pass it as reset_pin to wifi.init().
+  """
+
+  def __init__(self, uart: SerialUART, line: str = "rts",
+               inverted: bool = True) -> None:
+    """ constructor """
+    if line not in ("rts","dtr"):
+      raise ValueError("line must be 'rts' or 'dtr'")
+    self._serial = uart.serial
+    self._line = line
+    self._inverted = inverted
+    self._value = True
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.deinit()
+
+  def deinit(self) -> None:
+    """ nothing to release """
+
+  def switch_to_output(self, value: bool = False, **kwargs) -> None:
+    """ release the other line and set the value """
+    setattr(self._serial,"dtr" if self._line == "rts" else "rts",False)
+    self.value = value
+
+  @property
+  def value(self) -> bool:
+    """ level of the reset-pin """
+    return self._value
+
+  @value.setter
+  def value(self, value: bool) -> None:
+    """ set level of the reset-pin """
+    self._value = value
+    setattr(self._serial,self._line,value != self._inverted)
@@ -0,0 +1,135 @@
+# -------------------------------------------------------------------------
+# Class Metrics. Low-overhead counters and latency histograms for the
+# Transport.
+#
+# The instance is available as wifi.transport.metrics
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class Metrics. """
+
+try:
+  from typing import Sequence
+except ImportError:
+  pass
+
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+""" upper bounds (ms) of the latency histogram buckets. The last
+bucket of each histogram counts all values above the last bound. """
+
+class Metrics:
+  """ Counters for AT commands, latencies, errors and data volume.
+
+  All counters are plain integers updated in place, so keeping
+  metrics enabled costs almost nothing. Use snapshot() to get a copy
+  and reset() to start over.
+  """
+
+  def __init__(self, buckets: Sequence[int] = LATENCY_BUCKETS) -> None:
+    """ constructor """
+    self.buckets = buckets
+    self.reset()
+
+  def reset(self) -> None:
+    """ reset all counters """
+    self.commands = {}       # verb -> [count, sum_ms, max_ms, histogram]
+    self.retries = 0
+    self.timeouts = 0
+    self.busy = 0
+    self.errors = 0
+    self.error_codes = {}    # ERR CODE -> count
+    self.urcs = {}           # urc name -> count
+    self.bytes_out = {}      # link_id -> bytes
+    self.bytes_in = {}       # link_id -> bytes
+
+  @staticmethod
+  def verb(at_cmd: str) -> str:
+    """ extract the verb of an AT command, e.g. CIPSEND """
+    end = len(at_cmd)
+    for sep in "=?":
+      pos = at_cmd.find(sep)
+      if 0 <= pos < end:
+        end = pos
+    if at_cmd.startswith("AT+"):
+      return at_cmd[3:end]
+    return at_cmd[:end]
+
+  def add_command(self, verb: str, latency: float) -> None:
+    """ account for a completed command with the given latency (s) """
+    entry = self.commands.get(verb)
+    if entry is None:
+      entry = [0, 0, 0, [0]*(len(self.buckets)+1)]
+      self.commands[verb] = entry
+    latency = int(1000*latency)
+    entry[0] += 1
+    entry[1] += latency
+    if latency > entry[2]:
+      entry[2] = latency
+    hist = entry[3]
+    for index, bound in enumerate(self.buckets):
+      if latency <= bound:
+        hist[index] += 1
+        return
+    hist[-1] += 1
+
+  def add_error_code(self, code: int) -> None:
+    """ count an error code (ERR CODE:0x...) """
+    self.error_codes[code] = self.error_codes.get(code,0) + 1
+
+  def add_urc(self, name: str) -> None:
+    """ count an unsolicited result code """
+    self.urcs[name] = self.urcs.get(name,0) + 1
+
+  def add_bytes_out(self, link_id: int, count: int) -> None:
+    """ count bytes sent on the given link """
+    self.bytes_out[link_id] = self.bytes_out.get(link_id,0) + count
+
+  def add_bytes_in(self, link_id: int, count: int) -> None:
+    """ count bytes received on the given link """
+    self.bytes_in[link_id] = self.bytes_in.get(link_id,0) + count
+
+  def snapshot(self) -> dict:
+    """ return a copy of all counters.
+
+    Commands are returned as verb -> dict(count, avg_ms, max_ms,
+    histogram), where histogram has one entry per bucket plus one for
+    values above the last bucket.
+    """
+    commands = {}
+    for verb, (count, total, maximum, hist) in self.commands.items():
+      commands[verb] = {
+        "count": count,
+        "avg_ms": total/count if count else 0,
+        "max_ms": maximum,
+        "histogram": list(hist)
+        }
+    return {
+      "buckets_ms": list(self.buckets),
+      "commands": commands,
+      "retries": self.retries,
+      "timeouts": self.timeouts,
+      "busy": self.busy,
+      "errors": self.errors,
+      "error_codes": dict(self.error_codes),
+      "urcs": dict(self.urcs),
+      "bytes_out": dict(self.bytes_out),
+      "bytes_in": dict(self.bytes_in)
+      }
+
+  def dump(self) -> None:
+    """ print a human readable summary """
+    snap = self.snapshot()
+    print(f"{'verb':<16}{'count':>8}{'avg ms':>10}{'max ms':>10}")
+    for verb, info in sorted(snap["commands"].items()):
+      print(f"{verb:<16}{info['count']:>8}{info['avg_ms']:>10.1f}" +
+            f"{info['max_ms']:>10}")
+    print(f"retries: {snap['retries']}, timeouts: {snap['timeouts']}, " +
+          f"busy: {snap['busy']}, errors: {snap['errors']}")
+    print(f"urcs: {snap['urcs']}")
+    print(f"bytes out: {snap['bytes_out']}")
+    print(f"bytes in:  {snap['bytes_in']}")
@@ -0,0 +1,168 @@
+# -------------------------------------------------------------------------
+# Class PhaseTracer. Opt-in timing of the phases of a socket's life.
+#
+# Enable the tracer with
+#
+#   from esp32at.phases import PhaseTracer
+#   wifi.transport.phases = PhaseTracer()
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class PhaseTracer. """
+
+import time
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+PH_DNS = const(0)
+""" getaddrinfo() (duration) """
+
+PH_SNI = const(1)
+""" AT+CIPSSLCSNI finished """
+
+PH_CONNECT = const(2)
+""" AT+CIPSTART finished with CONNECT (includes TLS handshake) """
+
+PH_SEND = const(3)
+""" first SEND OK """
+
+PH_FIRST_BYTE = const(4)
+""" first +IPD """
+
+PH_CLOSE = const(5)
+""" socket closed """
+
+PHASE_NAMES = ("dns", "sni", "connect", "send", "first_byte", "close")
+""" names of the phases, indices match the PH_* constants """
+
+class Timings:
+  """ Timestamps of a single connection.
+
+  marks[PH_DNS] is the duration of the name lookup, all other marks
+  are offsets (in seconds) from the start of connect(). The duration of
+  a phase is the time since the phase before it, so a phase is only
+  timed if the phase before it was reached.
+  """
+
+  def __init__(self, host: str, dns: float = None, clock=None) -> None:
+    """ constructor """
+    self._clock = clock if clock else time.monotonic
+    self.host = host
+    self.start = self._clock()
+    self.marks = [dns, None, None, None, None, None]
+
+  def mark(self, phase: int) -> None:
+    """ record the first occurence of the given phase """
+    if self.marks[phase] is None:
+      self.marks[phase] = self._clock() - self.start
+
+  def durations(self) -> dict:
+    """ return the duration of every phase reached so far """
+    marks = self.marks
+    result = {}
+    if marks[PH_DNS] is not None:
+      result[PHASE_NAMES[PH_DNS]] = marks[PH_DNS]
+    last = 0                          # start of connect()
+    for phase in range(PH_SNI,len(PHASE_NAMES)):
+      if marks[phase] is None or last is None:
+        last = None                   # e.g. no send: no first_byte
+        continue
+      result[PHASE_NAMES[phase]] = marks[phase] - last
+      last = marks[phase]
+    return result
+
+class PhaseTracer:
+  """ Collect timings of connections per socket and per host """
+
+  def __init__(self, keep: int = 8, clock=None) -> None:
+    """ constructor: keep the last <keep> finished timings. clock
+    overrides the clock passed to start() """
+    self._keep = keep
+    self._clock = clock
+    self._dns = {}        # ip -> (hostname, duration)
+    self._active = {}     # link_id -> Timings
+    self._hosts = {}      # host -> [count, counts, sums, maxima]
+    self.finished = []
+
+  def dns(self, host: str, ipaddr: str, duration: float) -> None:
+    """ record a name lookup """
+    self._dns[ipaddr] = (host,duration)
+
+  def start(self, link_id: int, host: str, clock=None) -> Timings:
+    """ start timing of a new connection, usually with the clock of the
+    transport (the same clock as the dns duration) """
+    host, dns = self._dns.pop(host,(host,None))
+    timings = Timings(host,dns,self._clock if self._clock else clock)
+    self._active[link_id] = timings
+    return timings
+
+  def mark(self, link_id: int, phase: int) -> None:
+    """ mark a phase of the given link (ignored for unknown links) """
+    timings = self._active.get(link_id)
+    if timings:
+      timings.mark(phase)
+
+  def finish(self, link_id: int, timings: Timings = None) -> None:
+    """ finish timing of the given link and update host statistics.
+    With timings, only finish if the link still belongs to it """
+    if timings and self._active.get(link_id) is not timings:
+      return
+    timings = self._active.pop(link_id,None)
+    if not timings:
+      return
+    timings.mark(PH_CLOSE)
+
+    self.finished.append(timings)
+    if len(self.finished) > self._keep:
+      self.finished.pop(0)
+
+    stats = self._hosts.get(timings.host)
+    if not stats:
+      stats = [0, {}, {}, {}]
+      self._hosts[timings.host] = stats
+    stats[0] += 1
+    for name, value in timings.durations().items():
+      stats[1][name] = stats[1].get(name,0) + 1
+      stats[2][name] = stats[2].get(name,0) + value
+      stats[3][name] = max(stats[3].get(name,0),value)
+
+  def summary(self) -> dict:
+    """ return per-host statistics: host -> phase -> (avg, max). The
+    average of a phase only includes the connections that reached it """
+    result = {}
+    for host, (count, counts, sums, maxima) in self._hosts.items():
+      result[host] = {"count": count}
+      for name in PHASE_NAMES:
+        if name in sums:
+          result[host][name] = (sums[name]/counts[name], maxima[name])
+    return result
+
+  def reset(self) -> None:
+    """ clear all collected data """
+    self._dns = {}
+    self._active = {}
+    self._hosts = {}
+    self.finished = []
+
+  def dump(self) -> None:
+    """ print per-host statistics (avg/max in ms) """
+    print(f"{'host':<24}{'n':>4}" +
+          "".join([f"{name:>16}" for name in PHASE_NAMES]))
+    for host, info in self.summary().items():
+      line = f"{host[:23]:<24}{info['count']:>4}"
+      for name in PHASE_NAMES:
+        if name in info:
+          avg, maximum = info[name]
+          line += f"{1000*avg:>9.0f}/{1000*maximum:<6.0f}"
+        else:
+          line += f"{'-':>16}"
+      print(line)
@@ -0,0 +1,163 @@
+# -------------------------------------------------------------------------
+# Class RecordingUART. Wrapper for busio.UART that records all traffic
+# between the MCU and the co-processor with timestamps.
+#
+# Usage:
+#
+#   from esp32at.recorder import RecordingUART
+#   uart = busio.UART(...)
+#   wifi.init(RecordingUART(uart,open("/sd/session.bin","wb")),...)
+#
+# The recording can be replayed on a host (see sim/replay.py).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class RecordingUART. """
+
+from __future__ import annotations
+
+import time
+import struct
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+try:
+  from typing import Iterator, Tuple
+  import circuitpython_typing
+except ImportError:
+  pass
+
+HEADER_FORMAT = "<BIH"
+""" record header: direction, timestamp (ms), length of data """
+
+HEADER_SIZE = const(7)
+""" size of the record header """
+
+DIR_TX = const(0)
+""" data written by the MCU """
+
+DIR_RX = const(1)
+""" data read by the MCU """
+
+DIR_BAUDRATE = const(2)
+""" baudrate change (data: baudrate as 32-bit little endian) """
+
+class RecordingUART:
+  """ busio.UART compatible wrapper that records all traffic.
+
+  Every call that transfers data appends a record (header + data) to
+  the given stream. Data discarded by reset_input_buffer() is recorded
+  as received data, so a replay sees exactly the same byte stream.
+  """
+
+  def __init__(self, uart, stream, flush: bool = False) -> None:
+    """ constructor """
+    self._uart = uart
+    self._stream = stream
+    self._flush = flush
+    self.at_uart = getattr(uart,"at_uart",True)   # see esp32at.backend
+    self._start = time.monotonic()
+    self._add(DIR_BAUDRATE,struct.pack("<I",uart.baudrate))
+
+  def _add(self, direction: int, data) -> None:
+    """ add a record """
+    if not data:
+      return
+    ts = int(1000*(time.monotonic()-self._start)) & 0xFFFFFFFF
+    for offset in range(0,len(data),0xFFFF):
+      chunk = data[offset:offset+0xFFFF]
+      self._stream.write(struct.pack(HEADER_FORMAT,direction,ts,len(chunk)))
+      self._stream.write(chunk)
+    if self._flush:
+      self._stream.flush()
+
+  def attach(self, transport) -> None:
+    """ called by Transport.init(): pass to the wrapped backend """
+    if hasattr(self._uart,"attach"):
+      self._uart.attach(transport)
+
+  def close(self) -> None:
+    """ close the recording (the UART stays open) """
+    self._stream.close()
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ deinit the UART and close the recording """
+    self.close()
+    self._uart.deinit()
+
+  @property
+  def baudrate(self) -> int:
+    """ baudrate of the UART """
+    return self._uart.baudrate
+
+  @baudrate.setter
+  def baudrate(self, value: int) -> None:
+    """ set baudrate of the UART """
+    self._uart.baudrate = value
+    self._add(DIR_BAUDRATE,struct.pack("<I",value))
+
+  @property
+  def timeout(self) -> float:
+    """ timeout of the UART """
+    return self._uart.timeout
+
+  @timeout.setter
+  def timeout(self, value: float) -> None:
+    """ set timeout of the UART """
+    self._uart.timeout = value
+
+  @property
+  def in_waiting(self) -> int:
+    """ number of bytes in the input buffer """
+    return self._uart.in_waiting
+
+  def read(self, nbytes: int = None) -> bytes:
+    """ read bytes """
+    data = self._uart.read(nbytes)
+    self._add(DIR_RX,data)
+    return data
+
+  def readinto(self, buf: circuitpython_typing.WriteableBuffer) -> int:
+    """ read bytes into the given buffer """
+    n = self._uart.readinto(buf)
+    if n:
+      self._add(DIR_RX,bytes(memoryview(buf)[:n]))
+    return n
+
+  def readline(self) -> bytes:
+    """ read a line """
+    data = self._uart.readline()
+    self._add(DIR_RX,data)
+    return data
+
+  def write(self, buf: circuitpython_typing.ReadableBuffer) -> int:
+    """ write bytes """
+    self._add(DIR_TX,bytes(buf))
+    return self._uart.write(buf)
+
+  def reset_input_buffer(self) -> None:
+    """ discard pending input (recorded as received data) """
+    waiting = self._uart.in_waiting
+    if waiting:
+      self._add(DIR_RX,self._uart.read(waiting))
+    self._uart.reset_input_buffer()
+
+def read_records(stream) -> Iterator[Tuple[int, int, bytes]]:
+  """ read records (direction, timestamp_ms, data) from a stream """
+  while True:
+    header = stream.read(HEADER_SIZE)
+    if not header or len(header) < HEADER_SIZE:
+      return
+    direction, ts, length = struct.unpack(HEADER_FORMAT,header)
+    yield direction, ts, stream.read(length)
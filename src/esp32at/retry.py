@@ -0,0 +1,139 @@
+# -------------------------------------------------------------------------
+# Retry policies and classification of ESP-AT error codes.
+#
+# With AT+SYSLOG=1 the firmware reports an error code before ERROR:
+#
+#   ERR CODE:0x01090000
+#
+# The code is 0x01<sub-category><extension>. Errors caused by the
+# command itself (syntax, parameters, unsupported command) are fatal:
+# repeating the command won't help. Failed executions are transient and
+# are retried with exponential backoff and jitter, within the time
+# budget of the policy for the command (verb). 'busy p...' is no error
+# at all: the Transport resubmits the command once the co-processor is
+# idle.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" retry policies and error codes """
+
+import random
+
+try:
+  from typing import Optional, Sequence
+except ImportError:
+  pass
+
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+ERR_COMMON = const(0x01)
+ERR_NO_TERMINATOR = const(0x02)
+ERR_NO_AT = const(0x03)
+ERR_PARA_LENGTH = const(0x04)
+ERR_PARA_TYPE = const(0x05)
+ERR_PARA_NUM = const(0x06)
+ERR_PARA_INVALID = const(0x07)
+ERR_PARA_PARSE = const(0x08)
+ERR_UNSUPPORTED = const(0x09)
+ERR_EXEC_FAIL = const(0x0A)
+ERR_PROCESSING = const(0x0B)
+ERR_OP_ERROR = const(0x0C)
+
+ERR_NAMES = {
+  ERR_COMMON:        "common error",
+  ERR_NO_TERMINATOR: "no terminator",
+  ERR_NO_AT:         "no AT prefix",
+  ERR_PARA_LENGTH:   "parameter length mismatch",
+  ERR_PARA_TYPE:     "parameter type mismatch",
+  ERR_PARA_NUM:      "wrong number of parameters",
+  ERR_PARA_INVALID:  "invalid parameter",
+  ERR_PARA_PARSE:    "parameter parse error",
+  ERR_UNSUPPORTED:   "unsupported command",
+  ERR_EXEC_FAIL:     "execution failed",
+  ERR_PROCESSING:    "command in progress",
+  ERR_OP_ERROR:      "operation error",
+  }
+""" sub-category -> description """
+
+RETRYABLE = (ERR_EXEC_FAIL, ERR_PROCESSING)
+""" sub-categories of transient errors """
+
+FATAL_MESSAGES = ("link is not valid", "ALREADY CONNECTED", "no ip")
+""" messages before ERROR that are never fixed by a retry """
+
+def decode(reply: Sequence[str]) -> Optional[int]:
+  """ return the error code (ERR CODE:0x...) of a reply, or None """
+  for line in reply:
+    if line.startswith("ERR CODE:"):
+      try:
+        return int(line[9:],16)
+      except ValueError:
+        return None
+  return None
+
+def sub_category(code: int) -> int:
+  """ sub-category of an error code """
+  return (code >> 16) & 0xFF
+
+def describe(code: int) -> str:
+  """ readable description of an error code """
+  name = ERR_NAMES.get(sub_category(code),"unknown error")
+  return f"{name} (0x{code:08x})"
+
+def retryable(reply: Sequence[str]) -> bool:
+  """ check if an ERROR reply is worth a retry """
+  for line in reply:
+    if line in FATAL_MESSAGES:
+      return False
+  code = decode(reply)
+  return code is not None and sub_category(code) in RETRYABLE
+
+class RetryPolicy:
+  """ retry policy of a command """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, attempts: int = 3, base: float = 0.02,
+               factor: float = 2, max_delay: float = 0.5,
+               budget: float = 2, jitter: float = 0.5) -> None:
+    """ constructor.
+
+    attempts:  maximal number of attempts for transient errors
+    base:      delay (s) before the first retry
+    factor:    growth of the delay per retry
+    max_delay: upper limit of a single delay (s)
+    budget:    no retry is started after this time (s)
+    jitter:    randomize delays by this fraction (avoids lock-step)
+    """
+    self.attempts = attempts
+    self.base = base
+    self.factor = factor
+    self.max_delay = max_delay
+    self.budget = budget
+    self.jitter = jitter
+
+  def delay(self, attempt: int) -> float:
+    """ delay before the given retry (1 is the first retry) """
+    delay = min(self.max_delay,self.base*self.factor**(attempt-1))
+    return delay*(1 - self.jitter*random.random())
+
+DEFAULT_POLICY = RetryPolicy()
+""" policy for all commands without an entry in POLICIES """
+
+POLICIES = {
+  "CIPSTART": RetryPolicy(attempts=3,base=0.5,max_delay=2,budget=10),
+  "CIPCLOSE": RetryPolicy(attempts=1),      # fails for closed links
+  "CWJAP":    RetryPolicy(attempts=1),      # retried by the firmware
+  "RST":      RetryPolicy(attempts=1),
+  "RESTORE":  RetryPolicy(attempts=1),
+  }
+""" policies per command (verb) """
@@ -0,0 +1,123 @@
+# -------------------------------------------------------------------------
+# Class Session. The configuration applied to a co-processor during the
+# current session, replayed after a reboot of the firmware.
+#
+# A reboot (e.g. a brown-out or a crash of the firmware) loses all
+# state of the co-processor: multi-connection and passive receive mode,
+# the baudrate, the association with the AP, the server and its
+# timeout. The components record the steps necessary to restore this
+# state (Transport.init(), Radio.connect(), Socket.bind() and so on).
+# Transport.read_atmsg() notes the boot messages, and the steps are
+# replayed before the next command (Transport.restore_session()). The
+# interrupted command is sent again. Open links are lost anyway: their
+# sockets fail with ECONNRESET.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class Session. """
+
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+try:
+  from typing import Callable
+except ImportError:
+  pass
+
+STEP_INIT = const(0)
+""" Transport.init(): multi-connections, passive mode, baudrate """
+
+STEP_CONFIG = const(1)
+""" wifi.init(): settings of the Config """
+
+STEP_CONNECT = const(2)
+""" Radio.connect(): association with the AP """
+
+STEP_SERVER = const(3)
+""" Socket.bind(): server """
+
+STEP_SERVER_TIMEOUT = const(4)
+""" Socket.settimeout() of the server """
+
+STEP_NAMES = ("init", "config", "connect", "server", "server-timeout")
+
+class Session:
+  """ replayable configuration of a co-processor """
+
+  def __init__(self, transport) -> None:
+    """ constructor """
+    self._t = transport
+    self._steps = [None]*len(STEP_NAMES)
+    self._listeners = []
+    self.suspended = 0                # >0: reboot is expected (e.g. AT+RST)
+    self.restoring = False
+    self.restored = False             # last reboot was handled
+    self.restores = 0
+    self.failures = 0
+    self.duration = 0                 # duration (s) of the last restore
+
+  @property
+  def armed(self) -> bool:
+    """ True if a reboot is restored automatically """
+    return self._steps[STEP_INIT] is not None and not self.suspended
+
+  def record(self, step: int, func: Callable) -> None:
+    """ record a step. func() replays it and fails with an exception
+    or by returning False """
+    if not self.restoring:
+      self._steps[step] = func
+
+  def forget(self, step: int) -> None:
+    """ remove a step (e.g. after the server is stopped) """
+    if not self.restoring:
+      self._steps[step] = None
+
+  def clear(self) -> None:
+    """ remove all steps (start of a new session) """
+    if not self.restoring:
+      self._steps = [None]*len(STEP_NAMES)
+
+  def add_listener(self, func: Callable[[], None]) -> None:
+    """ func() is called after a reboot, before the steps are replayed """
+    self._listeners.append(func)
+
+  @property
+  def steps(self) -> list:
+    """ names of the recorded steps """
+    return [STEP_NAMES[i] for i, func in enumerate(self._steps) if func]
+
+  def restore(self) -> bool:
+    """ notify the listeners and replay all steps """
+    if self.restoring:
+      return False
+    t = self._t
+    start = t.monotonic()
+    self.restoring = True
+    self.restored = False
+    try:
+      for func in self._listeners:
+        func()
+      for index, func in enumerate(self._steps):
+        if not func:
+          continue
+        t.log("session: restoring {}",STEP_NAMES[index])
+        if func() is False:
+          raise RuntimeError(f"could not restore {STEP_NAMES[index]}")
+      self.restored = True
+      self.restores += 1
+    except Exception as ex: # pylint: disable=broad-except
+      self.failures += 1
+      t.log("session: restore failed: {}",ex)
+    finally:
+      self.restoring = False
+      self.duration = t.monotonic() - start
+    return self.restored
@@ -0,0 +1,197 @@
+# -------------------------------------------------------------------------
+# Class SPIBackend. AT commands and data over the SPI host interface of
+# ESP-AT (half-duplex SPI with a handshake-line, see "SPI AT" in the
+# ESP-AT documentation). The firmware must be compiled with SPI AT.
+#
+# Usage:
+#
+#   import board
+#   import busio
+#   import wifi
+#   from esp32at.spi import SPIBackend
+#
+#   spi = busio.SPI(board.SCK,MOSI=board.MOSI,MISO=board.MISO)
+#   backend = SPIBackend(spi,board.D5,board.D6,baudrate=10_000_000)
+#   wifi.init(backend,...)
+#
+# Every transaction consists of command, address and a dummy byte
+# followed by the data. The co-processor raises the handshake-line if it
+# has data for the host or is ready to receive data from the host.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class SPIBackend. """
+
+from __future__ import annotations
+
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+try:
+  import busio
+  import circuitpython_typing
+except ImportError:
+  pass
+
+from esp32at.backend import Backend
+
+CMD_WR_STATUS = const(0x01)
+CMD_RD_STATUS = const(0x02)
+CMD_WR_DATA = const(0x03)
+CMD_RD_DATA = const(0x04)
+CMD_WR_DONE = const(0x07)
+CMD_RD_DONE = const(0x08)
+
+ADDR_STATUS = const(0x04)
+""" address of the status of the co-processor """
+
+MAGIC = const(0xFE)
+""" first byte of a send-request """
+
+DIR_NONE = const(0)
+DIR_READ = const(1)          # co-processor has data for the host
+DIR_WRITE = const(2)         # co-processor is ready to receive data
+
+MAX_TRANSFER = const(4092)
+""" maximal data-size of a single transaction """
+
+class SPIBackend(Backend):
+  """ ESP-AT over SPI.
+
+  cs and handshake are pins or DigitalInOut-like objects. The handshake
+  is the flow-control: the host only reads if the co-processor signals
+  data and only writes after the co-processor signals readiness.
+  """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, spi: busio.SPI, cs: circuitpython_typing.Pin,
+               handshake: circuitpython_typing.Pin, *,
+               baudrate: int = 10000000, timeout: float = 1,
+               polarity: int = 0, phase: int = 0) -> None:
+    """ constructor """
+    super().__init__(timeout)
+    self._spi = spi
+    self._baudrate = baudrate
+    self._polarity = polarity
+    self._phase = phase
+    self._cs = self._pin(cs)
+    self._cs.switch_to_output(True)
+    self._handshake = self._pin(handshake)
+    self._handshake.switch_to_input()
+    self._header = bytearray(3)
+    self._status = bytearray(4)
+    self._seq = 0
+
+  @staticmethod
+  def _pin(pin):
+    """ return a DigitalInOut (or alike) for the pin """
+    if hasattr(pin,"switch_to_output"):
+      return pin                    # already a DigitalInOut (or alike)
+    from digitalio import DigitalInOut # pylint: disable=import-outside-toplevel
+    return DigitalInOut(pin)
+
+  # --- SPI transactions   ---------------------------------------------------
+
+  def _transaction(self, cmd: int, addr: int = 0,
+                   out: bytes = None, into = None) -> None:
+    """ single half-duplex transaction """
+    header = self._header
+    header[0] = cmd
+    header[1] = addr
+    while not self._spi.try_lock():
+      pass
+    try:
+      self._spi.configure(baudrate=self._baudrate,polarity=self._polarity,
+                          phase=self._phase)
+      self._cs.value = False
+      self._spi.write(header)
+      if out:
+        self._spi.write(out)
+      if into is not None:
+        self._spi.readinto(into)
+    finally:
+      self._cs.value = True
+      self._spi.unlock()
+
+  def _read_status(self) -> tuple:
+    """ read status: (direction, sequence, length) """
+    status = self._status
+    self._transaction(CMD_RD_STATUS,ADDR_STATUS,into=status)
+    return status[0], status[1], status[2] | status[3] << 8
+
+  def _wait_handshake(self) -> bool:
+    """ wait at most timeout seconds for the handshake """
+    if self._handshake.value:
+      return True
+    start = self._monotonic()
+    while not self._handshake.value:
+      if self._monotonic() - start > self.timeout:
+        return False
+      self._sleep(0.0001)
+    return True
+
+  def _receive(self, length: int) -> None:
+    """ read length bytes announced by the co-processor """
+    start = len(self._rx)
+    self._rx.extend(bytes(length))
+    self._transaction(CMD_RD_DATA,into=memoryview(self._rx)[start:])
+    self._transaction(CMD_RD_DONE)
+
+  # --- hooks   --------------------------------------------------------------
+
+  def _poll(self) -> bool:
+    """ read data signaled by the handshake """
+    if not self._handshake.value:
+      return False
+    direction, _, length = self._read_status()
+    if direction != DIR_READ or not length:
+      return False
+    self._receive(length)
+    return True
+
+  def _transmit(self, data: bytes) -> None:
+    """ send data in chunks of at most MAX_TRANSFER bytes """
+    view = memoryview(data)
+    while view:
+      chunk = view[:MAX_TRANSFER]
+      self._seq = (self._seq + 1) & 0xFF
+      length = len(chunk)
+      self._transaction(CMD_WR_STATUS,
+                        out=bytes([MAGIC,self._seq,length & 0xFF,length >> 8]))
+      while True:
+        if not self._wait_handshake():
+          raise OSError("SPI: no handshake from co-processor")
+        direction, _, rlength = self._read_status()
+        if direction == DIR_WRITE:
+          break
+        if direction == DIR_READ and rlength:
+          self._receive(rlength)      # pending input first
+      self._transaction(CMD_WR_DATA,out=chunk)
+      self._transaction(CMD_WR_DONE)
+      view = view[length:]
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ release the pins (the SPI-bus might be shared) """
+    self._cs.deinit()
+    self._handshake.deinit()
+
+  @property
+  def baudrate(self) -> int:
+    """ SPI clock frequency """
+    return self._baudrate
+
+  @baudrate.setter
+  def baudrate(self, value: int) -> None:
+    """ set SPI clock frequency """
+    self._baudrate = value
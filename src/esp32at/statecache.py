@@ -0,0 +1,104 @@
+# -------------------------------------------------------------------------
+# Class StateCache. Persists the state of the co-processor between
+# sessions of the MCU (a JSON document in a file or in NVM).
+#
+# Usage:
+#
+#   import microcontroller
+#   from esp32at.statecache import StateCache
+#
+#   cache = StateCache(nvm=microcontroller.nvm,offset=0,size=512)
+#   wifi.init(uart,state_cache=cache,...)
+#
+# or on CPython (or with a writable filesystem):
+#
+#   cache = StateCache("/tmp/esp32at.json")
+#
+# With a valid cache, Transport.init() verifies with a single AT that
+# the co-processor was not reset since the last session and skips the
+# configuration (see doc/dev_guide.md, "Warm Start").
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class StateCache. """
+
+import json
+
+class StateCache:
+  """ persisted state of the co-processor """
+
+  def __init__(self, path: str = None, *, nvm = None,
+               offset: int = 0, size: int = None) -> None:
+    """ constructor. Use either a file (path) or a bytearray-like nvm
+    (e.g. microcontroller.nvm) with size bytes starting at offset """
+    if path is None and nvm is None:
+      raise ValueError("either path or nvm is required")
+    self._path = path
+    self._nvm = nvm
+    self._offset = offset
+    if nvm is not None and size is None:
+      size = len(nvm) - offset
+    self._size = size
+    self._raw = None                  # last document read or written
+    self.error = None                 # reason of the last failed save
+
+  def load(self) -> dict:
+    """ read the state. Returns an empty dict if there is no valid state """
+    try:
+      if self._nvm is None:
+        with open(self._path,"rb") as file:
+          raw = file.read()
+      else:
+        start = self._offset
+        length = self._nvm[start] | self._nvm[start+1] << 8
+        if not length or length > self._size - 2:
+          return {}
+        raw = bytes(self._nvm[start+2:start+2+length])
+      state = json.loads(raw)
+    except (OSError, ValueError, IndexError):
+      return {}
+    if not isinstance(state,dict):
+      return {}
+    self._raw = raw
+    return state
+
+  def save(self, state: dict) -> bool:
+    """ write the state (only if changed, to spare the flash). Returns
+    False with the reason in self.error if the state was not saved """
+    raw = json.dumps(state).encode()
+    if raw == self._raw:
+      return True
+    try:
+      if self._nvm is None:
+        with open(self._path,"wb") as file:
+          file.write(raw)
+      else:
+        if len(raw) > self._size - 2:
+          self.error = f"state needs {len(raw)+2} bytes, size is {self._size}"
+          return False
+        start = self._offset
+        self._nvm[start:start+2+len(raw)] = (
+          bytes([len(raw) & 0xFF,len(raw) >> 8]) + raw)
+    except OSError as ex:             # e.g. read-only filesystem
+      self.error = f"could not write state ({ex})"
+      return False
+    self._raw = raw
+    self.error = None
+    return True
+
+  def clear(self) -> None:
+    """ invalidate the state """
+    try:
+      if self._nvm is None:
+        with open(self._path,"wb") as file:
+          file.write(b"{}")
+      else:
+        self._nvm[self._offset:self._offset+2] = b"\x00\x00"
+    except OSError:
+      pass
+    self._raw = None
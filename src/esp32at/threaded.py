@@ -0,0 +1,200 @@
+# -------------------------------------------------------------------------
+# Class ThreadedUART. Wrapper for a UART with a background reader thread
+# for CPython hosts (see esp32at.host).
+#
+# Usage:
+#
+#   from esp32at import host
+#   from esp32at.threaded import ThreadedUART
+#   import wifi
+#
+#   uart = ThreadedUART(host.SerialUART("/dev/ttyUSB0"))
+#   wifi.init(uart,...)
+#
+# The reader thread drains the UART independently of the application, so
+# input is never lost. Unsolicited messages (CONNECT, CLOSED, +IPD, SEND OK,
+# WIFI ...) are dispatched by the reader thread as soon as the transport is
+# idle. Application threads can share the co-processor: commands and
+# data-transfers are serialized with Transport.lock.
+#
+# This module needs the threading module of CPython.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class ThreadedUART. """
+
+import time
+import threading
+
+class ThreadedUART:
+  """ busio.UART compatible wrapper with a background reader thread.
+
+  The input buffer is not limited, so there are no overruns as long as
+  the reader thread keeps up with the UART. Reads wait on a condition
+  instead of polling. Access to the wrapped UART is serialized, so it
+  does not need to be thread-safe.
+  """
+
+  def __init__(self, uart, poll: float = 0.001) -> None:
+    """ constructor. poll is the sleep time of the idle reader thread """
+    self._uart = uart
+    self._poll = poll
+    self.timeout = uart.timeout
+    self.at_uart = getattr(uart,"at_uart",True)   # see esp32at.backend
+    self.dispatched = 0               # calls of read_atmsg() by the reader
+    self.errors = 0                   # exceptions during dispatch
+    self._rx = bytearray()
+    self._cond = threading.Condition()
+    self._io_lock = threading.Lock()
+    self._transport = None
+    self._running = True
+    self._thread = threading.Thread(target=self._run,daemon=True,
+                                    name="esp32at-reader")
+    self._thread.start()
+
+  def attach(self, transport) -> None:
+    """ called by Transport.init(): serialize access with a real lock
+    and dispatch unsolicited messages """
+    transport.lock = threading.RLock()
+    self._transport = transport
+    if hasattr(self._uart,"attach"):
+      self._uart.attach(transport)
+
+  # --- reader thread   ------------------------------------------------------
+
+  def _drain(self) -> bytes:
+    """ move available data from the UART to the input buffer """
+    with self._io_lock:
+      waiting = self._uart.in_waiting
+      data = self._uart.read(waiting) if waiting else None
+    if data:
+      with self._cond:
+        self._rx += data
+        self._cond.notify_all()
+    return data
+
+  def _run(self) -> None:
+    """ drain the UART and dispatch messages """
+    while self._running:
+      try:
+        data = self._drain()
+      except (OSError, ValueError):
+        if not self._running:        # deinit() closed the UART
+          return
+        raise
+      if not data:
+        if b"\n" in self._rx:
+          self._dispatch()           # left over while the transport was busy
+        time.sleep(self._poll)
+      elif b"\n" in data:
+        self._dispatch()
+
+  def _dispatch(self) -> None:
+    """ process unsolicited messages if no other thread uses the transport """
+    transport = self._transport
+    if (not transport or transport.passthrough or
+        not transport.lock.acquire(False)):
+      return
+    try:
+      if b"\n" in self._rx:
+        transport.read_atmsg(passive=False)
+        self.dispatched += 1
+    except Exception as ex:        # pylint: disable=broad-except
+      self.errors += 1
+      transport.log("ThreadedUART: dispatch failed: {}",ex)
+    finally:
+      transport.lock.release()
+    with self._cond:
+      self._cond.notify_all()
+
+  def _wait(self, predicate, timeout: float) -> bool:
+    """ wait at most timeout seconds until predicate() is true """
+    if threading.current_thread() is not self._thread:
+      with self._cond:
+        return self._cond.wait_for(predicate,timeout)
+
+    # reader thread (during dispatch): nobody else fills the buffer
+    end = time.monotonic() + timeout
+    while not predicate():
+      if time.monotonic() > end:
+        return False
+      if not self._drain():
+        time.sleep(self._poll)
+    return True
+
+  # --- busio.UART API   -----------------------------------------------------
+
+  def deinit(self) -> None:
+    """ stop the reader thread and deinit the UART """
+    self._running = False
+    self._thread.join()
+    self._uart.deinit()
+
+  @property
+  def baudrate(self) -> int:
+    """ baudrate of the UART """
+    return self._uart.baudrate
+
+  @baudrate.setter
+  def baudrate(self, value: int) -> None:
+    """ set baudrate of the UART """
+    with self._io_lock:
+      self._uart.baudrate = value
+
+  @property
+  def in_waiting(self) -> int:
+    """ number of bytes in the input buffer """
+    return len(self._rx)
+
+  def read(self, nbytes: int = None) -> bytes:
+    """ read nbytes (or everything available). Returns None on timeout """
+    if nbytes is None:
+      self._wait(lambda: self._rx,self.timeout)
+    else:
+      self._wait(lambda: len(self._rx) >= nbytes,self.timeout)
+    with self._cond:
+      if not self._rx:
+        return None
+      nbytes = len(self._rx) if nbytes is None else nbytes
+      data = bytes(self._rx[:nbytes])
+      del self._rx[:nbytes]
+      return data
+
+  def readinto(self, buf) -> int:
+    """ read into buffer. Returns None on timeout """
+    nbytes = len(buf)
+    self._wait(lambda: len(self._rx) >= nbytes,self.timeout)
+    with self._cond:
+      nbytes = min(nbytes,len(self._rx))
+      if not nbytes:
+        return None
+      memoryview(buf)[:nbytes] = self._rx[:nbytes]
+      del self._rx[:nbytes]
+      return nbytes
+
+  def readline(self) -> bytes:
+    """ read a line (including the newline). Returns None on timeout """
+    self._wait(lambda: b"\n" in self._rx,self.timeout)
+    with self._cond:
+      if not self._rx:
+        return None
+      end = self._rx.find(b"\n")
+      end = len(self._rx) if end < 0 else end + 1
+      data = bytes(self._rx[:end])
+      del self._rx[:end]
+      return data
+
+  def write(self, buf) -> int:
+    """ write data """
+    with self._io_lock:
+      return self._uart.write(buf)
+
+  def reset_input_buffer(self) -> None:
+    """ discard pending input """
+    with self._cond:
+      self._rx = bytearray()
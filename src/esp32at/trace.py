@@ -0,0 +1,197 @@
+# -------------------------------------------------------------------------
+# Class Trace. A compact in-memory ring buffer of trace records.
+#
+# Enable tracing with
+#
+#   from esp32at.trace import Trace
+#   wifi.transport.trace = Trace(256)
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class Trace. """
+
+import time
+import struct
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+try:
+  from typing import Iterator, Tuple, Union
+except ImportError:
+  pass
+
+RECORD_FORMAT = "<IBBH"
+""" record layout: timestamp (ms), event, link-id, length """
+
+RECORD_SIZE = const(8)
+""" size of a single record in bytes """
+
+NO_LINK = const(0xFF)
+""" link-id value for events without a link """
+
+EV_CMD = const(1)
+""" AT command sent (length: command length) """
+
+EV_OK = const(2)
+""" command finished with OK (length: number of reply lines) """
+
+EV_ERROR = const(3)
+""" command finished with ERROR (length: number of reply lines) """
+
+EV_TIMEOUT = const(4)
+""" timeout while waiting for a response """
+
+EV_BUSY = const(5)
+""" firmware replied with busy p... """
+
+EV_REBOOT = const(6)
+""" firmware reboot detected """
+
+EV_RETRY = const(7)
+""" command is retried """
+
+EV_WRITE = const(8)
+""" raw data written to the UART (length: bytes) """
+
+EV_READ = const(9)
+""" raw data read from the UART (length: bytes) """
+
+EV_SEND = const(10)
+""" data sent on a link (length: bytes) """
+
+EV_RECV = const(11)
+""" data received on a link (length: bytes) """
+
+EV_SEND_OK = const(12)
+""" SEND OK (or other SEND status) received """
+
+EV_CONNECT = const(13)
+""" link connected """
+
+EV_CLOSED = const(14)
+""" link closed """
+
+EV_IPD = const(15)
+""" data available on a link (length: bytes) """
+
+EV_PT_ON = const(16)
+""" passthrough-mode entered """
+
+EV_PT_OFF = const(17)
+""" passthrough-mode left """
+
+EV_WIFI_CONNECTED = const(18)
+""" station connected to AP """
+
+EV_WIFI_GOT_IP = const(19)
+""" station got IP """
+
+EV_WIFI_DISCONNECT = const(20)
+""" station disconnected from AP """
+
+EV_STA = const(21)
+""" station (dis)connected to our AP """
+
+EVENT_NAMES = {
+  EV_CMD: "CMD", EV_OK: "OK", EV_ERROR: "ERROR", EV_TIMEOUT: "TIMEOUT",
+  EV_BUSY: "BUSY", EV_REBOOT: "REBOOT", EV_RETRY: "RETRY",
+  EV_WRITE: "WRITE", EV_READ: "READ", EV_SEND: "SEND", EV_RECV: "RECV",
+  EV_SEND_OK: "SEND_OK", EV_CONNECT: "CONNECT", EV_CLOSED: "CLOSED",
+  EV_IPD: "IPD", EV_PT_ON: "PT_ON", EV_PT_OFF: "PT_OFF",
+  EV_WIFI_CONNECTED: "WIFI_CONNECTED", EV_WIFI_GOT_IP: "WIFI_GOT_IP",
+  EV_WIFI_DISCONNECT: "WIFI_DISCONNECT", EV_STA: "STA"
+  }
+""" names of events for dump() """
+
+class Trace:
+  """ Ring buffer of fixed-size trace records.
+
+  Every record is 8 bytes: timestamp in ms (32 bit), event code,
+  link-id and a length (16 bit). The buffer is allocated once, so
+  memory does not grow while recording and nothing is written to the
+  console. Recording still creates a few short-lived objects (e.g. the
+  timestamp from the clock). Old records are overwritten once the
+  buffer is full.
+  """
+
+  def __init__(self, size: int = 256, clock=None) -> None:
+    """ constructor: size is the number of records, clock an optional
+    replacement for time.monotonic """
+    self._clock = clock if clock else time.monotonic
+    self._size = size
+    self._buffer = bytearray(size*RECORD_SIZE)
+    self._index = 0
+    self._count = 0
+
+  def record(self, event: int, link_id: int = None, length: int = 0) -> None:
+    """ add a record """
+    struct.pack_into(RECORD_FORMAT, self._buffer, self._index*RECORD_SIZE,
+                     int(self._clock()*1000) & 0xFFFFFFFF, event,
+                     NO_LINK if link_id is None else link_id,
+                     min(length,0xFFFF))
+    self._index += 1
+    if self._index == self._size:
+      self._index = 0
+    if self._count < self._size:
+      self._count += 1
+
+  def clear(self) -> None:
+    """ remove all records """
+    self._index = 0
+    self._count = 0
+
+  def __len__(self) -> int:
+    """ number of valid records """
+    return self._count
+
+  def records(self) -> Iterator[Tuple[int,int,int,int]]:
+    """ return records (ts, event, link_id, length), oldest first """
+    index = (self._index - self._count) % self._size
+    for _ in range(self._count):
+      yield struct.unpack_from(RECORD_FORMAT,self._buffer,index*RECORD_SIZE)
+      index += 1
+      if index == self._size:
+        index = 0
+
+  def dump(self, file: Union[str, object] = None) -> None:
+    """ print records in readable form to the console, a stream or a file
+    (given by name) """
+    if isinstance(file,str):
+      with open(file,"w") as stream:
+        self._dump(stream)
+    else:
+      self._dump(file)
+
+  def _dump(self, stream) -> None:
+    """ write records to the given stream (or console if None) """
+    start = None
+    for ts, event, link_id, length in self.records():
+      if start is None:
+        start = ts
+      link = "-" if link_id == NO_LINK else str(link_id)
+      line = (f"{(ts-start) & 0xFFFFFFFF:10d} " +
+              f"{EVENT_NAMES.get(event,str(event)):<16}{link:>4}{length:>7}")
+      if stream is None:
+        print(line)
+      else:
+        stream.write(line+"\n")
+
+  def save(self, filename: str) -> None:
+    """ save records in binary form (oldest first) """
+    with open(filename,"wb") as stream:
+      index = (self._index - self._count) % self._size
+      for _ in range(self._count):
+        offset = index*RECORD_SIZE
+        stream.write(self._buffer[offset:offset+RECORD_SIZE])
+        index += 1
+        if index == self._size:
+          index = 0
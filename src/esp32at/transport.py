@@ -2,7 +2,8 @@
 # Class Transport. This class implements the low-level interface to the
 # co-processor.
 #
-# The sole instance of this class is available as wifi.transport
+# The default instance of this class is available as wifi.transport.
+# Additional co-processors use instances created with Transport.create().
 #
 # Most of this code is from
 # https://github.com/adafruit/Adafruit_CircuitPython_ESP_ATcontrol
@@ -16,16 +17,32 @@
 
 """ class Transport. """
 
+from __future__ import annotations
+
 import time
 import re
 
-import busio
-from digitalio import DigitalInOut
-from micropython import const
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
+
+from esp32at.metrics import Metrics
+from esp32at.capabilities import Capabilities
+from esp32at.statecache import StateCache
+from esp32at.session import Session, STEP_INIT
+from esp32at.retry import (DEFAULT_POLICY, POLICIES, ERR_UNSUPPORTED,
+                           decode, describe, retryable, sub_category)
+from esp32at.trace import (EV_CMD, EV_OK, EV_ERROR, EV_TIMEOUT, EV_BUSY,
+                           EV_REBOOT, EV_RETRY, EV_WRITE, EV_READ,
+                           EV_PT_ON, EV_PT_OFF)
 
 try:
   import circuitpython_typing
   from typing import Optional, Union, Sequence, Tuple
+  import busio
 except ImportError:
   pass
 
@@ -53,6 +70,9 @@ CALLBACK_STA = const(3)
 CALLBACK_SEND = const(4)
 """ index to callback method """
 
+CALLBACK_BUSY = const(5)
+""" index to callback method (called with the delayed command) """
+
 PT_OFF = const(0)
 """ normal mode (no passthrough) """
 
@@ -62,12 +82,66 @@ PT_AUTO = const(1)
 PT_MANUAL = const(2)
 """ manual passthrough mode """
 
+POLL_MIN = 0.001
+""" default minimal poll-interval (seconds) while waiting for input """
+
+POLL_MAX = 0.02
+""" default maximal poll-interval (seconds) while waiting for input """
+
+BAUDRATES = (230400, 460800, 921600, 1500000, 2000000, 3000000)
+""" default candidates for baudrate negotiation """
+
+READY_TIMEOUT = 5
+""" maximal time (seconds) to wait for the co-processor after a reset """
+
+READY_PROBE = 0.25
+""" probe with AT if the co-processor is silent this long during boot """
+
+TRANSFER_INTERVAL = 20
+""" default interval (ms) of AT+TRANSINTVL in passthrough-mode """
+
+PT_GUARD = 0.021
+""" minimal silence (seconds) before and after +++ (more than
+AT+TRANSINTVL) """
+
+PT_EXIT_SILENCE = 1
+""" silence (seconds) after +++ before the next command (required by
+ESP-AT) """
+
+PT_EXIT_TIMEOUT = 3
+""" maximal time (seconds) to leave passthrough-mode """
+
+BUSY_TIMEOUT = 10
+""" maximal time (seconds) to wait for a busy co-processor """
+
+BUSY_DELAY = 0.01
+""" first delay (seconds) before resubmitting after 'busy p...' """
+
+BUSY_MAX_DELAY = 0.2
+""" maximal delay (seconds) before resubmitting after 'busy p...' """
+
 class RebootError(Exception):
   """The exception thrown during firmware reboot"""
 
 class TransportError(Exception):
   """The exception thrown when we didn't get acknowledgement to an AT command"""
 
+class _NoLock:
+  """ lock without function (single-threaded use, e.g. on the device) """
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    return False
+
+def _locked(func):
+  """ decorator: run the method while holding self.lock """
+  def wrapper(self,*args,**kwargs):
+    with self.lock:
+      return func(self,*args,**kwargs)
+  return wrapper
+
 # pylint: disable=too-many-public-methods, too-many-instance-attributes
 class Transport:
   """ Low-level interface to the AT-commandset of the ESP32xx.  The
@@ -78,7 +152,7 @@ class Transport:
   """
 
   transport = None
-  """ the singleton instance """
+  """ the singleton (default) instance """
 
   _MSG_PASSIVE_END = ["OK", "ERROR"]
   """ end-messages in passive-mode """
@@ -93,6 +167,9 @@ class Transport:
     ]
   """ regex for messages, indices must match callback indices """
 
+  _URC_NAMES = ["CONN", "IPD", "WIFI", "STA", "SEND"]
+  """ names of messages for metrics, indices must match callback indices """
+
 
   def __new__(cls):
     if Transport.transport:
@@ -103,22 +180,57 @@ class Transport:
     """ Do nothing constructor. Use init() for hardware-setup """
     if Transport.transport:
       return
+    self._setup()
+    Transport.transport = self
 
-    # keep pylint happy by defining variables here
+  @classmethod
+  def create(cls) -> "Transport":
+    """ create an additional instance (e.g. for a second co-processor
+    on another UART). Use init() for hardware-setup """
+    transport = object.__new__(cls)
+    transport._setup()
+    return transport
+
+  # pylint: disable=attribute-defined-outside-init
+  def _setup(self) -> None:
+    """ initialize all attributes """
     self._msg_callbacks = [lambda msg: None]*6
     self._passthrough = False
     self._pt_policy = PT_OFF
     self._uart = None
+    self._at_uart = True
     self._at_retries = 1
     self._reset_pin = None
     self.debug = None
     self._at_version = None
     self.at_version_short = None
+    self.caps = None
+    self.state_cache = None
+    self.state = {}
+    self._state_warned = False
+    self.warm_start = False
     self._multi_connections = None
     self.max_connections = 5
     self.reconn_interval = 1
+    self.transfer_interval = TRANSFER_INTERVAL
+    self.profile = None
+    self.retry_policy = DEFAULT_POLICY
+    self.retry_policies = dict(POLICIES)
+    self.last_error = None
+    self.last_input = 0
     self.busy = False
-    Transport.transport = self
+    self.poll_min = POLL_MIN
+    self.poll_max = POLL_MAX
+    self._poll_interval = POLL_MIN
+    self.metrics = Metrics()
+    self.session = Session(self)
+    self.reboot_pending = False       # restore before the next command
+    self.trace = None
+    self.phases = None
+    self.lock = _NoLock()
+    self.monotonic = time.monotonic
+    self.sleep = time.sleep
+    self.instances = {}     # per-transport objects (radio, pool, ...)
 
   # pylint: disable=too-many-branches, too-many-statements
   def init(self,
@@ -130,22 +242,57 @@ class Transport:
            reset_pin: Optional[circuitpython_typing.Pin] = None,
            persist_settings: Optional[bool] = True,
            reconn_interval: Optional[int] = 1,
-           baudrate: Union[int, str] = None,
+           baudrate: Union[int, str, Sequence[int]] = None,
+           autobaud: Optional[bool] = True,
            pt_policy: Optional[int] = PT_OFF,
+           state_cache: Optional[StateCache] = None,
            debug: bool = False,
            ) -> bool:
     """ initialize hardware, and query AT firmware version """
 
     self._uart = uart
+    self._at_uart = getattr(uart,"at_uart",True)  # see esp32at.backend
+    if hasattr(uart,"attach"):       # e.g. esp32at.threaded.ThreadedUART
+      uart.attach(self)
     self._at_retries = at_retries
     self.debug = debug
     self.reconn_interval = reconn_interval
     self.pt_policy = pt_policy
+    self.busy = False                    # reset state of a previous session
+    self._passthrough = False
+    if not self.session.restoring:
+      self.reboot_pending = False        # new session
+    self.session.clear()
 
     self._reset_pin = reset_pin
     if not reset_pin:
       hard_reset = RESET_NEVER
 
+    # the co-processor might still use the baudrate of a previous session
+    if autobaud and hard_reset != RESET_ALWAYS:
+      if isinstance(baudrate,(list,tuple)):
+        candidates = list(baudrate)
+      elif baudrate is None:
+        candidates = []
+      else:
+        candidates = [int(str(baudrate).split(',')[0])]
+      self.detect_baudrate(candidates+list(BAUDRATES))
+
+    # warm start: skip the configuration if the co-processor still has
+    # the state of the last session
+    self.state_cache = state_cache
+    self.state = state_cache.load() if state_cache else {}
+    self._state_warned = False
+    self.warm_start = False
+    settings = [pt_policy,persist_settings,reconn_interval,str(baudrate)]
+    if (state_cache and reset != RESET_ALWAYS and
+        hard_reset != RESET_ALWAYS and self._restore_state(settings)):
+      self.warm_start = True
+      self._record_session(uart,at_retries,reset,hard_reset,reset_pin,
+                           persist_settings,reconn_interval,baudrate,
+                           pt_policy,state_cache,debug)
+      return True
+
     # check if a reset is requested
     if hard_reset == RESET_ALWAYS:
       self.hard_reset()
@@ -156,6 +303,7 @@ class Transport:
     connected = False
     for _ in range(2):
       try:
+        self._multi_connections = None     # state of co-processor unknown
         self.multi_connections = pt_policy == PT_OFF
 
         # query number of supported connections
@@ -165,16 +313,13 @@ class Transport:
           raise RuntimeError("could not query max connections")
         self.max_connections = int(reply[18:])
 
+        # query firmware version and capabilities
+        self._get_version()
+        self.caps = Capabilities(self.at_version_short)
+
         # set passive receive-mode
-        reply = self.send_atcmd(
-          f'AT+CIPRECVTYPE={self.max_connections},1',filter="^OK")
-        if reply is None:
-          reply = self.send_atcmd(
-            'AT+CIPRECVMODE=1',filter="^OK")
-          if reply is None:
-            raise RuntimeError("could not set passive receive-mode")
+        self._set_passive()
 
-        self._get_version()
         connected = True
         self._echo(False)
         break
@@ -183,36 +328,141 @@ class Transport:
         if hard_reset == RESET_ON_FAILURE:
           self.hard_reset()
         elif reset == RESET_ON_FAILURE:
-          if isinstance(ex,RebootError):  # give the system some time to boot
-            time.sleep(3)
-          elif isinstance(ex,TransportError):  # give the system some time to boot
+          if isinstance(ex,RebootError):
+            # firmware boot in progress: no reset necessary once it is ready
+            if self._at_uart:
+              self._uart.baudrate = 115200
+            if self._wait_ready(READY_TIMEOUT):
+              continue
+          elif isinstance(ex,TransportError):
             # we might still be in passthrough-mode, so try to leave
-            # send magic +++ to leave data mode
-            time.sleep(0.021)          # wait more than 20ms
-            self.write("+++")
-            time.sleep(0.021)          # wait more than 20ms
-            time.sleep(1)              # wait at least one second
+            self._leave_passthrough()
           self.soft_reset()
 
     if not connected:
       return False
 
-    # configure the co-processor (best effort)
+    # configure the co-processor (best effort, only write changed
+    # settings to spare the flash of the co-processor)
     # also, close left-over connections in the co-processor
     try:
-      if not persist_settings: # always on after reset
-        self.send_atcmd("AT+SYSSTORE=0")
-      self.send_atcmd(f"AT+CWRECONNCFG={reconn_interval},0")
+      self.update_setting("SYSSTORE",str(int(bool(persist_settings))))
+      if reconn_interval is not None:
+        self.update_setting("CWRECONNCFG",f"{reconn_interval},0")
+      self.update_setting("SYSLOG","1")   # ERR CODE for failed commands
       self.send_atcmd("AT+CIPDINFO=1")
       self.send_atcmd(f"AT+CIPCLOSE={self.max_connections}")
     except: # pylint: disable=bare-except
       pass
 
     # configure non-default baudrate
-    if not baudrate is None:
+    if isinstance(baudrate,(list,tuple)):
+      try:
+        self.negotiate_baudrate(baudrate)
+      except TransportError:
+        # co-processor lost at a failed baudrate: start again and
+        # use the last good baudrate
+        good = self._uart.baudrate
+        if not self.hard_reset():
+          return False
+        return self.init(uart,at_retries=at_retries,reset=reset,
+                         hard_reset=hard_reset,reset_pin=reset_pin,
+                         persist_settings=persist_settings,
+                         reconn_interval=reconn_interval,baudrate=good,
+                         autobaud=False,pt_policy=pt_policy,
+                         state_cache=state_cache,debug=debug)
+    elif not baudrate is None:
       self.baudrate = baudrate
+    self._save_state(settings)
+    self._record_session(uart,at_retries,reset,hard_reset,reset_pin,
+                         persist_settings,reconn_interval,baudrate,
+                         pt_policy,state_cache,debug)
     return True
 
+  # pylint: disable=too-many-arguments
+  def _record_session(self, uart, at_retries, reset, hard_reset, reset_pin,
+                      persist_settings, reconn_interval, baudrate,
+                      pt_policy, state_cache, debug) -> None:
+    """ record init() for a restore after a reboot. The firmware is
+    ready then, so no resets, and no new negotiation of the baudrate """
+    if self._at_uart:
+      baudrate = self._uart.baudrate
+    reset = min(reset,RESET_ON_FAILURE)
+    hard_reset = min(hard_reset,RESET_ON_FAILURE)
+    self.session.record(STEP_INIT,lambda: self.init(
+      uart,at_retries=at_retries,reset=reset,hard_reset=hard_reset,
+      reset_pin=reset_pin,persist_settings=persist_settings,
+      reconn_interval=reconn_interval,baudrate=baudrate,
+      pt_policy=pt_policy,state_cache=state_cache,debug=debug))
+
+  # --- warm start   ---------------------------------------------------------
+
+  def _restore_state(self, settings: list) -> bool:
+    """ restore the state of the last session. This is only valid if
+    the init-parameters did not change and if the co-processor was not
+    reset since then (echo is on after a reset) """
+    state = self.state
+    if (state.get("settings") != settings or
+        state.get("baudrate") != self._uart.baudrate):
+      return False
+    try:
+      if self.send_atcmd("AT",timeout=1) != ["OK"]:
+        return False
+      self.caps = Capabilities(state["version_short"],
+                               state.get("missing",[]))
+      self._at_version = state["version"]
+      self.at_version_short = state["version_short"]
+      self.max_connections = state["max_connections"]
+      self._multi_connections = state["multi_connections"]
+    except (RebootError, TransportError, KeyError, TypeError):
+      return False
+
+    # close left-over connections in the co-processor (best effort)
+    try:
+      self.send_atcmd(f"AT+CIPCLOSE={self.max_connections}")
+    except: # pylint: disable=bare-except
+      pass
+    self.log("warm start: state of the last session restored")
+    return True
+
+  def _save_state(self, settings: list) -> None:
+    """ save the state after a cold start """
+    if not self.state_cache:
+      return
+    state = {
+      "settings": settings,
+      "baudrate": self._uart.baudrate,
+      "version": self._at_version,
+      "version_short": self.at_version_short,
+      "max_connections": self.max_connections,
+      "multi_connections": self._multi_connections,
+      "missing": self.caps.missing,
+      }
+    if "wifi" in self.state:          # updated by wifi.init()
+      state["wifi"] = self.state["wifi"]
+    self.state = state
+    self._write_state()
+
+  def update_state(self, key: str, value) -> bool:
+    """ update a single entry of the persisted state. Returns False
+    if the state could not be saved """
+    self.state[key] = value
+    return self._write_state()
+
+  def _write_state(self) -> bool:
+    """ write the state to the cache. A failure is always reported,
+    since the next start can't be a warm start """
+    if not self.state_cache:
+      return True
+    if self.state_cache.save(self.state):
+      self._state_warned = False
+      return True
+    if not self._state_warned:
+      self.log("warning: warm start not possible: {}",self.state_cache.error,
+               force=True)
+      self._state_warned = True
+    return False
+
   # --- query AT firmware version   ------------------------------------------
 
   def _get_version(self) -> None:
@@ -237,8 +487,12 @@ class Transport:
     return self._uart.baudrate
 
   @baudrate.setter
+  @_locked
   def baudrate(self, value: str) -> None:
     """ set (temporary) baudrate of co-processor and UART (best effort) """
+    if not self._at_uart:
+      self._uart.baudrate = int(str(value).split(',')[0])  # e.g. SPI clock
+      return
     try:
       # pylint: disable=anomalous-backslash-in-string
       reply = self.send_atcmd("AT+UART_CUR?",filter="^\+UART_CUR:")
@@ -263,52 +517,257 @@ class Transport:
     if reply:
       self._uart.baudrate = int(baudrate[0])
 
+  @_locked
+  def detect_baudrate(self, candidates: Sequence[int] = BAUDRATES,
+                      timeout: float = 0.05) -> int:
+    """ detect the current baudrate of the co-processor: probe the current
+    baudrate of the UART, 115200 and the candidates with a bare AT. Returns
+    the detected baudrate, or 0 if the co-processor does not answer """
+    if not self._at_uart:
+      return self._uart.baudrate
+    current = self._uart.baudrate
+    rates = [current]
+    for rate in [115200] + list(candidates):
+      if rate not in rates:
+        rates.append(rate)
+    for rate in rates:
+      self._uart.baudrate = rate
+      try:
+        found = self._probe(timeout)
+      except RebootError:                  # readable boot messages
+        found = self._wait_ready(READY_TIMEOUT)
+      if found:
+        if rate != current:
+          self.log("detected baudrate {}",rate)
+        return rate
+    self._uart.baudrate = current
+    self._uart.reset_input_buffer()
+    return 0
+
+  def _probe(self, timeout: float) -> bool:
+    """ check if the co-processor answers at the current baudrate. ERROR
+    is also an answer (e.g. after garbage from a wrong baudrate). Raises
+    RebootError during boot of the firmware """
+    self._uart.reset_input_buffer()
+    try:
+      reply = self.send_atcmd("AT",timeout=timeout,retries=1)
+    except RebootError:
+      raise
+    except Exception: # pylint: disable=broad-except
+      return False
+    return bool(reply) and reply[-1] in Transport._MSG_PASSIVE_END
+
+  @_locked
+  def negotiate_baudrate(self, candidates: Sequence[int] = BAUDRATES,
+                         rounds: int = 10) -> int:
+    """ switch to the fastest candidate baudrate that passes an integrity
+    test. Candidates are tried in ascending order, the first failing
+    candidate falls back to the last good baudrate. Returns the final
+    baudrate. Raises TransportError if the fallback fails """
+    if not self._at_uart:
+      return self.baudrate
+    reference = self._integrity_reply()
+    if not reference:
+      return self.baudrate
+    try:
+      # pylint: disable=anomalous-backslash-in-string
+      reply = self.send_atcmd("AT+UART_CUR?",filter="^\+UART_CUR:")
+    except TransportError:
+      reply = None
+    if not reply:
+      return self.baudrate
+    params = ",".join(reply[10:].split(',')[1:])
+
+    good = self.baudrate
+    for rate in sorted(candidates):
+      if rate <= good:
+        continue
+      self.baudrate = rate
+      if self.baudrate != rate:
+        break                                # not accepted
+      if self._check_integrity(reference,rounds):
+        good = rate
+        continue
+      self.log("baudrate {} failed, falling back to {}",rate,good)
+      self._fallback_baudrate(good,rate,params)
+      break
+    return self.baudrate
+
+  def _integrity_reply(self) -> Optional[Sequence[str]]:
+    """ reply of the integrity test (None on failure) """
+    try:
+      reply = self.send_atcmd("AT+GMR",timeout=1,retries=1)
+    except Exception: # pylint: disable=broad-except
+      return None
+    if not reply or reply[-1] != "OK":
+      return None
+    return reply
+
+  def _check_integrity(self, reference: Sequence[str], rounds: int) -> bool:
+    """ repeat the integrity test and compare with the reference """
+    for _ in range(rounds):
+      if self._integrity_reply() != reference:
+        return False
+    return True
+
+  def _fallback_baudrate(self, good: int, failed: int, params: str) -> None:
+    """ switch back to the good baudrate. The link is unreliable at the
+    failed baudrate, so the command is repeated until the co-processor
+    answers at the good baudrate """
+    for _ in range(5):
+      self._uart.baudrate = failed
+      self._uart.reset_input_buffer()
+      self._uart.write(f"AT+UART_CUR={good},{params}\r\n".encode())
+      self.sleep(0.05)
+      self._uart.baudrate = good
+      self._uart.reset_input_buffer()
+      if self._integrity_reply():
+        return
+    raise TransportError(f"could not fall back to baudrate {good}")
+
   # --- soft, hard, factory resets   -----------------------------------------
 
+  @_locked
   def soft_reset(self, timeout: int = 5) -> bool:
     """Perform a software reset by AT command. Returns True
     if we successfully performed, false if failed to reset"""
 
+    self.session.suspended += 1       # the reboot is expected
     try:
       reply = self.send_atcmd("AT+RST", timeout=timeout,filter="^OK")
+    except RebootError:
+      reply = "OK"                     # boot messages after OK
     except TransportError:
       reply = ""
+    finally:
+      self.session.suspended -= 1
+    if self._at_uart:
+      self._uart.baudrate = 115200
     if reply == "OK":
       # RST command acknowleged
-      if self.debug:
-        print("waiting 3 seconds for reset")
-      time.sleep(3)  # in case of a reboot
-    self._uart.baudrate = 115200
+      self.log("waiting at most {} seconds for reset",timeout)
+      return self._wait_ready(timeout)
     self._uart.reset_input_buffer()
-    return reply == b'OK'
+    return False
 
   def restore_factory_settings(self) -> None:
     """Send factory restore settings request"""
+    self.session.clear()               # don't restore the old settings
     self.send_atcmd("AT+RESTORE", timeout=5)
 
-  def hard_reset(self) -> None:
-    """Perform a hardware reset by toggling the reset pin"""
+  @_locked
+  def hard_reset(self, timeout: float = READY_TIMEOUT) -> bool:
+    """Perform a hardware reset by toggling the reset pin. Returns False
+    without reset-pin"""
     if self._reset_pin:
-      with DigitalInOut(self._reset_pin) as reset_pin:
-        reset_pin.switch_to_output(True)
-        reset_pin.value = False
-        time.sleep(0.1)
-        reset_pin.value = True
-      if self.debug:
-        print("waiting 3 seconds for hard reset")
-      time.sleep(3)  # give it a few seconds to wake up
-      self._uart.baudrate = 115200
-      self._uart.reset_input_buffer()
-      return True
+      if hasattr(self._reset_pin,"switch_to_output"):
+        reset_pin = self._reset_pin   # already a DigitalInOut (or alike)
+      else:
+        from digitalio import DigitalInOut # pylint: disable=import-outside-toplevel
+        reset_pin = DigitalInOut(self._reset_pin)
+      reset_pin.switch_to_output(True)
+      reset_pin.value = False
+      self.sleep(0.1)
+      reset_pin.value = True
+      if reset_pin is not self._reset_pin:
+        reset_pin.deinit()
+      if self._at_uart:
+        self._uart.baudrate = 115200
+      self.log("waiting at most {} seconds for hard reset",timeout)
+      return self._wait_ready(timeout)
     return False
 
+  def _wait_ready(self, timeout: float) -> bool:
+    """ wait at most timeout seconds for the ready-message after a reset.
+    The message might get lost, so probe with AT while the co-processor
+    is silent. Stale input and late replies to the probes are discarded """
+    self._uart.reset_input_buffer()
+    start = self.monotonic()
+    while self.monotonic() - start < timeout:
+      if not self.wait_for_input(READY_PROBE):
+        self._uart.write(b"AT\r\n")
+        continue
+      line = self._uart.readline()
+      if line and line.strip() in (b"ready", b"OK", b"ERROR"):
+        self.log("ready after {:.3f}s",self.monotonic()-start)
+        while self.wait_for_input(0.1):  # late reply to a probing AT
+          self._uart.reset_input_buffer()
+        return True
+    self._uart.reset_input_buffer()
+    return False
+
+  def set_clock(self, monotonic=None, sleep=None) -> None:
+    """ replace the time source and sleep function used for all delays
+    and timeouts (e.g. by a virtual clock). None restores the default """
+    self.monotonic = monotonic if monotonic else time.monotonic
+    self.sleep = sleep if sleep else time.sleep
+
+  def log(self, fmt: str, *args, force: bool = False) -> None:
+    """ debug output: print fmt.format(*args) if debug is set (or force).
+    The arguments are only formatted if the message is printed """
+    if self.debug or force:
+      print(fmt.format(*args) if args else fmt)
+
+  def _log_response(self, prefix: str, response) -> None:
+    """ debug output of a response (one line per message) """
+    if not self.debug:
+      return
+    if response is None or isinstance(response,str):
+      self.log("{} {}",prefix,response)
+    else:
+      for line in response:
+        self.log("{} {}",prefix,line)
+
   # --- message processing   -------------------------------------------------
 
   def set_callback(self,index,func):
     """ configure callback for given CB index """
     self._msg_callbacks[index] = func
 
+  def _idle(self, limit: float) -> None:
+    """ sleep for the current poll-interval (at most limit seconds)
+    and back off for the next call """
+    if limit > 0:
+      self.sleep(min(self._poll_interval,limit))
+    self._poll_interval = min(2*self._poll_interval,self.poll_max)
+
+  def wait_for_input(self, timeout: float) -> bool:
+    """ wait at most timeout seconds for input.
+
+    The poll-interval starts at poll_min and doubles up to poll_max
+    while the UART is idle. It is reset as soon as input arrives.
+    """
+    start = self.monotonic()
+    while not self._uart.in_waiting:
+      remaining = timeout - (self.monotonic() - start)
+      if remaining <= 0:
+        return False
+      self._idle(remaining)
+    self._poll_interval = self.poll_min
+    return True
+
+  def wait(self, predicate, timeout: float) -> bool:
+    """ process pending messages until predicate() returns True or
+    the timeout expires. Messages are read at least once. """
+    start = self.monotonic()
+    while True:
+      self.read_atmsg(passive=False)
+      if self.reboot_pending:            # e.g. seen by a reader thread
+        raise RebootError("firmware rebooted")
+      if predicate():
+        return True
+      remaining = timeout - (self.monotonic() - start)
+      if remaining <= 0:
+        return False
+      if self._uart.in_waiting:
+        self._idle(remaining)            # incomplete message
+        continue
+      # recheck at least every poll_max seconds, since messages might
+      # also be processed by another thread
+      self.wait_for_input(min(remaining,self.poll_max))
+
   # pylint: disable=too-many-branches,too-many-arguments
+  @_locked
   def read_atmsg(self,timeout: float = 0, read_until: str = None,
                  passive=False) -> Tuple[bool, Union[Sequence[str],None]]:
     """
@@ -318,31 +777,36 @@ class Transport:
     since an incomplete send/read will likely trigger a 'busy p...'-message.
     """
 
-    start = time.monotonic()
     if passive and not timeout:
       timeout = 1000000
     result = []
 
     # wait at most timeout seconds for input
-    while time.monotonic() - start < timeout and not self._uart.in_waiting:
-      pass
-
-    if not self._uart.in_waiting:   # i.e. we have a timeout
+    if not self.wait_for_input(timeout):   # i.e. we have a timeout
+      if passive:
+        self.metrics.timeouts += 1
+        if self.trace:
+          self.trace.record(EV_TIMEOUT)
       return False,result
+    self.last_input = self.monotonic()   # see esp32at.health
 
     # read all messages
     processed = False
     if read_until:
       min_waiting = min(1,len(read_until)-1)  # if we wait for a single char
+      until = read_until.encode()
     else:
       min_waiting = 1
 
-    start = time.monotonic()
+    start = self.monotonic()
     while passive or self._uart.in_waiting > min_waiting:
-      if time.monotonic() - start > timeout:
+      if timeout and self.monotonic() - start >= timeout:
         break
       if not self._uart.in_waiting > min_waiting:
+        # wait for more input without spinning
+        self._idle(timeout - (self.monotonic() - start))
         continue
+      self._poll_interval = self.poll_min
 
       # special processing when parsing until a specific string:
       # read in single-byte mode until EOL or the target-string is read
@@ -353,32 +817,37 @@ class Transport:
           if msg[-2:] == b'\r\n':     # EOL: complete msg without <read_until>
             msg = msg[:-2]
             break
-          if read_until in msg:
-            if self.debug:
-              print(f"<--- msg(read_until): '{read_until}'")
+          if until in msg:
+            self.log("<--- msg(read_until): '{}'",read_until)
             return True, read_until
       else:
         msg = self._uart.readline()[:-2]
-      if self.debug:
-        print(f"<--- {msg=}")
+      self.log("<--- msg={!r}",msg)
       if not msg:                           # ignore empty lines
-        start = time.monotonic()
+        start = self.monotonic()
         continue
 
       # some shortcuts for special messages
       if b'busy p...' in msg:
+        self.metrics.busy += 1
+        if self.trace:
+          self.trace.record(EV_BUSY)
         result.append("busy p...")
         return False, result
       if b'ESP-ROM' in msg or b'\x1b[0;32m' in msg:
+        if self.trace:
+          self.trace.record(EV_REBOOT)
+        if self.session.armed:
+          self.reboot_pending = True     # restored outside the read path
+          raise RebootError("firmware rebooted")
         raise RebootError("firmware boot in progress")
 
       try:
         msg = str(msg,'utf-8')
       except UnicodeError as ex:
-        if self.debug:
-          print(f"ignoring message with binary data ({ex})")
-          start = time.monotonic()
-          continue
+        self.log("ignoring message with binary data ({})",ex)
+        start = self.monotonic()
+        continue
 
       # even in passive mode the AT-firmware sends unrelated messages
       # so check for messages with callback first
@@ -386,8 +855,8 @@ class Transport:
       if msg not in Transport._MSG_PASSIVE_END:
         for index,rex in enumerate(Transport._MSG_REX):
           if re.match(rex,msg):
-            if self.debug:
-              print(f"     callback processing for '{msg}'")
+            self.log("     callback processing for '{}'",msg)
+            self.metrics.add_urc(Transport._URC_NAMES[index])
             self._msg_callbacks[index](msg)
             processed = True
             break
@@ -395,34 +864,60 @@ class Transport:
       # in passive mode just return everything until OK/ERROR
       if not processed and passive:
         result.append(msg)
-        if self.debug:
-          print("     appending to result...")
+        self.log("     appending to result...")
         if msg in Transport._MSG_PASSIVE_END:
           return True,result
-        start = time.monotonic()
+        start = self.monotonic()
         continue
 
     # timed out or incomplete response
     if passive:
+      self.metrics.timeouts += 1
+      if self.trace:
+        self.trace.record(EV_TIMEOUT,None,len(result))
       return False,result
 
     # active mode: return processing state, but no messages
     return processed,[]
 
+  @_locked
+  def restore_session(self) -> bool:
+    """ unexpected reboot: wait for the firmware and replay the
+    configuration of the session (see esp32at.session). read_atmsg()
+    only notes the reboot, the restore runs before the next command or
+    when a socket sees the reboot. Returns False if the restore failed """
+    if not self.reboot_pending or self.session.restoring:
+      return not self.reboot_pending
+    self.reboot_pending = False
+    self.log("unexpected reboot: restoring session")
+    self.busy = False
+    self._passthrough = False
+    if self._at_uart:
+      self._uart.baudrate = 115200
+    self._wait_ready(READY_TIMEOUT)
+    return self.session.restore()
+
   # --- send command to the co-processor   -----------------------------------
 
-  def _wait_while_busy(self):
-    """ wait while busy-flag is set """
-    # TODO: think about timing out with Exception
-    if self.debug:
-      print("busy... waiting")
-    while self.busy:
-      self.read_atmsg(passive=False)
-    if self.debug:
-      print("busy flag cleared")
+  def _wait_while_busy(self) -> None:
+    """ wait while busy-flag is set (at most BUSY_TIMEOUT seconds).
 
-  # pylint: disable=redefined-builtin,too-many-statements
-  def send_atcmd(self, # pylint: disable=too-many-branches
+    SEND OK or SEND FAIL clears the flag. If the message was lost,
+    the flag is dropped after the timeout: a co-processor that is
+    still busy rejects the next command with 'busy p...' anyhow """
+    self.log("busy... waiting")
+    if self.wait(lambda: not self.busy, BUSY_TIMEOUT):
+      self.log("busy flag cleared")
+      return
+    self.metrics.timeouts += 1
+    if self.trace:
+      self.trace.record(EV_TIMEOUT)
+    self.log("busy flag not cleared after {}s, ignoring",BUSY_TIMEOUT)
+    self.busy = False
+
+  # pylint: disable=redefined-builtin,too-many-arguments
+  @_locked
+  def send_atcmd(self,
                  at_cmd: str,
                  timeout: float = 0,
                  retries: int = -1,
@@ -432,19 +927,47 @@ class Transport:
     """Send an AT command, check that we got an OK response,
     and then cut out the reply lines to return. We can set
     a variable timeout (how long we'll wait for response) and
-    how many times to retry before giving up"""
+    how many times to retry before giving up.
+
+    After an unexpected reboot the session is restored first. If the
+    firmware reboots while the command is pending, the command is sent
+    again once the session is restored"""
+
+    if self.reboot_pending:
+      self.restore_session()
+    try:
+      return self._send_atcmd(at_cmd,timeout,retries,read_until,filter,
+                              set_busy)
+    except RebootError:
+      if not self.reboot_pending or self.session.restoring:
+        raise
+    self.restore_session()
+    return self._send_atcmd(at_cmd,timeout,retries,read_until,filter,
+                            set_busy)
+
+  # pylint: disable=redefined-builtin,too-many-statements
+  def _send_atcmd(self, # pylint: disable=too-many-branches
+                  at_cmd: str,
+                  timeout: float,
+                  retries: int,
+                  read_until: str,
+                  filter: str,
+                  set_busy: bool) -> bytes:
+    """ send an AT command (see send_atcmd()) """
 
     # AT-commands are not available in passthrough mode
     if self._passthrough:
       raise RuntimeError(
         "cannot send AT-commands while passthrough-mode is active.")
 
-    if self.debug:
-      print(f"send_atcmd({at_cmd}) start -----------")
+    self.log("send_atcmd({}) start -----------",at_cmd)
 
-    # use global defaults
+    # use global defaults: retries apply to missing responses, the
+    # policy of the command to transient errors (see esp32at.retry)
     if retries < 0:
       retries = self._at_retries
+    verb = Metrics.verb(at_cmd)
+    policy = self.retry_policies.get(verb,self.retry_policy)
 
     # process pending active messages
     self.read_atmsg(passive=False)
@@ -452,33 +975,66 @@ class Transport:
     # input should be cleared, send command
     self.busy and self._wait_while_busy() # pylint: disable=expression-not-assigned
     self.busy = set_busy
-    for i in range(retries):
-      if self.debug:
-        print("--->", at_cmd)
+    start = self.monotonic()
+    attempt = 0                         # failed attempts (not busy)
+    missing = 0                         # attempts without response
+    busy = 0                            # attempts rejected with busy p...
+    waited = 0                          # time spent waiting while busy
+    while True:
+      self.log("---> {}",at_cmd)
+      if self.trace:
+        self.trace.record(EV_CMD,None,len(at_cmd))
       self._uart.write(bytes(at_cmd, "utf-8"))
       self._uart.write(b"\x0d\x0a")
       # read response
       success, raw_response = self.read_atmsg(
         passive=True,read_until=read_until,timeout=timeout)
-      if success:
+      if success and raw_response and raw_response[-1] == "ERROR":
+        self._error_code(verb,raw_response)
+        attempt += 1
+        if attempt >= policy.attempts or not retryable(raw_response):
+          break
+        delay = policy.delay(attempt)
+        if self.monotonic() - start - waited + delay > policy.budget:
+          break
+      elif success:
         break
-      if i<retries-1:
-        time.sleep(1)
+      elif raw_response and raw_response[-1] == "busy p...":
+        # backpressure: resubmit once the co-processor is idle
+        if self.monotonic() - start > BUSY_TIMEOUT:
+          break
+        pause = self.monotonic()
+        self._backpressure(at_cmd,busy)
+        waited += self.monotonic() - pause
+        busy += 1
+        continue
+      else:
+        attempt += 1
+        missing += 1                    # no response: not part of the budget
+        if missing >= retries:
+          break
+        delay = policy.delay(attempt)
+      self.metrics.retries += 1
+      if self.trace:
+        self.trace.record(EV_RETRY)
+      self.sleep(delay)
+    if success:
+      self.metrics.add_command(verb,self.monotonic()-start)
+      if raw_response and raw_response[-1] == "ERROR":
+        self.metrics.errors += 1
+        if self.trace:
+          self.trace.record(EV_ERROR,None,len(raw_response))
+      elif self.trace:
+        self.trace.record(EV_OK,None,len(raw_response))
 
     # process cmd-triggered active messages (if any)
     if not read_until:
       self.read_atmsg(passive=False)
 
     # final processing
-    if self.debug:
-      if raw_response is None or isinstance(raw_response,str):
-        print(f"raw: {raw_response}")
-      else:
-        for line in raw_response:
-          print(f"raw {line}")
+    self._log_response("raw",raw_response)
     if not success:
-      if self.debug:
-        print(f"send_atcmd({at_cmd}) end (TransportError) -----")
+      self.log("send_atcmd({}) end (TransportError) -----",at_cmd)
       raise TransportError(f"AT-command {at_cmd} failed ({raw_response=})")
 
     # check for filter
@@ -490,16 +1046,32 @@ class Transport:
         response = response[0]
     else:
       response = raw_response
-    if self.debug:
-      if response is None or isinstance(response,str):
-        print(f"<--- {response}")
-      else:
-        for line in response:
-          print(f"<--- {line}")
-    if self.debug:
-      print(f"send_atcmd({at_cmd}) end -------------")
+    self._log_response("<---",response)
+    self.log("send_atcmd({}) end -------------",at_cmd)
     return response
 
+  def _backpressure(self, at_cmd: str, count: int) -> None:
+    """ the co-processor rejected the command with 'busy p...': notify
+    the caller and wait until the co-processor is idle, i.e. until the
+    next message (e.g. OK or SEND OK of the previous command) or a short
+    silence. The delay grows with every rejection """
+    self.log("busy: delaying {}",at_cmd)
+    self._msg_callbacks[CALLBACK_BUSY](at_cmd)
+    delay = min(BUSY_MAX_DELAY,BUSY_DELAY*2**count)
+    if self.wait_for_input(delay):
+      self.read_atmsg(passive=False)
+
+  def _error_code(self, verb: str, reply: Sequence[str]) -> None:
+    """ keep the error code of an ERROR reply (needs AT+SYSLOG=1) """
+    self.last_error = decode(reply)
+    if self.last_error is not None:
+      self.metrics.add_error_code(self.last_error)
+      if self.debug:
+        self.log("error: {}",describe(self.last_error))
+      if (sub_category(self.last_error) == ERR_UNSUPPORTED and self.caps
+          and self.caps.unsupported(verb)):   # e.g. a self-compiled firmware
+        self.update_state("missing",self.caps.missing)
+
   # --- uart-wrappers   ------------------------------------------------------
 
   @property
@@ -510,9 +1082,10 @@ class Transport:
   def write(self,
             buffer: circuitpython_typing.ReadableBuffer) -> None:
     """ write bytes to the UART-interface """
-    if self.debug:
-      print(f"---> {len(buffer)} bytes: {buffer[:min(len(buffer),40)]}...")
-    self._uart.reset_input_buffer()
+    if self.debug:                  # don't copy the buffer if disabled
+      self.log("---> {} bytes: {}...",len(buffer),bytes(buffer[:40]))
+    if self.trace:
+      self.trace.record(EV_WRITE,None,len(buffer))
     self._uart.write(buffer)
 
   @property
@@ -534,11 +1107,10 @@ class Transport:
       self._uart.timeout = timeout
 
     n = self._uart.readinto(mv_target)
-    if self.debug:
-      if n is not None:
-        print(f"<--- {n} bytes: {bytes(buffer[:min(n,40)])} ...")
-      else:
-        print("<--- 0 bytes ...")
+    if self.trace:
+      self.trace.record(EV_READ,None,n or 0)
+    if self.debug:                  # don't copy the buffer if disabled
+      self.log("<--- {} bytes: {} ...",n or 0,bytes(buffer[:min(n or 0,40)]))
 
     # reset timeout
     if timeout:
@@ -558,6 +1130,37 @@ class Transport:
     else:
       self.send_atcmd("ATE0")
 
+  def update_setting(self, command: str, value: str) -> bool:
+    """ set AT+<command>=<value> only if the current value (as returned
+    by AT+<command>?) differs. Returns True if the setting was written """
+    try:
+      reply = self.send_atcmd(f"AT+{command}?",filter=f"^\\+{command}:")
+    except TransportError:
+      reply = None                    # query not supported
+    if isinstance(reply,str) and reply[len(command)+2:] == value:
+      return False
+    if self.send_atcmd(f"AT+{command}={value}",filter="^OK") is None:
+      raise RuntimeError(f"could not set {command}")
+    return True
+
+  def _set_passive(self) -> None:
+    """ set passive receive-mode (if not already active) """
+    if self.caps.ciprecvtype:
+      reply = self.send_atcmd("AT+CIPRECVTYPE?",filter="^\\+CIPRECVTYPE:")
+      if reply is None:               # e.g. a self-compiled firmware
+        self.caps.unsupported("CIPRECVTYPE")
+      if isinstance(reply,str):
+        reply = [reply]
+      if reply and all(r.endswith(",1") for r in reply):
+        return
+    if self.caps.ciprecvtype:
+      reply = self.send_atcmd(
+        f'AT+CIPRECVTYPE={self.max_connections},1',filter="^OK")
+    else:
+      reply = self.send_atcmd('AT+CIPRECVMODE=1',filter="^OK")
+    if reply is None:
+      raise RuntimeError("could not set passive receive-mode")
+
   # --- connection configuration   -------------------------------------------
 
   @property
@@ -587,8 +1190,7 @@ class Transport:
     """ set passthrough policy """
     if value not in [PT_OFF, PT_AUTO, PT_MANUAL]:
       raise ValueError("illegal passthrough policy mode")
-    if self.debug:
-      print(f"passthrough policy: {value}")
+    self.log("passthrough policy: {}",value)
     self._pt_policy = value
 
   @property
@@ -600,6 +1202,7 @@ class Transport:
     return self._passthrough
 
   @passthrough.setter
+  @_locked
   def passthrough(self, mode: bool) -> None:
     """ set/reset passthrough mode """
 
@@ -613,37 +1216,51 @@ class Transport:
         raise RuntimeError("Could not enter passthrough-mode")
 
       reply = self.send_atcmd(
-        'AT+TRANSINTVL=20',filter="^OK")
+        f'AT+TRANSINTVL={self.transfer_interval}',filter="^OK")
       if not reply:
         raise RuntimeError("Could not set transfer-interval")
 
       # activate passthrough sending mode
       reply = self.send_atcmd("AT+CIPSEND",set_busy=False) # init passthrough
       if "ERROR" in reply:
-        if self.debug:
-          print("send failed with ERROR")
+        self.log("send failed with ERROR")
         self.busy = False
         raise RuntimeError("Could not enter passthrough-mode")
       success, _ = self.read_atmsg(passive=True,read_until='>')
       if not success:
         raise RuntimeError("Could not enter passthrough-mode")
-      if self.debug:
-        print("activated passthrough-mode")
+      self.log("activated passthrough-mode")
 
       self._passthrough = True
+      if self.trace:
+        self.trace.record(EV_PT_ON)
 
     # leave passthrough sending mode
     elif not mode and self._passthrough:
-      # send magic +++ to leave data mode
-      time.sleep(0.021)          # wait more than 20ms
-      self.write("+++")
-      time.sleep(0.021)          # wait more than 20ms
-      time.sleep(1)              # wait at least one second
-
-      self._passthrough = False  # left sending mode, enables send_atmsg again
+      self._leave_passthrough()
+      if self.trace:
+        self.trace.record(EV_PT_OFF)
 
       # also leave receiving mode passthrough-mode
       reply = self.send_atcmd(
         'AT+CIPMODE=0',filter="^OK")
       if not reply:
         raise RuntimeError("Could not leave passthrough-mode")
+
+  def _leave_passthrough(self, timeout: float = PT_EXIT_TIMEOUT) -> bool:
+    """ send magic +++ to leave data mode and probe with AT until the
+    co-processor answers (at most timeout seconds). The line must be
+    silent for PT_EXIT_SILENCE after +++ """
+    self._passthrough = False    # left sending mode, enables send_atcmd again
+    guard = max(PT_GUARD,(self.transfer_interval+1)/1000)
+    start = self.monotonic()
+    while self.monotonic() - start < timeout:
+      self.sleep(guard)
+      self.write(b"+++")
+      self.sleep(max(guard,PT_EXIT_SILENCE))
+      try:
+        if self._probe(0.1):
+          return True
+      except RebootError:
+        return self._wait_ready(READY_TIMEOUT)
+    return False
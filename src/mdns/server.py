@@ -12,7 +12,6 @@
 """ class Server. """
 
 import wifi
-from esp32at.transport import Transport
 
 try:
   from typing import Sequence
@@ -38,7 +37,7 @@ class Server:
     network_interface. (CircuitPython may already be using it.) Only
     native interfaces are currently supported.
     """
-    self._transport = Transport()
+    self._transport = radio._transport # pylint: disable=protected-access
 
     # default hostname. See shared-bindings/mdns/Server.c.
     if radio.run_mode & wifi.Radio.RUN_MODE_STATION:
@@ -138,10 +137,7 @@ class Server:
 
     cmd = f'AT+MDNS=1,"{self._hostname}","{service_type}",{port}'
 
-    if (self._transport.at_version_short[0] > 3 and
-        self._transport.at_version_short[1] > 0):
-      # available for >= 4.1.0.0
-
+    if self._transport.caps.mdns_txt:
       cmd += f',"{self._instance_name}","{protocol}",{len(txt_records)}'
       for i,value in enumerate(txt_records):
         cmd += f',"rec{i}","{value}"'
@@ -16,3 +16,4 @@ CircuitPython.
 
 from .socket import Socket
 from .socketpool import SocketPool
+from .group import SocketPoolGroup
@@ -0,0 +1,85 @@
+# -------------------------------------------------------------------------
+# Class SocketPoolGroup. Combine the socket pools of multiple co-processors.
+#
+# Usage:
+#
+#   import wifi
+#   import socketpool
+#
+#   wifi.init(uart0,...)
+#   radio1 = wifi.add_radio(uart1,...)
+#   wifi.radio.connect(ssid,password)
+#   radio1.connect(ssid,password)
+#
+#   pool = socketpool.SocketPoolGroup([socketpool.SocketPool(wifi.radio),
+#                                      socketpool.SocketPool(radio1)])
+#   sock = pool.socket()   # socket of the least loaded co-processor
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class SocketPoolGroup. """
+
+from __future__ import annotations
+
+try:
+  from typing import Sequence, Tuple
+  import circuitpython_typing
+except ImportError:
+  pass
+
+from .socketpool import SocketPool
+
+class SocketPoolGroup:
+  """ SocketPool compatible group of socket pools.
+
+  New sockets are created by the least loaded pool, i.e. the pool with
+  the lowest fraction of used links. Sockets that are not connected yet
+  count as used links, so sockets created in a row are spread across
+  the pools. Ties are broken by the order of the pools.
+  """
+
+  def __init__(self, pools: Sequence[SocketPool]) -> None:
+    """ Constructor """
+    if not pools:
+      raise ValueError("at least one pool is required")
+    self.pools = list(pools)
+
+  def __getattr__(self, name: str):
+    """ constants and exceptions of SocketPool """
+    if name.isupper() or name == "gaierror":
+      return getattr(SocketPool,name)
+    raise AttributeError(name)
+
+  @staticmethod
+  def load(pool: SocketPool) -> float:
+    """ fraction of used (or reserved) links of the given pool """
+    used = sum(1 for conn in pool.connections if conn) + pool.reserved
+    return used/len(pool.connections)
+
+  def select(self) -> SocketPool:
+    """ return the least loaded pool """
+    return min(self.pools,key=self.load)
+
+  # pylint: disable=redefined-builtin
+  def socket(self,
+             family: int = SocketPool.AF_INET,
+             type: int = SocketPool.SOCK_STREAM,
+             proto: int = SocketPool.IPPROTO_IP) -> circuitpython_typing.Socket:
+    """ create a socket using the least loaded pool """
+    return self.select().socket(family,type,proto)
+
+  # pylint: disable=too-many-arguments
+  def getaddrinfo(self,
+                  host: str,
+                  port: int,
+                  family: int = 0,
+                  socktype: int = 0,
+                  proto: int = 0,
+                  flags: int = 0) -> Tuple[int, int, int, str, Tuple[str, int]]:
+    """ resolve host using the least loaded pool """
+    return self.select().getaddrinfo(host,port,family,socktype,proto,flags)
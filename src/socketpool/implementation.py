@@ -10,6 +10,8 @@
 
 """ class Implementation. """
 
+from __future__ import annotations
+
 from collections import namedtuple
 try:
   from typing import Tuple, Sequence, Union
@@ -19,36 +21,48 @@ except ImportError:
 
 import ipaddress
 from esp32at.transport import Transport, CALLBACK_SEND
+from esp32at.session import STEP_SERVER, STEP_SERVER_TIMEOUT
+from esp32at.trace import EV_SEND, EV_RECV, EV_SEND_OK
+from esp32at.phases import PH_SNI, PH_SEND
 
 # pylint: disable=anomalous-backslash-in-string,bare-except
 class _Implementation:
   """ Low-level helpers for SocketPool and Socket """
 
   _impl = None
-  """ The singleton instance """
-
-  def __new__(cls):
-    if _Implementation._impl:
-      return _Implementation._impl
+  """ The singleton instance (for the default transport) """
+
+  def __new__(cls, transport: Transport = None):
+    if transport is None:
+      transport = Transport()  # get transport-singleton
+    impl = transport.instances.get("impl")
+    if impl:
+      return impl
     return super(_Implementation,cls).__new__(cls)
 
-  def __init__(self) -> None:
+  def __init__(self, transport: Transport = None) -> None:
     """ Constructor """
-    self._t = Transport()  # get transport-singleton
+    if hasattr(self,"_t"):
+      return
+    if transport is None:
+      transport = Transport()  # get transport-singleton
+    self._t = transport
     self._ready_for_data = False
     self._send_pending = False
+    self._send_link = None
+    self.send_chunk = None            # maximal size of a single send
+    self.tcp_nodelay = False          # disable Nagle's algorithm
     self._t.set_callback(CALLBACK_SEND,self._send_callback)
-    _Implementation._impl = self
+    transport.instances["impl"] = self   # freed with the transport
+    if transport is Transport.transport:
+      _Implementation._impl = self
 
   def get_connections(
     self,
     link_id = None) -> Union[namedtuple,Sequence[namedtuple]]:
     """ query connections """
 
-    if (self._t.at_version_short[0] > 2 or
-        self._t.at_version_short[1] > 2 or
-        self._t.at_version_short[2] > 1):
-      # available for >= 3.x.x.x and > 2.2.2.x
+    if self._t.caps.cipstate:
       cmd = "CIPSTATE"
       postfix  = "?"
       offset = 10
@@ -113,6 +127,8 @@ class _Implementation:
         f'AT+CIPSSLCSNI={lid_parm}""',filter="^OK")
     if reply is None:
       raise RuntimeError("could not set/clear server name indication (SNI)")
+    if self._t.phases:
+      self._t.phases.mark(link_id,PH_SNI)
 
     # parameters: connection-type, remote host, remote port [,,, timeout]
     params = f'{lid_parm}"{conn_type}","{host}",{port}'
@@ -124,9 +140,7 @@ class _Implementation:
       #          local: port,2,host (order is different than above)
       params += f',{address[1]},2,"{address[0]}"'
 
-    if timeout and (self._t.at_version_short[0] > 3 and
-                    self._t.at_version_short[1] > 0):
-      # available for >= 4.1.0.0
+    if timeout and self._t.caps.start_timeout:
       if "UDP" in conn_type:
         params += f',{1000*timeout}'
       else:
@@ -135,10 +149,21 @@ class _Implementation:
     # without timeout, CIPSTART seems to fail after about 15s
     reply = self._t.send_atcmd(
       f'AT+CIPSTART={params}',filter="^OK")
-    return not reply is None
+    if reply is None:
+      return False
 
-  def close_connection(self,link_id: int) -> None:
-    """ Close connection (best effort) """
+    # options: so_linger (default), tcp_nodelay, so_sndtimeo (default)
+    if self.tcp_nodelay and not "UDP" in conn_type:
+      try:
+        self._t.send_atcmd(f"AT+CIPTCPOPT={lid_parm}-1,1,0")
+      except:
+        pass
+    return True
+
+  def close_connection(self,link_id: int, check = None) -> None:
+    """ Close connection (best effort). If check() returns False after
+    processing pending messages, the link was closed by the peer (and
+    might already be reused), so it is not closed again """
 
     if self._t.multi_connections:
       lid_parm = f"={link_id}"
@@ -146,23 +171,40 @@ class _Implementation:
       lid_parm = ""
 
     try:
-      self._t.send_atcmd(f"AT+CIPCLOSE{lid_parm}")
+      with self._t.lock:
+        self._t.read_atmsg(passive=False)
+        if check and not check():
+          return
+        self._t.send_atcmd(f"AT+CIPCLOSE{lid_parm}")
     except:
       pass
 
   def _send_callback(self,msg):
     """ callback for send status """
-    if self._t.debug:
-      print(f"implementation._send_callback(): {msg}")
+    self._t.log("implementation._send_callback(): {}",msg)
+    if self._t.trace:
+      self._t.trace.record(EV_SEND_OK)
+    if self._t.phases and msg == "SEND OK":
+      self._t.phases.mark(self._send_link,PH_SEND)
     self._t.busy = False
 
   def send(self,
            buffer: circuitpython_typing.ReadableBuffer,
            link_id: int) -> None:
     """ Send up to 8192 bytes """
+    with self._t.lock:                # command, prompt and data are atomic
+      self._send(buffer,link_id)
+
+  def _send(self,
+            buffer: circuitpython_typing.ReadableBuffer,
+            link_id: int) -> None:
+    """ Send up to 8192 bytes (caller holds the lock) """
 
     if self._t.passthrough:
       self._t.write(buffer)
+      self._t.metrics.add_bytes_out(link_id,len(buffer))
+      if self._t.trace:
+        self._t.trace.record(EV_SEND,link_id,len(buffer))
       return
 
     if link_id is None:
@@ -178,29 +220,59 @@ class _Implementation:
       lid_parm = ""
 
     cmd = f"AT+CIPSEND={lid_parm}{len(buffer)}"
+    self._send_link = link_id
 
     reply = self._t.send_atcmd(cmd,set_busy=True)     # init send
     if "ERROR" in reply:                              # link_id could be closed
-      if self._t.debug:
-        print(f"send failed with ERROR for {link_id}")
+      self._t.log("send failed with ERROR for {}",link_id)
       self._t.busy = False
       raise OSError(f"send failed for {link_id}")
     success, _ = self._t.read_atmsg(passive=True,read_until='>')
     if success:
       self._t.write(buffer)                             # write data to uart
+      self._t.metrics.add_bytes_out(link_id,len(buffer))
+      if self._t.trace:
+        self._t.trace.record(EV_SEND,link_id,len(buffer))
     else:
+      self._t.busy = False                            # no SEND OK follows
       raise OSError(f"send failed with ERROR for {link_id}")
 
-  # pylint: disable=no-self-use, unused-argument
   def send_long(self,
            buffer: circuitpython_typing.ReadableBuffer,
-           link_id: int) -> int:
-    """ Send long buffer """
+           link_id: int) -> None:
+    """ Send long buffer: AT+CIPSENDL if available, else chunks of
+    8192 bytes (caller holds the lock) """
 
     if link_id is None:
       raise RuntimeError("illegal state: no connection established yet")
 
-    raise RuntimeError("not implemented yet: buffer is larger than 8192")
+    if not self._t.caps.cipsendl:
+      view = memoryview(buffer)
+      for start in range(0,len(view),8192):
+        self._send(view[start:start+8192],link_id)
+      return
+
+    if self._t.multi_connections:
+      lid_parm = f"{link_id},"
+    else:
+      lid_parm = ""
+
+    self._send_link = link_id
+    reply = self._t.send_atcmd(f"AT+CIPSENDL={lid_parm}{len(buffer)}",
+                               set_busy=True)
+    if "ERROR" in reply:                              # link_id could be closed
+      self._t.busy = False
+      raise OSError(f"send failed for {link_id}")
+    success, _ = self._t.read_atmsg(passive=True,read_until='>')
+    if not success:
+      self._t.busy = False                            # no SEND OK follows
+      raise OSError(f"send failed with ERROR for {link_id}")
+    view = memoryview(buffer)
+    for start in range(0,len(view),8192):        # limit copies of the UART
+      self._t.write(view[start:start+8192])
+    self._t.metrics.add_bytes_out(link_id,len(buffer))
+    if self._t.trace:
+      self._t.trace.record(EV_SEND,link_id,len(buffer))
 
   def get_host_by_name(self,
                        hostname: str) -> str:
@@ -233,11 +305,20 @@ class _Implementation:
       self._t.send_atcmd(f"AT+CIPSTO={value}")
     except:
       pass
+    self._t.session.record(STEP_SERVER_TIMEOUT,
+                           lambda: self.set_server_timeout(value))
 
   def recv_data(self,
                 buffer: circuitpython_typing.WriteableBuffer, bufsize: int,
                 link_id: int) -> int:
     """ read pending data """
+    with self._t.lock:                # command, header and data are atomic
+      return self._recv_data(buffer,bufsize,link_id)
+
+  def _recv_data(self,
+                 buffer: circuitpython_typing.WriteableBuffer, bufsize: int,
+                 link_id: int) -> int:
+    """ read pending data (caller holds the lock) """
 
     if self._t.multi_connections:
       lid_parm = f"{link_id},"
@@ -265,7 +346,13 @@ class _Implementation:
     act_len = int(act_len)
     host = host.strip('"')
     port = int(port)
-    return self.read(buffer,act_len),host,port
+    n = self.read(buffer,act_len)
+    # consume the final OK, otherwise it is taken as reply of the next command
+    self._t.read_atmsg(timeout=1,passive=True)
+    self._t.metrics.add_bytes_in(link_id,n)
+    if self._t.trace:
+      self._t.trace.record(EV_RECV,link_id,n)
+    return n,host,port
 
   def read(self,
            buffer: circuitpython_typing.WriteableBuffer, bufsize: int) -> int:
@@ -277,7 +364,7 @@ class _Implementation:
   def start_server(self, port: int, conn_type: str) -> None:
     """ start TCP/SSL server on the given port """
 
-    if self._t.at_version_short[0] > 2:
+    if self._t.caps.server_type:
       reply = self._t.send_atcmd(
         f'AT+CIPSERVER=1,{port},"{conn_type}",0',filter="^OK")
     else:
@@ -285,11 +372,15 @@ class _Implementation:
         f'AT+CIPSERVER=1,{port}',filter="^OK")
     if reply is None:
       raise RuntimeError("could not start server")
+    self._t.session.record(STEP_SERVER,
+                           lambda: self.start_server(port,conn_type))
 
   def stop_server(self) -> None:
     """ start TCP/SSL server on the given port """
 
     # delete server and close all connections
+    self._t.session.forget(STEP_SERVER)
+    self._t.session.forget(STEP_SERVER_TIMEOUT)
     try:
       self._t.send_atcmd('AT+CIPSERVER=0,1',filter="^OK",timeout=5)
     except:
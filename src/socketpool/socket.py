@@ -13,11 +13,12 @@
 
 """ class Socket. """
 
-import time
-from errno import EAGAIN, ETIMEDOUT, ECONNRESET
-from esp32at.transport import Transport, PT_AUTO
+from __future__ import annotations
+
+from errno import EAGAIN, ETIMEDOUT, ECONNRESET, EINPROGRESS
+from esp32at.transport import PT_AUTO, RebootError
+from esp32at.phases import PH_CONNECT
 from .socketpool import SocketPool            # pylint: disable=cyclic-import
-from .implementation import _Implementation
 
 try:
   from typing import Optional
@@ -25,6 +26,30 @@ try:
 except ImportError:
   pass
 
+def _reset_on_reboot(func):
+  """ decorator: fail with ECONNRESET if the link was lost by a reboot
+  of the co-processor. Otherwise (e.g. a server or a socket still
+  connecting) the operation is repeated once after the restore """
+  def wrapper(self,*args,**kwargs):
+    for attempt in range(2):
+      if self.reset:
+        raise OSError(ECONNRESET)
+      try:
+        result = func(self,*args,**kwargs)
+      except RebootError as ex:
+        if (not self._t.restore_session() or self.reset or
+            attempt == 1):
+          raise OSError(ECONNRESET) from ex
+        continue
+      except Exception as ex:
+        if self.reset:                 # e.g. command repeated on a lost link
+          raise OSError(ECONNRESET) from ex
+        raise
+      if self.reset:
+        raise OSError(ECONNRESET)
+      return result
+  return wrapper
+
 # pylint: disable=too-many-instance-attributes
 class Socket:
   """ Class Socket """
@@ -46,10 +71,10 @@ class Socket:
 
     if family != SocketPool.AF_INET:
       raise ValueError("Only AF_INET family supported")
-    self._impl = _Implementation()
     self._socketpool = socket_pool
-    self._radio = self._socketpool._radio
-    self._t = Transport()
+    self._impl = socket_pool._impl
+    self._radio = socket_pool._radio
+    self._t = socket_pool._t
     self._sock_type = type
     self._use_ssl = False
     self._timeout = 0
@@ -62,6 +87,10 @@ class Socket:
 
     self.data_prompt = None
     self.link_id = None
+    self.reset = False               # link lost by a reboot
+    self._reserved = True            # counts as link until connected
+    socket_pool.reserved += 1
+    self._timings = None
 
     # state variables for the server
     self._is_server_socket =  False
@@ -92,6 +121,7 @@ class Socket:
       self._conn_type = "SSL"
 
   # pylint: disable=protected-access
+  @_reset_on_reboot
   def accept(self) -> Tuple[Socket, Tuple[str, int]]:
     """
     Accept a connection on a listening socket of type SOCK_STREAM,
@@ -104,15 +134,8 @@ class Socket:
     else:
       timeout = self._timeout
 
-    # read pending messages at least once
-    self._t.read_atmsg(passive=False)
-
-    start = time.monotonic()
-    while not self._socketpool.conn_inbound and time.monotonic()-start < timeout:
-      # read pending messages
-      self._t.read_atmsg(passive=False)
-
-    if not self._socketpool.conn_inbound:
+    # read pending messages (at least once) until a connection arrives
+    if not self._t.wait(lambda: self._socketpool.conn_inbound, timeout):
       raise OSError(EAGAIN)
 
     # otherwise, check connection and return socket
@@ -138,6 +161,7 @@ class Socket:
 
     self._local_host = address[0]
     self._local_port = address[1]
+    self.unreserve()
 
     # UDP: does not start a server, but a connection
     if "UDP" in self._conn_type:
@@ -147,6 +171,7 @@ class Socket:
     self._is_server_socket = True
     self._impl.start_server(address[1],self._conn_type)
 
+  @_reset_on_reboot
   def connect(self,address: Tuple[str, int],
               _remote: Tuple[str, int] = None) -> None:
     """ Connect a socket to a remote address
@@ -163,13 +188,23 @@ class Socket:
 
     # query free link-id
     link_id = self._socketpool.get_link_id(self)
-
-    success = self._impl.start_connection(
-      link_id, self._timeout,
-      address[0],address[1],self._conn_type,_remote)
+    self.unreserve()
+    if self._t.phases:
+      self._timings = self._t.phases.start(link_id,address[0],
+                                           self._t.monotonic)
+
+    success = False
+    try:
+      success = self._impl.start_connection(
+        link_id, self._timeout,
+        address[0],address[1],self._conn_type,_remote)
+    finally:
+      if not success:                   # also release link_id on exceptions
+        self._socketpool.free_link_id(link_id)
+        if self._t.phases:
+          self._t.phases.finish(link_id)
 
     if not success:
-      self._socketpool.free_link_id(link_id)
       raise OSError(ECONNRESET)
 
     # wait until link_id is set by callback
@@ -178,12 +213,14 @@ class Socket:
     else:
       timeout = self._timeout
 
-    start = time.monotonic()
-    while self.link_id is None and time.monotonic() - start < timeout:
-      self._t.read_atmsg(passive=False)
-
-    if self.link_id is None:
-      raise OSError(EINPROGRESS)
+    try:
+      if not self._t.wait(lambda: self.link_id is not None, timeout):
+        raise OSError(EINPROGRESS)
+    except RebootError:
+      self._socketpool.free_link_id(link_id)    # connect is repeated
+      raise
+    if self._t.phases:
+      self._t.phases.mark(self.link_id,PH_CONNECT)
 
     # set timeout (in case app already called socket.settimeout())
     if not self._timeout is None:
@@ -199,13 +236,33 @@ class Socket:
 
     # leave passthrough mode
     self._t.passthrough = False
+    self.unreserve()
+
+    # process pending messages, the link might already be closed
+    if self._t.input_available:
+      self._t.read_atmsg()
 
     if self._is_server_socket:
       self._impl.stop_server()
-    elif not self.link_id is None and self._socketpool.connections[self.link_id]:
-      self._impl.close_connection(self.link_id) # this should trigger cleanup
+    elif (not self.link_id is None and
+          self._socketpool.connections[self.link_id] is self):
+      # the link might already be closed and reused by a new connection
+      self._impl.close_connection(           # this should trigger cleanup
+        self.link_id,lambda: self._socketpool.connections[self.link_id] is self)
+      if self._socketpool.connections[self.link_id] is self:
+        self._socketpool.free_link_id(self.link_id)   # no CLOSED received
+    if self._t.phases and not self.link_id is None:
+      # also if closed by the peer (unless the link was reused)
+      self._t.phases.finish(self.link_id,self._timings)
     self.link_id = None                                       # in socketpool
 
+  def unreserve(self) -> None:
+    """ release the reservation of the socket in its pool (internal,
+    not part of the core-API) """
+    if self._reserved:
+      self._reserved = False
+      self._socketpool.reserved -= 1
+
   # pylint: disable=no-self-use
   def listen(self,backlog: int) -> None:
     """ Set socket to listen for incoming connections
@@ -218,6 +275,7 @@ class Socket:
     # this is not implemented by the AT command set, so just ignore
     return
 
+  @_reset_on_reboot
   def recvfrom_into(
     self,
     buffer: circuitpython_typing.WriteableBuffer) -> Tuple[int, Tuple[str, int]]:
@@ -241,10 +299,7 @@ class Socket:
       timeout = 100000         # block "indefinitely"
     else:
       timeout = self._timeout
-    start = time.monotonic()
-    while not self.data_prompt and time.monotonic()-start < timeout:
-      self._t.read_atmsg(passive=False)
-    if not self.data_prompt:
+    if not self._t.wait(lambda: self.data_prompt, timeout):
       raise OSError(ETIMEDOUT)
 
     link_id, recv_size = self.data_prompt # pylint: disable=unpacking-non-sequence
@@ -254,6 +309,7 @@ class Socket:
     n,rhost,rport = self._impl.recv_data(buffer,min(len(buffer),recv_size),link_id)
     return n,(rhost,rport)
 
+  @_reset_on_reboot
   def recv_into(
     self,
     buffer: circuitpython_typing.WriteableBuffer, bufsize: int = 0) -> int:
@@ -277,13 +333,15 @@ class Socket:
       raise ValueError("bufsize must be 0 to len(buffer)")
     bytes_to_read = bufsize if bufsize else len(buffer)
 
-    if self._t.debug:
-      print(f"recv_into({self.link_id}): {bytes_to_read=}")
-      print(f"              {self.data_prompt=}")
+    self._t.log("recv_into({}): bytes_to_read={}",self.link_id,bytes_to_read)
+    self._t.log("              data_prompt={}",self.data_prompt)
 
     # read directly if we are in passthrough-mode
     if self._t.passthrough:
-      return self._t.readinto(buffer,bytes_to_read,self._timeout)
+      n = self._t.readinto(buffer,bytes_to_read,self._timeout)
+      if n:
+        self._t.metrics.add_bytes_in(self.link_id,n)
+      return n
 
     # we need a data-prompt (IPD) before we can read data
     # read pending messages (hope for IPD)
@@ -291,10 +349,7 @@ class Socket:
       timeout = 100000         # block "indefinitely"
     else:
       timeout = self._timeout
-    start = time.monotonic()
-    while not self.data_prompt and time.monotonic()-start < timeout:
-      self._t.read_atmsg(passive=False)
-    if not self.data_prompt:
+    if not self._t.wait(lambda: self.data_prompt, timeout):
       raise OSError(ETIMEDOUT)
 
     link_id, recv_size = self.data_prompt # pylint: disable=unpacking-non-sequence
@@ -306,6 +361,7 @@ class Socket:
     return n
 
   # pylint: disable=redefined-builtin
+  @_reset_on_reboot
   def send(self, bytes: circuitpython_typing.ReadableBuffer) -> int:
     """
     Send some bytes to the connected remote address. Suits sockets of
@@ -333,11 +389,18 @@ class Socket:
     bytes_to_send = len(buffer)
     bytes_sent = 0
     mv_buffer  = memoryview(buffer)
+    if self._impl.send_chunk:
+      max_len = min(self._impl.send_chunk,8192)
+    elif self._t.caps.cipsendl and self._conn_type != "UDP":
+      max_len = bytes_to_send               # single AT+CIPSENDL
+    else:
+      max_len = 8192
     while bytes_sent < bytes_to_send:
-      t_len = min(bytes_to_send-bytes_sent,8192)
-      t_buffer = mv_buffer[bytes_sent:bytes_sent+t_len-1]
+      t_len = min(bytes_to_send-bytes_sent,max_len)
+      t_buffer = mv_buffer[bytes_sent:bytes_sent+t_len]
       bytes_sent += self.send(t_buffer)
 
+  @_reset_on_reboot
   def sendto(self,
              bytes: circuitpython_typing.ReadableBuffer,
              address: Tuple[str, int]) -> int:
@@ -395,6 +458,14 @@ class Socket:
     elif not self.link_id is None and not self._timeout is None:
       self._impl.set_timeout(value,self.link_id)
 
+  @property
+  def timings(self) -> dict:
+    """ durations of the connection phases (internal, not part of the
+    core-API). Needs an active esp32at.phases.PhaseTracer. """
+    if self._timings:
+      return self._timings.durations()
+    return None
+
   @property
   def type(self) -> int:
     """ Read-only access to the socket type """
@@ -11,7 +11,14 @@
 
 """ class SocketPool. """
 
-from micropython import const
+from __future__ import annotations
+
+try:
+  from micropython import const
+except ImportError:
+  def const(value):                   # CPython
+    """ identity """
+    return value
 
 try:
   from typing import Tuple
@@ -21,6 +28,8 @@ except ImportError:
 
 import wifi
 from esp32at.transport import Transport, CALLBACK_CONN, CALLBACK_IPD
+from esp32at.trace import EV_CONNECT, EV_CLOSED, EV_IPD
+from esp32at.phases import PH_FIRST_BYTE
 from .implementation import _Implementation
 
 class SocketPool:
@@ -54,29 +63,36 @@ class SocketPool:
   NO_SOCKET_AVAIL = const(255)
 
   _socketpool = None
-  """ The singleton instance """
+  """ The singleton instance (pool of the default radio) """
 
   # pylint: disable=invalid-name
   class gaierror(OSError):
     """ Errors raised by getaddrinfo """
 
-  # pylint: disable=unused-argument
   def __new__(cls, radio: wifi.radio):
-    if SocketPool._socketpool:
-      return SocketPool._socketpool
+    pool = radio._transport.instances.get("pool") # pylint: disable=protected-access
+    if pool:
+      return pool
     return super(SocketPool,cls).__new__(cls)
 
   def __init__(self, radio: wifi.radio) -> None:
     """ Constructor """
+    if hasattr(self,"_radio"):
+      return
     self._radio = radio
-    self._t = Transport()
+    self._t = radio._transport
+    self._impl = _Implementation(self._t)
 
     # keep track of connections
     self._t.set_callback(CALLBACK_CONN,self._conn_callback)
     self._t.set_callback(CALLBACK_IPD,self._ipd_callback)
+    self._t.session.add_listener(self._reboot_callback)
     self.connections = [None]*self._t.max_connections
     self.conn_inbound = []
-    SocketPool._socketpool = self
+    self.reserved = 0                     # sockets not connected yet
+    self._t.instances["pool"] = self      # freed with the transport
+    if self._t is Transport.transport:
+      SocketPool._socketpool = self
 
   def _conn_callback(self,msg):
     """ callback for connection messages """
@@ -87,8 +103,10 @@ class SocketPool:
       link_id, action = int(msg[0]),msg[1]
     else:
       link_id, action = 0,msg
-    if self._t.debug:
-      print(f"socketpool._conn_callback(): {action} for {link_id}")
+    self._t.log("socketpool._conn_callback(): {} for {}",action,link_id)
+    if self._t.trace:
+      self._t.trace.record(
+        EV_CONNECT if action == 'CONNECT' else EV_CLOSED,link_id)
 
     if action == 'CONNECT':
       sock = self.connections[link_id]
@@ -98,20 +116,41 @@ class SocketPool:
       else:
         #inbound: sock does not exist
         sock = self.socket()
+        sock.unreserve()
         sock.link_id = link_id
         self.connections[link_id] = sock
         self.conn_inbound.append(link_id)
 
     else:
       # TODO: read buffer until empty (add to close()??)
+      if self._t.phases:
+        self._t.phases.finish(link_id)
       self.connections[link_id] = None
       if link_id in self.conn_inbound:
         self.conn_inbound.remove(link_id)
 
+  def _reboot_callback(self):
+    """ callback for a reboot of the co-processor: all links are lost.
+    Sockets still connecting keep their link-id, the connect is repeated
+    after the restore """
+    connections = [None]*self._t.max_connections
+    for link_id, sock in enumerate(self.connections):
+      if not sock:
+        continue
+      if sock.link_id is None:
+        connections[link_id] = sock
+        continue
+      sock.link_id = None
+      sock.data_prompt = None
+      sock.reset = True
+      if self._t.phases:
+        self._t.phases.finish(link_id)
+    self.connections = connections
+    self.conn_inbound = []
+
   def _ipd_callback(self,msg):
     """ callback for IPD messages """
-    if self._t.debug:
-      print(f"socketpool._ipd_callback(): {msg}")
+    self._t.log("socketpool._ipd_callback(): {}",msg)
 
     msg = msg.split(',')
     if self._t.multi_connections:
@@ -122,6 +161,10 @@ class SocketPool:
       # msg is: +IPD,length
       link_id = 0
       data_prompt = link_id,int(msg[1])
+    if self._t.trace:
+      self._t.trace.record(EV_IPD,link_id,data_prompt[1])
+    if self._t.phases:
+      self._t.phases.mark(link_id,PH_FIRST_BYTE)
 
     # link could be up from ESP32Cx-side, but not from application side
     if self.connections[link_id]:
@@ -129,15 +172,16 @@ class SocketPool:
 
   def get_link_id(self,sock: circuitpython_typing.Socket) -> int:
     """ return next free link_id and save socket in connections-list """
-    link_id = None
-    for index, conn in enumerate(self.connections):
-      if not conn:
-        link_id = index
-        break
-    if link_id is None:
-      raise RuntimeError("number of available connections exceeded!")
-    self.connections[link_id] = sock
-    return link_id
+    with self._t.lock:               # callbacks might run in another thread
+      link_id = None
+      for index, conn in enumerate(self.connections):
+        if not conn:
+          link_id = index
+          break
+      if link_id is None:
+        raise RuntimeError("number of available connections exceeded!")
+      self.connections[link_id] = sock
+      return link_id
 
   def free_link_id(self,link_id):
     """ free the given link_id """
@@ -188,8 +232,12 @@ class SocketPool:
     if not family:
       family = SocketPool.AF_INET
 
-    ipaddr = _Implementation().get_host_by_name(host)
+    if self._t.phases:
+      start = self._t.monotonic()
+    ipaddr = self._impl.get_host_by_name(host)
     if not ipaddr:
       raise self.gaierror(-2,"Name or service not known")
+    if self._t.phases:
+      self._t.phases.dns(host,ipaddr,self._t.monotonic()-start)
 
     return [(family, socktype, proto, "", (ipaddr, port))]
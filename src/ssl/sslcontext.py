@@ -13,6 +13,8 @@
 
 """ class SSLContext. """
 
+from __future__ import annotations
+
 from .sslsocket import SSLSocket
 
 try:
@@ -13,6 +13,8 @@
 
 """ class SSLSocket. """
 
+from __future__ import annotations
+
 try:
   from circuitpython_typing.socket import CircuitPythonSocketType
   from typing import Union
@@ -14,18 +14,21 @@ wifi - this module tries to mimic the wifi-module of core
 CircuitPython.
 """
 
-import busio
-from digitalio import Direction, DigitalInOut
+from __future__ import annotations
 
 from esp32at.transport import Transport
+from esp32at.session import STEP_CONFIG
 from .radio import Radio
 from .authmode import AuthMode
 from .network import Network
 from .packet import Packet
 from .monitor import Monitor
+from .config import Config
+from . import profiles
 
 try:
   from typing import Optional, Sequence
+  import busio
 except ImportError:
   pass
 
@@ -38,15 +41,75 @@ def init(uart: busio.UART,
          *,
          ipv4_dns_defaults: Optional[Sequence[str]] = [],
          country_settings: Optional = [0,None,None,None],
+         config: Optional[Config] = None,
+         profile: Optional[str] = None,
          **kwargs,
          ) -> bool:
   """ initialize wifi-hardware (i.e. the co-processor """
   global at_version # pylint: disable=invalid-name,global-statement
 
-  rc = transport.init(uart,**kwargs) # pylint: disable=invalid-name
+  rc = _init(radio,uart,ipv4_dns_defaults,country_settings,config,profile,
+             **kwargs)
   if rc:
     at_version = transport.at_version # pylint: disable=invalid-name
-    if ipv4_dns_defaults:
-      radio.ipv4_dns_defaults = ipv4_dns_defaults
-    radio.country_settings = country_settings
+  return rc
+
+# pylint: disable=dangerous-default-value
+def add_radio(uart: busio.UART,
+              *,
+              ipv4_dns_defaults: Optional[Sequence[str]] = [],
+              country_settings: Optional = [0,None,None,None],
+              config: Optional[Config] = None,
+              profile: Optional[str] = None,
+              **kwargs,
+              ) -> Optional[Radio]:
+  """ initialize an additional co-processor on another UART.
+  Returns its radio or None. Use socketpool.SocketPool(radio) for
+  the sockets of this co-processor """
+
+  other = Radio(Transport.create())
+  if _init(other,uart,ipv4_dns_defaults,country_settings,config,profile,
+           **kwargs):
+    return other
+  return None
+
+# pylint: disable=too-many-arguments
+def _init(rad: Radio, uart: busio.UART, ipv4_dns_defaults,
+          country_settings, config, profile, **kwargs) -> bool:
+  """ initialize the transport of the given radio """
+
+  # explicit parameters and the config take precedence over the profile
+  settings = profiles.get(profile)
+  if getattr(uart,"at_uart",True):  # no baudrates for e.g. SPI
+    kwargs.setdefault("baudrate",settings["baudrate"])
+  kwargs.setdefault("pt_policy",settings["pt_policy"])
+  if config is None:
+    config = Config()
+  config = config.merge(country=country_settings,
+                        sleep_mode=settings["sleep_mode"],
+                        tx_power=settings["tx_power"])
+  if config.reconnect is not None:
+    kwargs["reconn_interval"] = None  # configured by the config
+
+  t = rad._transport # pylint: disable=invalid-name,protected-access
+  rc = t.init(uart,**kwargs) # pylint: disable=invalid-name
+  if not rc:
+    return rc
+
+  profiles.apply(rad,profile)
+  if ipv4_dns_defaults:
+    rad.ipv4_dns_defaults = ipv4_dns_defaults
+
+  # reconcile the desired with the current state (not necessary if
+  # the co-processor still has the state of the last session)
+  state = config.values
+  if not (t.warm_start and t.state.get("wifi") == state):
+    try:
+      changed = config.reconcile(rad)
+    except Exception as ex: # pylint: disable=broad-except
+      t.log("wifi: could not apply settings: {}",ex,force=True)
+      return False
+    t.log("wifi: changed settings: {}",changed)
+    t.update_state("wifi",state)
+  t.session.record(STEP_CONFIG,lambda: config.reconcile(rad))
   return rc
@@ -13,6 +13,8 @@
 
 """ class AuthMode with auth-mode constants. """
 
+from __future__ import annotations
+
 try:
   from typing import Sequence
   import circuitpython_typing
@@ -0,0 +1,121 @@
+# -------------------------------------------------------------------------
+# Class Config. Desired state of the co-processor.
+#
+# A config only lists the settings it cares about. reconcile() reads the
+# current values from the co-processor and only writes settings that
+# differ, so a restart does not rewrite unchanged settings to the flash
+# of the co-processor:
+#
+#   from wifi.config import Config
+#
+#   config = Config(country=[False,"DE",1,13],hostname="sensor-1",
+#                   reconnect=(5,0))
+#   wifi.init(uart,config=config)
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" class Config. """
+
+try:
+  from typing import Optional, Sequence, Union
+  from .radio import Radio
+except ImportError:
+  pass
+
+class Config:
+  """ desired state of the co-processor. None means: don't care """
+
+  # pylint: disable=too-many-arguments
+  def __init__(self, *,
+               country: Optional[Sequence] = None,
+               dns: Optional[Sequence[str]] = None,
+               hostname: Optional[str] = None,
+               reconnect: Optional[Union[int, Sequence[int]]] = None,
+               tx_power: Optional[float] = None,
+               sleep_mode: Optional[int] = None) -> None:
+    """ constructor.
+
+    country:    [ignore_ap,country,start_channel,n_channels], None
+                entries keep the current value (see Radio.country_settings)
+    dns:        addresses of the DNS servers
+    hostname:   hostname of the station
+    reconnect:  interval or (interval,repeat_count) of automatic reconnects
+                (overrides reconn_interval of wifi.init())
+    tx_power:   transmission power in dBm
+    sleep_mode: sleep mode (see Radio.sleep_mode)
+    """
+    self.country = country
+    self.dns = dns
+    self.hostname = hostname
+    if isinstance(reconnect,int):
+      reconnect = (reconnect,0)
+    self.reconnect = reconnect
+    self.tx_power = tx_power
+    self.sleep_mode = sleep_mode
+
+  def merge(self, **defaults) -> "Config":
+    """ return a copy with settings that are None replaced by defaults """
+    settings = {"country": self.country, "dns": self.dns,
+                "hostname": self.hostname, "reconnect": self.reconnect,
+                "tx_power": self.tx_power, "sleep_mode": self.sleep_mode}
+    for key, value in defaults.items():
+      if settings[key] is None:
+        settings[key] = value
+    return Config(**settings)
+
+  @property
+  def values(self) -> list:
+    """ all settings (e.g. to persist them) """
+    return [None if self.country is None else list(self.country),
+            None if self.dns is None else list(self.dns),
+            self.hostname,
+            None if self.reconnect is None else list(self.reconnect),
+            self.tx_power,
+            self.sleep_mode]
+
+  def reconcile(self, radio: Radio) -> list:
+    """ write settings that differ from the current state of the
+    co-processor. Returns the names of the changed settings """
+
+    changed = []
+    if self.country is not None:
+      current = radio.country_settings
+      wanted = [current[i] if value is None else value
+                for i, value in enumerate(self.country)]
+      wanted = [bool(wanted[0]),wanted[1],int(wanted[2]),int(wanted[3])]
+      if wanted != current:
+        radio.country_settings = wanted
+        changed.append("country")
+
+    if self.dns is not None:
+      wanted = list(self.dns)
+      if len(wanted) < 2:
+        wanted += radio.ipv4_dns_defaults[:1]
+      if radio.dns != wanted:
+        radio.dns = wanted
+        changed.append("dns")
+
+    if self.hostname is not None and radio.hostname != self.hostname:
+      radio.hostname = self.hostname
+      changed.append("hostname")
+
+    # pylint: disable=protected-access
+    if self.reconnect is not None and radio._transport.update_setting(
+      "CWRECONNCFG",f"{self.reconnect[0]},{self.reconnect[1]}"):
+      changed.append("reconnect")
+
+    if self.tx_power is not None:
+      wanted = min(80,int(self.tx_power*4))
+      if int(radio.tx_power*4) != wanted:
+        radio.tx_power = wanted/4
+        changed.append("tx_power")
+
+    if self.sleep_mode is not None and radio._transport.update_setting(
+      "SLEEP",str(self.sleep_mode)):
+      changed.append("sleep_mode")
+    return changed
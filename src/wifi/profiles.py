@@ -0,0 +1,98 @@
+# -------------------------------------------------------------------------
+# Named performance profiles. A profile is a consistent bundle of
+# settings for the Transport, the socket implementation and the Radio:
+#
+#   wifi.init(uart,profile="throughput")
+#   print(wifi.profiles.effective(wifi.radio))
+#
+# Explicit parameters of wifi.init() (e.g. baudrate=...) and settings of
+# a Config take precedence over the profile.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" performance profiles """
+
+from esp32at.transport import BAUDRATES, PT_OFF, TRANSFER_INTERVAL
+
+try:
+  from typing import Optional
+  from .radio import Radio
+except ImportError:
+  pass
+
+DEFAULTS = {
+  "baudrate":          None,               # keep 115200
+  "pt_policy":         PT_OFF,
+  "transfer_interval": TRANSFER_INTERVAL,  # AT+TRANSINTVL (ms)
+  "send_chunk":        None,               # largest possible sends
+  "tcp_nodelay":       False,
+  "sleep_mode":        None,               # keep firmware setting
+  "tx_power":          None,               # keep firmware setting
+  }
+""" settings without a profile """
+
+PROFILES = {
+  "balanced": dict(DEFAULTS,
+                   baudrate=115200,
+                   sleep_mode=1,
+                   tx_power=20),
+  "throughput": dict(DEFAULTS,
+                     baudrate=BAUDRATES,
+                     sleep_mode=0,
+                     tx_power=20),
+  "low_latency": dict(DEFAULTS,
+                      baudrate=BAUDRATES,
+                      transfer_interval=0,
+                      send_chunk=2048,
+                      tcp_nodelay=True,
+                      sleep_mode=0,
+                      tx_power=20),
+  "low_power": dict(DEFAULTS,
+                    baudrate=115200,
+                    sleep_mode=3,
+                    tx_power=13),
+  }
+""" named profiles """
+
+def get(name: Optional[str]) -> dict:
+  """ settings of the named profile (or the defaults for None) """
+  if name is None:
+    return DEFAULTS
+  if not name in PROFILES:
+    raise ValueError(f"unknown profile {name} (use one of {list(PROFILES)})")
+  return PROFILES[name]
+
+def apply(radio: Radio, name: Optional[str]) -> None:
+  """ apply the settings of the profile that are not part of
+  Transport.init() or of a Config """
+  # pylint: disable=import-outside-toplevel,protected-access
+  from socketpool.implementation import _Implementation
+  settings = get(name)
+  transport = radio._transport
+  transport.profile = name
+  transport.transfer_interval = settings["transfer_interval"]
+  impl = _Implementation(transport)
+  impl.send_chunk = settings["send_chunk"]
+  impl.tcp_nodelay = settings["tcp_nodelay"]
+
+def effective(radio: Radio) -> dict:
+  """ report the effective settings (queries the co-processor) """
+  # pylint: disable=import-outside-toplevel,protected-access
+  from socketpool.implementation import _Implementation
+  transport = radio._transport
+  impl = _Implementation(transport)
+  return {
+    "profile":           transport.profile,
+    "baudrate":          transport.baudrate,
+    "pt_policy":         transport.pt_policy,
+    "transfer_interval": transport.transfer_interval,
+    "send_chunk":        impl.send_chunk,
+    "tcp_nodelay":       impl.tcp_nodelay,
+    "sleep_mode":        radio.sleep_mode,
+    "tx_power":          radio.tx_power,
+    }
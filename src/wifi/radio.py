@@ -13,6 +13,8 @@
 
 """ class Radio. """
 
+from __future__ import annotations
+
 try:
   from typing import Union, Sequence, Iterable, Tuple
   import circuitpython_typing
@@ -20,9 +22,11 @@ except ImportError:
   pass
 
 from collections import namedtuple
-import time
 import ipaddress
 from esp32at.transport import Transport, CALLBACK_WIFI, CALLBACK_STA
+from esp32at.session import STEP_CONNECT
+from esp32at.trace import (EV_WIFI_CONNECTED, EV_WIFI_GOT_IP,
+                           EV_WIFI_DISCONNECT, EV_STA)
 from .network import Network
 from .authmode import AuthMode
 
@@ -36,7 +40,7 @@ class Radio:
   """
 
   radio = None
-  """ the singleton instance"""
+  """ the singleton instance (radio of the default transport) """
 
   _CONNECT_ERRORS = {
     "1": "connection timeout",
@@ -60,13 +64,14 @@ class Radio:
   RUN_MODE_AP = 2
 
   def __new__(cls,transport: Transport):
-    if Radio.radio:
-      return Radio.radio
+    radio = transport.instances.get("radio")
+    if radio:
+      return radio
     return super(Radio,cls).__new__(cls)
 
   def __init__(self,transport: Transport) -> None:
     """ Constructor. """
-    if Radio.radio:
+    if hasattr(self,"_transport"):
       return
     self._transport = transport
     self._transport.set_callback(CALLBACK_WIFI,self._wifi_callback)
@@ -83,30 +88,37 @@ class Radio:
     self._ipv4_netmask_ap = None
     self._stations_ap = {}
 
-    Radio.radio = self
+    transport.instances["radio"] = self   # freed with the transport
+    if transport is Transport.transport:
+      Radio.radio = self
     self.ipv4_dns_defaults = ['8.8.8.8']  # default ESP32-AT
 
   def _wifi_callback(self,msg):
     """ callback for Transport.read_atmsg() to set connection state """
 
+    trace = self._transport.trace
     if msg == "WIFI CONNECTED":
       self._conn_state = Radio._CONNECT_STATE_IN_PROGRESS
-      if self._transport.debug:
-        print("radio: connect in progress")
+      if trace:
+        trace.record(EV_WIFI_CONNECTED)
+      self._transport.log("radio: connect in progress")
     elif msg == "WIFI DISCONNECT":
       self._conn_state = Radio._CONNECT_STATE_DISCONNECTED
-      if self._transport.debug:
-        print("radio: disconnected")
+      if trace:
+        trace.record(EV_WIFI_DISCONNECT)
+      self._transport.log("radio: disconnected")
     elif msg == "WIFI GOT IP":
       self._conn_state = Radio._CONNECT_STATE_CONNECTED
-      if self._transport.debug:
-        print("radio: fully connected (with IP)")
+      if trace:
+        trace.record(EV_WIFI_GOT_IP)
+      self._transport.log("radio: fully connected (with IP)")
 
   def _sta_callback(self,msg):
     """ callback for Transport.read_atmsg() to set station state """
 
-    if self._transport.debug:
-      print(f"radio._sta_callback: {msg=}")
+    self._transport.log("radio._sta_callback: msg={!r}",msg)
+    if self._transport.trace:
+      self._transport.trace.record(EV_STA)
     msg,args = msg.split(':',1)
     args = args.split(',')
     mac = args[0].strip('"')
@@ -142,7 +154,10 @@ class Radio:
   def country_settings(self, value: Sequence = [None,None,None,None]):
     """ configure country settings. Only change provided settings """
 
-    config = self.country_settings
+    if None in value:
+      config = self.country_settings
+    else:
+      config = list(value)
     if not value[0] is None:
       config[0] = str(int(value[0]))
     else:
@@ -179,7 +194,7 @@ class Radio:
     True when the wifi radio is enabled.
     If you set the value to False, any open sockets will be closed.
     """
-    if self._transport.at_version_short[0] > 2:
+    if self._transport.caps.cwinit:
       reply = self._transport.send_atcmd(
         'AT+CWINIT?',filter="^\+CWINIT:")
       if reply is None:
@@ -190,7 +205,7 @@ class Radio:
   @enabled.setter
   def enabled(self, value: bool) -> None:
     """Change the enabled status"""
-    if self._transport.at_version_short[0] < 3:
+    if not self._transport.caps.cwinit:
       return
     init = str(int(value))
     reply = self._transport.send_atcmd(
@@ -250,9 +265,25 @@ class Radio:
   @tx_power.setter
   def tx_power(self,value: int) -> None:
     """ Change tx_power """
-    wifi_power = min(80,value*4)
+    wifi_power = min(80,int(value*4))
     self._transport.send_atcmd(f"AT+RFPOWER={wifi_power}")
 
+  @property
+  def sleep_mode(self) -> int:
+    """ sleep mode of the co-processor: 0 (disabled), 1 (modem-sleep,
+    DTIM), 2 (light-sleep) or 3 (modem-sleep, listen interval) """
+    reply = self._transport.send_atcmd("AT+SLEEP?",filter="^\+SLEEP:")
+    if reply:
+      return int(reply[7:])
+    raise RuntimeError("Bad response to SLEEP?")
+
+  @sleep_mode.setter
+  def sleep_mode(self,mode: int) -> None:
+    """ change sleep mode """
+    reply = self._transport.send_atcmd(f"AT+SLEEP={mode}",filter="^OK")
+    if reply is None:
+      raise RuntimeError("could not set sleep mode")
+
   @property
   def listen_interval(self) -> int:
     """Wifi power save listen interval, in DTIM periods,
@@ -339,6 +370,7 @@ class Radio:
       f'AT+CWMODE={mode-Radio.RUN_MODE_STATION}',filter="^OK")
     if not reply:
       raise RuntimeError("Could not stop station-mode")
+    self._transport.session.forget(STEP_CONNECT)
 
     # clear buffered values
     self._ipv4_address = None
@@ -492,6 +524,7 @@ class Radio:
       pmf: protected management frames (for details, read the docs)
     """
 
+    timeout_arg = timeout
     if bssid is None:
       bssid = ""
     if timeout < 3:
@@ -503,13 +536,13 @@ class Radio:
     cmd += f'{listen_interval},{scan_mode},{timeout},{pmf}'
     try:
       # will return None in case of no errors
-      start = time.monotonic()
+      start = self._transport.monotonic()
       reply = self._transport.send_atcmd(
         cmd,
         timeout=timeout,
         retries=retries,
         filter="^\+CWJAP:")
-      timeout -= time.monotonic() - start
+      timeout -= self._transport.monotonic() - start
     except Exception as ex:
       # CWJAP is special, it might not return anything if connection is slow
       reply = ""
@@ -521,13 +554,13 @@ class Radio:
 
     # wait at most timeout seconds for connection
     if not reply:
-      start = time.monotonic()
-      while (
-        self._conn_state != Radio._CONNECT_STATE_CONNECTED and
-        time.monotonic() - start < timeout):
-        self._transport.read_atmsg(passive=False)
-      if self._conn_state != Radio._CONNECT_STATE_CONNECTED:
+      if not self._transport.wait(
+        lambda: self._conn_state == Radio._CONNECT_STATE_CONNECTED, timeout):
         raise ConnectionError(f"connection failed (timed-out)")
+      self._transport.session.record(STEP_CONNECT,lambda: self.connect(
+        ssid,password,bssid=bssid or None,timeout=timeout_arg,
+        retries=retries,pci_en=pci_en,reconn_interval=reconn_interval,
+        listen_interval=listen_interval,scan_mode=scan_mode,pmf=pmf))
       return
 
     # otherwise, there is an error
@@ -0,0 +1,107 @@
+# -------------------------------------------------------------------------
+# Shared fixtures of the tests. All tests run against the ESP-AT
+# simulator with a virtual clock, so they are deterministic and don't
+# need hardware.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" shared fixtures of the tests """
+
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import pytest
+from bench.common import Env, TcpServer
+from sim.esp_at import EspAtSimulator
+
+BUSY = "busy"
+""" script entry of ScriptedSimulator: reject the command """
+
+REBOOT = "reboot"
+""" script entry of ScriptedSimulator: reboot instead of a reply """
+
+class ScriptedSimulator(EspAtSimulator):
+  """ simulator that fails selected commands.
+
+  script maps a verb (e.g. "CWHOSTNAME") to a list of error codes, BUSY
+  or REBOOT. Every command with this verb consumes the first entry and
+  fails with it (BUSY: rejects it with 'busy p...', REBOOT: reboots
+  instead of a reply), once the list is empty the command works again.
+
+  hung: ignore all commands (until a reset, unless stuck is also set)
+  """
+
+  def __init__(self, **kwargs) -> None:
+    """ constructor """
+    self.script = {}
+    self.hung = False
+    self.stuck = False
+    self.reboots = 0
+    super().__init__(**kwargs)
+
+  def _reboot(self, delay: float = 0) -> None:
+    """ count reboots, a reset cures a hung firmware """
+    self.reboots += 1
+    self.hung = self.stuck
+    super()._reboot(delay)
+
+  def _command(self, line: str) -> None:
+    """ fail the command if the script says so """
+    if self.hung:
+      return
+    verb = line[3:] if line.startswith("AT+") else line[2:]
+    for sep in "=?":
+      verb = verb.split(sep,1)[0]
+    replies = self.script.get(verb)
+    if not replies:
+      super()._command(line)
+      return
+    self.commands[verb] = self.commands.get(verb,0) + 1
+    reply = replies.pop(0)
+    if reply == BUSY:
+      self._emit(b"busy p...\r\n")
+      return
+    if reply == REBOOT:
+      self._reboot()
+      return
+    if self.echo:
+      self._emit_line(line)
+    self._error(reply)
+
+def echo(conn) -> None:
+  """ handler: send everything back """
+  while True:
+    data = conn.recv(65536)
+    if not data:
+      return
+    conn.sendall(data)
+
+@pytest.fixture
+def env():
+  """ initialized simulator (unpaced) with a virtual clock """
+  result = Env(paced=False)
+  yield result
+  result.transport.phases = None      # the transport is shared
+  result.close()
+
+@pytest.fixture
+def scripted():
+  """ initialized ScriptedSimulator (unpaced) with a virtual clock """
+  result = Env(uart=ScriptedSimulator(paced=False))
+  yield result
+  result.close()
+
+@pytest.fixture
+def server():
+  """ local echo server """
+  result = TcpServer(echo)
+  yield result
+  result.close()
@@ -0,0 +1,69 @@
+# -------------------------------------------------------------------------
+# Tests of the backpressure handling ('busy p...' and pending SEND OK).
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" tests of busy handling """
+
+import pytest
+
+from bench.common import Env
+from conftest import BUSY
+from esp32at.transport import TransportError, BUSY_TIMEOUT
+from sim.faults import FaultySimulator, FaultProfile
+
+CMD = "AT+CWHOSTNAME?"
+VERB = "CWHOSTNAME"
+
+def test_busy_command_is_resubmitted(scripted):
+  """ a rejected command is resubmitted, not retried """
+  t = scripted.transport
+  scripted.uart.script[VERB] = [BUSY]*3
+  busy, retries = t.metrics.busy, t.metrics.retries
+
+  assert t.send_atcmd(CMD)[-1] == "OK"
+  assert scripted.uart.commands[VERB] == 4
+  assert t.metrics.busy - busy == 3
+  assert t.metrics.retries == retries
+
+def test_busy_command_fails_after_busy_timeout(scripted):
+  """ a co-processor that stays busy fails the command """
+  t = scripted.transport
+  scripted.uart.script[VERB] = [BUSY]*10000
+  start = scripted.monotonic()
+
+  with pytest.raises(TransportError):
+    t.send_atcmd(CMD)
+  elapsed = scripted.monotonic() - start
+  assert BUSY_TIMEOUT < elapsed < BUSY_TIMEOUT + 1
+
+@pytest.fixture
+def lossy():
+  """ simulator that loses every SEND OK """
+  uart = FaultySimulator(FaultProfile("lossy",send_ok_loss=1),paced=False,
+                         real_wait=0.001)     # limit real time per sleep
+  result = Env(uart=uart)
+  yield result
+  result.close()
+
+def test_lost_send_ok_delays_next_command(lossy, server):
+  """ without SEND OK, the next command waits at most BUSY_TIMEOUT """
+  t = lossy.transport
+  sock = lossy.pool.socket()
+  sock.connect(("127.0.0.1",server.port))
+  sock.send(b"ping")
+  assert t.busy
+  timeouts = t.metrics.timeouts
+  start = lossy.monotonic()
+
+  sock.send(b"pong")
+  elapsed = lossy.monotonic() - start
+  assert BUSY_TIMEOUT <= elapsed < BUSY_TIMEOUT + 1
+  assert t.metrics.timeouts - timeouts == 1
+  assert lossy.uart.injected["send_ok_loss"] == 2
+  sock.close()
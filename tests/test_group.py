@@ -0,0 +1,61 @@
+# -------------------------------------------------------------------------
+# Tests of socketpool.SocketPoolGroup.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" tests of the socket pool group """
+
+import pytest
+
+import wifi
+import socketpool
+from sim.esp_at import EspAtSimulator
+
+@pytest.fixture
+def group(env):
+  """ group of the pools of two co-processors """
+  uart = EspAtSimulator(paced=False)
+  radio = wifi.add_radio(uart,reset_pin=uart.reset_pin)
+  assert radio
+  radio.connect("simnet","password")
+  yield socketpool.SocketPoolGroup([env.pool,socketpool.SocketPool(radio)])
+  uart.deinit()
+
+def test_unconnected_sockets_are_spread(group):
+  """ sockets created in a row alternate between the pools """
+  pools = group.pools
+  socks = [group.socket() for _ in range(4)]
+  assert [sock._socketpool for sock in socks] == [pools[0],pools[1]]*2
+  assert [pool.reserved for pool in pools] == [2,2]
+  for sock in socks:
+    sock.close()
+  assert [pool.reserved for pool in pools] == [0,0]
+
+def test_connect_turns_reservation_into_link(group, server):
+  """ a connected socket counts once (as link, not as reservation) """
+  pools = group.pools
+  socks = [group.socket() for _ in range(4)]
+  for sock in socks:
+    sock.connect(("127.0.0.1",server.port))
+  assert [pool.reserved for pool in pools] == [0,0]
+  assert [group.load(pool) for pool in pools] == [2/5,2/5]
+  for sock in socks:
+    sock.close()
+  assert [group.load(pool) for pool in pools] == [0,0]
+
+def test_least_loaded_pool_is_selected(group, server):
+  """ connections of one pool move new sockets to the other pool """
+  pools = group.pools
+  busy = [pools[0].socket() for _ in range(2)]
+  for sock in busy:
+    sock.connect(("127.0.0.1",server.port))
+  assert group.select() is pools[1]
+  new = [group.socket() for _ in range(2)]
+  assert [sock._socketpool for sock in new] == [pools[1]]*2
+  for sock in busy + new:
+    sock.close()
@@ -0,0 +1,65 @@
+# -------------------------------------------------------------------------
+# Tests of esp32at.health.HealthMonitor.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" tests of the health monitor """
+
+from esp32at.health import (HealthMonitor, HEALTH_OK, HEALTH_RECOVERING,
+                            HEALTH_FAILED, LEVEL_HARD_RESET)
+
+def test_no_ping_with_recent_traffic(scripted):
+  """ check() is free while the UART is busy and commands work """
+  monitor = HealthMonitor(scripted.transport,interval=10)
+  scripted.transport.send_atcmd("AT")
+  assert monitor.check() == HEALTH_OK
+  assert monitor.pings == 0
+
+def test_ping_after_silence(scripted):
+  """ a silent UART is checked with AT """
+  monitor = HealthMonitor(scripted.transport,interval=10)
+  scripted.clock.sleep(11)
+  assert monitor.check() == HEALTH_OK
+  assert monitor.pings == 1
+  assert monitor.failures == 0
+
+def test_ping_after_timeouts(scripted):
+  """ too many timeouts trigger a ping despite recent traffic """
+  monitor = HealthMonitor(scripted.transport,interval=10)
+  scripted.transport.metrics.timeouts += 3
+  assert monitor.check() == HEALTH_OK
+  assert monitor.pings == 1
+
+def test_hung_firmware_recovers_with_hard_reset(scripted):
+  """ resync and soft reset fail, the hard reset works """
+  uart = scripted.uart
+  monitor = HealthMonitor(scripted.transport,interval=10,budget=60)
+  reboots = uart.reboots
+  uart.hung = True
+  scripted.clock.sleep(11)
+
+  assert monitor.check() == HEALTH_OK
+  assert uart.reboots - reboots == 1
+  assert monitor.failures == 1
+  assert monitor.recoveries == 1
+  assert monitor.max_downtime > 0
+  scripted.transport.send_atcmd("AT")   # the session still works
+
+def test_stuck_firmware_fails_after_budget(scripted):
+  """ the state is HEALTH_FAILED once the downtime budget is used up """
+  uart = scripted.uart
+  monitor = HealthMonitor(scripted.transport,interval=10,budget=60)
+  uart.hung = uart.stuck = True
+  scripted.clock.sleep(11)
+
+  assert monitor.check() == HEALTH_RECOVERING
+  assert monitor.level == LEVEL_HARD_RESET
+  while monitor.check() == HEALTH_RECOVERING:
+    assert monitor.snapshot()["down_s"] <= 60
+  assert monitor.state == HEALTH_FAILED
+  assert monitor.snapshot()["down_s"] > 60
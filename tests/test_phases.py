@@ -0,0 +1,87 @@
+# -------------------------------------------------------------------------
+# Tests of esp32at.phases.PhaseTracer.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" tests of the phase tracer """
+
+from pytest import approx
+
+from esp32at.phases import (PhaseTracer, PH_SNI, PH_CONNECT, PH_SEND,
+                            PH_FIRST_BYTE)
+
+class Clock:
+  """ manually advanced clock """
+
+  def __init__(self) -> None:
+    """ constructor """
+    self.now = 0.0
+
+  def __call__(self) -> float:
+    return self.now
+
+def _connection(tracer, clock, link_id, steps) -> None:
+  """ run a connection: steps is a list of (delay, phase) """
+  tracer.start(link_id,"example.com")
+  for delay, phase in steps:
+    clock.now += delay
+    tracer.mark(link_id,phase)
+  tracer.finish(link_id)
+
+def test_phase_after_missing_phase_is_not_timed():
+  """ without a send, first_byte has no duration """
+  clock = Clock()
+  tracer = PhaseTracer(clock=clock)
+  _connection(tracer,clock,0,[(0.1,PH_SNI),(0.2,PH_CONNECT),
+                              (0.5,PH_FIRST_BYTE)])
+  durations = tracer.finished[0].durations()
+  assert durations["connect"] == approx(0.2)
+  assert "send" not in durations
+  assert "first_byte" not in durations
+  assert "close" not in durations
+
+def test_summary_averages_over_connections_reaching_the_phase():
+  """ a connection without send must not dilute the send average """
+  clock = Clock()
+  tracer = PhaseTracer(clock=clock)
+  _connection(tracer,clock,0,[(0.1,PH_SNI),(0.2,PH_CONNECT),
+                              (0.4,PH_SEND),(0.2,PH_FIRST_BYTE)])
+  _connection(tracer,clock,1,[(0.1,PH_SNI),(0.4,PH_CONNECT)])
+
+  summary = tracer.summary()["example.com"]
+  assert summary["count"] == 2
+  assert summary["connect"] == approx((0.3,0.4))
+  assert summary["send"] == approx((0.4,0.4))
+  assert summary["first_byte"] == approx((0.2,0.2))
+
+def test_finish_ignores_reused_link():
+  """ a stale socket must not finish the timings of the new owner """
+  clock = Clock()
+  tracer = PhaseTracer(clock=clock)
+  old = tracer.start(0,"old.example.com")
+  tracer.start(0,"new.example.com")
+  tracer.finish(0,old)
+  assert not tracer.finished
+  tracer.finish(0)
+  assert tracer.finished[0].host == "new.example.com"
+
+def test_socket_timings(env, server):
+  """ phases of a socket connection against the simulator """
+  env.transport.phases = PhaseTracer()
+  sock = env.pool.socket()
+  sock.settimeout(5)
+  sock.connect(("127.0.0.1",server.port))
+  sock.send(b"ping")
+  buf = bytearray(4)
+  assert sock.recv_into(buf) == 4
+  sock.close()
+
+  summary = env.transport.phases.summary()["127.0.0.1"]
+  assert summary["count"] == 1
+  for name in ("connect", "send", "first_byte", "close"):
+    assert summary[name][0] >= 0
@@ -0,0 +1,72 @@
+# -------------------------------------------------------------------------
+# Tests of the session restore after an unexpected reboot of the firmware.
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" tests of the session restore """
+
+from errno import ECONNRESET
+
+import pytest
+
+from conftest import REBOOT
+
+def _connect(env, server):
+  """ connected socket """
+  sock = env.pool.socket()
+  sock.settimeout(5)
+  sock.connect(("127.0.0.1",server.port))
+  return sock
+
+def _echo(sock, data: bytes) -> bytes:
+  """ send data and read the echo """
+  sock.send(data)
+  buf = bytearray(len(data))
+  assert sock.recv_into(buf) == len(data)
+  return bytes(buf)
+
+def test_idle_reboot_is_restored_by_next_command(scripted):
+  """ the next command notices the reboot and replays the session """
+  t = scripted.transport
+  restores = t.session.restores
+  scripted.uart._reboot()
+  scripted.clock.sleep(1)
+  assert not scripted.uart.mux
+
+  assert scripted.radio.ipv4_address
+  assert t.session.restores - restores == 1
+  assert scripted.uart.mux
+  assert scripted.uart.wifi_ssid == "simnet"
+
+def test_reboot_during_connect(scripted, server):
+  """ the interrupted connect is repeated, older sockets are reset """
+  old = _connect(scripted,server)
+  scripted.uart.script["CIPSTART"] = [REBOOT]
+  commands = scripted.uart.commands["CIPSTART"]
+
+  sock = _connect(scripted,server)
+  assert scripted.uart.commands["CIPSTART"] - commands == 2
+  assert _echo(sock,b"hello") == b"hello"
+  with pytest.raises(OSError) as info:
+    old.send(b"x")
+  assert info.value.args[0] == ECONNRESET
+  old.close()
+  sock.close()
+
+def test_reboot_during_send(scripted, server):
+  """ a send of a lost link fails, new sockets work again """
+  sock = _connect(scripted,server)
+  scripted.uart.script["CIPSEND"] = [REBOOT]
+
+  with pytest.raises(OSError) as info:
+    sock.send(b"x")
+  assert info.value.args[0] == ECONNRESET
+  sock.close()
+  sock = _connect(scripted,server)
+  assert _echo(sock,b"again") == b"again"
+  sock.close()
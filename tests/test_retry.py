@@ -0,0 +1,96 @@
+# -------------------------------------------------------------------------
+# Tests of esp32at.retry and the retries of Transport.send_atcmd().
+#
+# Author: Bernhard Bablok
+# License: MIT
+#
+# Website: https://github.com/bablokb/circuitpython-esp32at
+#
+# -------------------------------------------------------------------------
+
+""" tests of retry policies and error classification """
+
+from pytest import approx
+
+from esp32at.retry import (RetryPolicy, retryable, decode, ERR_EXEC_FAIL,
+                           ERR_PARA_INVALID)
+
+CMD = "AT+CWHOSTNAME?"
+VERB = "CWHOSTNAME"
+
+def _reply(code: int) -> list:
+  """ ERROR reply with the given error code """
+  return [f"ERR CODE:0x{code:08x}","ERROR"]
+
+def _code(sub_category: int) -> int:
+  """ error code of the given sub-category """
+  return 0x01000000 | sub_category << 16
+
+def test_decode():
+  """ error code of a reply """
+  assert decode(_reply(0x010a0000)) == 0x010a0000
+  assert decode(["ERROR"]) is None
+  assert decode(["ERR CODE:0xzz","ERROR"]) is None
+
+def test_retryable():
+  """ only failed executions are transient """
+  assert retryable(_reply(_code(ERR_EXEC_FAIL)))
+  assert not retryable(_reply(_code(ERR_PARA_INVALID)))
+  assert not retryable(["ERROR"])
+  assert not retryable(["link is not valid"]+_reply(_code(ERR_EXEC_FAIL)))
+
+def test_delay_grows_up_to_max_delay():
+  """ exponential backoff without jitter """
+  policy = RetryPolicy(base=0.1,factor=2,max_delay=0.3,jitter=0)
+  assert [policy.delay(n) for n in range(1,5)] == approx([0.1,0.2,0.3,0.3])
+
+def test_jitter_shortens_delay():
+  """ jitter randomizes the delay downwards """
+  policy = RetryPolicy(base=0.1,jitter=0.5)
+  for _ in range(20):
+    assert 0.05 <= policy.delay(1) <= 0.1
+
+def test_transient_error_is_retried(scripted, monkeypatch):
+  """ the command succeeds after two transient errors """
+  t = scripted.transport
+  monkeypatch.setitem(t.retry_policies,VERB,
+                      RetryPolicy(attempts=3,base=0.1,jitter=0))
+  scripted.uart.script[VERB] = [_code(ERR_EXEC_FAIL)]*2
+  retries = t.metrics.retries
+  start = scripted.monotonic()
+
+  assert t.send_atcmd(CMD)[-1] == "OK"
+  assert scripted.uart.commands[VERB] == 3
+  assert t.metrics.retries - retries == 2
+  assert scripted.monotonic() - start >= 0.1 + 0.2
+
+def test_fatal_error_is_not_retried(scripted, monkeypatch):
+  """ a parameter error is returned at once """
+  t = scripted.transport
+  monkeypatch.setitem(t.retry_policies,VERB,RetryPolicy(attempts=3))
+  scripted.uart.script[VERB] = [_code(ERR_PARA_INVALID)]
+
+  assert t.send_atcmd(CMD)[-1] == "ERROR"
+  assert scripted.uart.commands[VERB] == 1
+  assert t.last_error == _code(ERR_PARA_INVALID)
+
+def test_attempts_are_limited(scripted, monkeypatch):
+  """ the last ERROR is returned after all attempts """
+  t = scripted.transport
+  monkeypatch.setitem(t.retry_policies,VERB,
+                      RetryPolicy(attempts=3,base=0.01,jitter=0))
+  scripted.uart.script[VERB] = [_code(ERR_EXEC_FAIL)]*5
+
+  assert t.send_atcmd(CMD)[-1] == "ERROR"
+  assert scripted.uart.commands[VERB] == 3
+
+def test_budget_limits_retries(scripted, monkeypatch):
+  """ no retry starts after the budget is used up """
+  t = scripted.transport
+  monkeypatch.setitem(t.retry_policies,VERB,
+                      RetryPolicy(attempts=5,base=0.2,factor=1,
+                                  budget=0.5,jitter=0))
+  scripted.uart.script[VERB] = [_code(ERR_EXEC_FAIL)]*5
+
+  assert t.send_atcmd(CMD)[-1] == "ERROR"
+  assert scripted.uart.commands[VERB] == 3